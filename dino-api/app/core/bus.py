@@ -0,0 +1,234 @@
+"""
+Broadcast bus between uvicorn workers.
+
+`ConnectionManager` publishes every room event on the bus and each worker
+delivers what it receives to its own sockets, so a draw handled by one
+worker reaches players connected to any other.
+
+- LocalBus: single process; publish delivers directly.
+- UnixSocketBus: workers connect to a broker on a Unix socket. The broker
+  runs inside whichever worker holds an exclusive lock on
+  `<socket>.lock`; if that worker dies the kernel releases the lock and
+  another worker takes over while the rest reconnect.
+
+Ordering: the broker is a single asyncio loop that relays every line to
+all workers, the sender included, in the order it read them. Each worker
+therefore sees one total order of events, the same on every worker, and
+each publisher's own events keep their publish order. While a worker is
+not connected, its events are delivered locally only.
+
+Sequence numbers: whoever orders the events (LocalBus, or the broker)
+stamps each one with the next number of its game, so every worker
+delivers the same event with the same `seq`. Events delivered locally for
+lack of a broker carry `seq=None`, and so do the channels that are not a
+game (a user's, the lobby, the jobs wake-ups), which are not replayed.
+"""
+import asyncio
+import json
+import os
+import time
+import traceback
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from app.core.frames import is_final
+
+Deliver = Callable[[str, Optional[int], str, dict], Awaitable[None]]
+
+RECONNECT_SECONDS = 0.2
+LINE_LIMIT = 2 ** 20
+# seq = generación << SEQ_BITS | n.º de evento de la partida en esa generación
+SEQ_BITS = 20
+SEQ_ORIGIN = 1735689600  # 2025-01-01 UTC
+# Canales que no son una partida: los sockets de /ws/me de un usuario, el lobby
+# y los avisos al scheduler del worker líder
+USER_CHANNEL = "user:"
+LOBBY_CHANNEL = "lobby"
+JOBS_CHANNEL = "jobs"
+
+
+def is_game_channel(channel: str) -> bool:
+    return not channel.startswith(USER_CHANNEL) and channel not in (LOBBY_CHANNEL, JOBS_CHANNEL)
+
+
+class Sequencer:
+    """
+    Per-game event numbers of one generation of the bus.
+
+    The generation is the number of seconds since SEQ_ORIGIN when the
+    sequencer was created (or `previous + 1` if that is not higher), so a
+    restarted broker keeps numbering above the old one and the values stay
+    below 2**53 for JavaScript clients. A game's counter is forgotten after
+    its final event.
+    """
+
+    def __init__(self, previous: int = 0):
+        self.generation = max(int(time.time()) - SEQ_ORIGIN, previous + 1)
+        self._counters: Dict[str, int] = {}
+
+    def next(self, game_id: str, event_type: str, data: dict) -> Optional[int]:
+        if not is_game_channel(game_id):
+            return None
+        n = self._counters.get(game_id, 0) + 1
+        if is_final(event_type, data):
+            self._counters.pop(game_id, None)
+        else:
+            self._counters[game_id] = n
+        return (self.generation << SEQ_BITS) + n
+
+
+class LocalBus:
+    """In-process bus for single-worker deployments."""
+
+    def __init__(self, deliver: Deliver):
+        self._deliver = deliver
+        self._sequencer = Sequencer()
+
+    async def start(self):
+        pass
+
+    async def publish(self, game_id: str, event_type: str, data: dict):
+        await self._deliver(game_id, self._sequencer.next(game_id, event_type, data), event_type, data)
+
+    async def stop(self):
+        pass
+
+
+class UnixSocketBus:
+    """Bus through a broker on a Unix socket, hosted by one of the workers."""
+
+    def __init__(self, path: str, deliver: Deliver):
+        self.path = path
+        self._deliver = deliver
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock_fd: Optional[int] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._peers: Set[asyncio.StreamWriter] = set()
+        self._sequencer: Optional[Sequencer] = None
+        self.connected = asyncio.Event()
+
+    @property
+    def hosting(self) -> bool:
+        return self._server is not None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def publish(self, game_id: str, event_type: str, data: dict):
+        writer = self._writer
+        if writer is None or writer.is_closing():
+            # Sin broker: al menos los sockets de este worker, sin número de secuencia
+            await self._deliver(game_id, None, event_type, data)
+            return
+        writer.write(json.dumps({"g": game_id, "t": event_type, "d": data}).encode() + b"\n")
+        await writer.drain()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._server is not None:
+            self._server.close()
+            for peer in list(self._peers):
+                peer.close()
+            self._server = None
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    # --- Suscriptor ---
+
+    async def _run(self):
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path, limit=LINE_LIMIT)
+            except (FileNotFoundError, ConnectionRefusedError):
+                await self._try_host()
+                await asyncio.sleep(0 if self.hosting else RECONNECT_SECONDS)
+                continue
+            self._writer = writer
+            self.connected.set()
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    msg = json.loads(line)
+                    try:
+                        await self._deliver(msg["g"], msg.get("s"), msg["t"], msg["d"])
+                    except Exception:
+                        traceback.print_exc()
+            except (ConnectionError, OSError):
+                pass
+            finally:
+                self._writer = None
+                self.connected.clear()
+                writer.close()
+            await asyncio.sleep(RECONNECT_SECONDS)
+
+    # --- Broker ---
+
+    async def _try_host(self):
+        """Start the broker in this worker if no other worker holds the lock."""
+        if self.hosting:
+            return
+        import fcntl
+
+        fd = os.open(self.path + ".lock", os.O_CREAT | os.O_RDWR, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return
+        self._lock_fd = fd
+        # El fichero del lock guarda la última generación para no repetir números
+        try:
+            previous = int(os.pread(fd, 32, 0) or 0)
+        except ValueError:
+            previous = 0
+        self._sequencer = Sequencer(previous)
+        os.ftruncate(fd, 0)
+        os.pwrite(fd, str(self._sequencer.generation).encode(), 0)
+        # Con el lock, un socket que quede es de un broker muerto
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        self._server = await asyncio.start_unix_server(self._serve_peer, self.path, limit=LINE_LIMIT)
+
+    async def _serve_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._peers.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                msg = json.loads(line)
+                seq = self._sequencer.next(msg["g"], msg["t"], msg["d"])
+                if seq is not None:
+                    line = b'{"s": %d, ' % seq + line[1:]
+                for peer in list(self._peers):
+                    if peer.is_closing():
+                        self._peers.discard(peer)
+                        continue
+                    peer.write(line)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self._peers.discard(writer)
+            writer.close()
+
+
+def create_bus(backend: str, socket_path: str, deliver: Deliver):
+    if backend == "local":
+        return LocalBus(deliver)
+    if backend == "unix":
+        return UnixSocketBus(socket_path, deliver)
+    raise RuntimeError(f"BROADCAST_BUS desconocido: '{backend}' (local | unix)")
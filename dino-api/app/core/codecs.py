@@ -0,0 +1,85 @@
+"""
+Compact binary encodings for game and ticket state.
+
+- Balls in order (drawn so far, or the full draw plan): one byte per ball.
+- Card: 25 bytes, row-major 5x5, FREE cell = 0.
+- Card fingerprint: signed 64-bit hash of the 25 card bytes, unique per game.
+- Wins: int bitflag (DIAGONAL=1, LINE=2, BINGO=4).
+
+Columns store these encodings; routers decode them only when building
+API responses.
+"""
+import hashlib
+import json
+from typing import Iterable, List, Optional
+
+WIN_FLAGS = {"DIAGONAL": 1, "LINE": 2, "BINGO": 4}
+
+def encode_balls(balls: Iterable[int]) -> bytes:
+    return bytes(balls)
+
+
+def decode_balls(data: Optional[bytes]) -> List[int]:
+    return list(data) if data else []
+
+
+def encode_card(card: List[List[int]]) -> bytes:
+    return bytes(v for row in card for v in row)
+
+
+def decode_card(data: Optional[bytes]) -> List[List[int]]:
+    if not data or len(data) != 25:
+        return [[0] * 5 for _ in range(5)]
+    return [list(data[r * 5:r * 5 + 5]) for r in range(5)]
+
+
+def card_fingerprint(card: bytes) -> int:
+    """Canonical fingerprint of an encoded card (fits a signed BIGINT column)."""
+    return int.from_bytes(hashlib.blake2b(card, digest_size=8).digest(), "big", signed=True)
+
+
+def encode_wins(categories: Iterable[str]) -> int:
+    flags = 0
+    for cat in categories:
+        flags |= WIN_FLAGS.get(cat, 0)
+    return flags
+
+
+def decode_wins(flags: Optional[int]) -> List[str]:
+    return [cat for cat, bit in WIN_FLAGS.items() if (flags or 0) & bit]
+
+
+# --- Legacy JSON columns (solo para migrar datos existentes) ---
+
+def legacy_balls(raw: Optional[str]) -> List[int]:
+    if not raw:
+        return []
+    try:
+        arr = json.loads(raw)
+        return [int(x) for x in arr if isinstance(x, int) or (isinstance(x, str) and x.isdigit())]
+    except Exception:
+        return []
+
+
+def legacy_card(raw: Optional[str]) -> List[List[int]]:
+    """Parse a JSON 5x5 card; missing cells become 0, out-of-range ones a never-drawn 255."""
+    try:
+        data = json.loads(raw or "")
+        grid: List[List[int]] = []
+        for i in range(5):
+            row_src = data[i] if i < len(data) and isinstance(data[i], list) else []
+            row: List[int] = []
+            for j in range(5):
+                v = int(row_src[j]) if j < len(row_src) else 0
+                row.append(v if 0 <= v <= 75 else 255)
+            grid.append(row)
+        return grid
+    except Exception:
+        return [[0] * 5 for _ in range(5)]
+
+
+def legacy_wins(raw: Optional[str]) -> List[str]:
+    try:
+        return [w for w in json.loads(raw) if isinstance(w, str)] if raw else []
+    except Exception:
+        return []
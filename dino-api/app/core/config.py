@@ -20,3 +20,24 @@ AUTO_REGISTER_ON_LOGIN = os.getenv("AUTO_REGISTER_ON_LOGIN", "true").lower() ==
 # Admin bootstrap
 ADMIN_EMAIL = os.getenv("ADMIN_EMAIL", "admin@bingo.local")
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "admin123")
+
+# Sorteo automático: variación aleatoria máxima (segundos) sobre el intervalo de cada partida
+AUTO_DRAW_JITTER_SECONDS = float(os.getenv("AUTO_DRAW_JITTER_SECONDS", "0.5"))
+
+# Tareas de fondo con varios workers: solo el que tiene el lease las ejecuta
+JOBS_LEASE_SECONDS = float(os.getenv("JOBS_LEASE_SECONDS", "10"))
+# Cada cuánto el líder relee de la BD partidas creadas/iniciadas por otros workers
+JOBS_RESYNC_SECONDS = float(os.getenv("JOBS_RESYNC_SECONDS", "15"))
+
+# WebSockets: mensajes pendientes por conexión antes de considerarla lenta
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "64"))
+# Un envío que tarda más que esto cierra la conexión
+WS_SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "10"))
+# Últimos eventos de cada partida que se reenvían a un cliente que reconecta con ?since=
+WS_REPLAY_EVENTS = int(os.getenv("WS_REPLAY_EVENTS", "256"))
+# Lobby: como mucho una actualización por partida en este intervalo (cartones vendidos)
+LOBBY_COALESCE_SECONDS = float(os.getenv("LOBBY_COALESCE_SECONDS", "0.25"))
+
+# Difusión entre workers: "local" (un solo proceso) o "unix" (broker en un socket Unix)
+BROADCAST_BUS = os.getenv("BROADCAST_BUS", "local").lower()
+BROADCAST_BUS_SOCKET = os.getenv("BROADCAST_BUS_SOCKET", "./dino-bus.sock")
@@ -1,12 +1,33 @@
 from sqlmodel import SQLModel, create_engine, Session, select
-from sqlalchemy import inspect, text
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
 import os
+import time
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./dino.db")
 
+# Driver asíncrono por backend; ASYNC_DATABASE_URL permite elegir otro
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg", "mysql": "aiomysql"}
+
+
+def _async_url(url: str) -> str:
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    driver = ASYNC_DRIVERS.get(backend)
+    if driver is None:
+        raise RuntimeError(f"Sin driver asíncrono para '{backend}'; define ASYNC_DATABASE_URL")
+    return parsed.set(drivername=f"{backend}+{driver}").render_as_string(hide_password=False)
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _async_url(DATABASE_URL)
+
 # For SQLite, allow usage across threads (common in ASGI servers)
 _connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
 engine = create_engine(DATABASE_URL, echo=False, connect_args=_connect_args)
+# Misma base para los handlers async y las tareas de fondo: la E/S no bloquea el event loop
+async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=False)
 
 # Enable WAL Mode for SQLite (better concurrency)
 if DATABASE_URL.startswith("sqlite"):
@@ -17,38 +38,53 @@ if DATABASE_URL.startswith("sqlite"):
         cursor = dbapi_connection.cursor()
         cursor.execute("PRAGMA journal_mode=WAL")
         cursor.execute("PRAGMA synchronous=NORMAL")
+        # Las escrituras se serializan; esperar el lock en vez de fallar con "database is locked"
+        cursor.execute("PRAGMA busy_timeout=30000")
         cursor.close()
 
+    event.listen(async_engine.sync_engine, "connect", set_sqlite_pragma)
+
 def init_db():
+    # Con varios workers arrancando a la vez, otro proceso puede estar creando las
+    # mismas tablas o filas; todo el arranque es idempotente, así que se reintenta.
+    attempts = 5
+    for attempt in range(attempts):
+        try:
+            migrate_db()
+            _ensure_admin_account()
+            return
+        except (OperationalError, IntegrityError):
+            if attempt == attempts - 1:
+                raise
+            time.sleep(0.2 * (attempt + 1))
+
+
+def migrate_db():
+    """Create missing tables and apply pending migrations; returns the versions applied."""
     # Ensure models are imported so SQLModel metadata is populated
     import app.models  # noqa: F401
+    from app.core.migrations import run_migrations
+
     SQLModel.metadata.create_all(engine)
-    _ensure_users_table()
-    _ensure_admin_account()
+    return run_migrations(engine)
 
 def get_session():
     with Session(engine) as session:
         yield session
 
 
-def _ensure_users_table():
-    inspector = inspect(engine)
-    try:
-        columns = {col["name"] for col in inspector.get_columns("users")}
-    except Exception:
-        return
-    if "is_admin" in columns:
-        return
-    ddl = "ALTER TABLE users ADD COLUMN is_admin BOOLEAN DEFAULT 0"
-    backend = engine.url.get_backend_name()
-    if backend not in {"sqlite", "postgresql", "mysql"}:
-        return
-    if backend == "postgresql":
-        ddl = "ALTER TABLE users ADD COLUMN IF NOT EXISTS is_admin BOOLEAN DEFAULT FALSE"
-    elif backend == "mysql":
-        ddl = "ALTER TABLE users ADD COLUMN is_admin TINYINT(1) DEFAULT 0"
-    with engine.begin() as conn:
-        conn.execute(text(ddl))
+def async_session() -> AsyncSession:
+    """
+    Session on the async engine. Attributes stay loaded after commit: a lazy
+    reload would need the DB outside of an await.
+    """
+    return AsyncSession(async_engine, expire_on_commit=False)
+
+
+async def get_async_session():
+    """Dependency for `async def` routes; sync service code runs via `session.run_sync`."""
+    async with async_session() as session:
+        yield session
 
 
 def _ensure_admin_account():
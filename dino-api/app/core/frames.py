@@ -0,0 +1,92 @@
+"""
+Wire formats of the WebSocket events.
+
+A broadcast is encoded once per format and the same frame object is
+queued on every socket of the room. Clients pick the format when they
+connect (`?protocol=` and `?events=` on /ws/games/{game_id}):
+
+- json (default): text frame `{"type": ..., "seq": n, "payload": {...}}`;
+  `seq` only on room events (app.core.bus), not on per-connection ones.
+- binary: the frequent events go out as small binary frames; the others
+  keep the JSON text frame, so a binary client must handle both frame
+  types.
+
+Each draw is one `draw_result` event. With events=legacy the connection
+gets it as the old separate events instead (number_drawn, one winner per
+ticket, game_finished), all with the draw's seq.
+
+Binary layouts (integers big-endian): event code u8, seq u64 (0 if the
+event has none), then
+- 0x01 number_drawn: ball u8, balls drawn so far u8, paid flags u8
+  (DIAGONAL=1, LINE=2, BINGO=4). 12 bytes.
+- 0x02 player_joined: sold_tickets u32. 13 bytes.
+- 0x03 draw_result without winners: same body as number_drawn. 12 bytes.
+  A draw with winners goes as JSON text.
+- 0x04 card_update (personal): ball u8, then per card holding it: card
+  index u16, cell u8 (row * 5 + col), categories now one ball away u8
+  (WIN_FLAGS bits). 14 bytes for one card.
+"""
+import json
+import struct
+from typing import List, Optional, Tuple
+
+from app.core.codecs import WIN_FLAGS
+
+PROTOCOLS = ("json", "binary")
+
+EVENT_CODES = {"number_drawn": 0x01, "player_joined": 0x02, "draw_result": 0x03, "card_update": 0x04}
+
+EVENT_MODES = ("draw_result", "legacy")
+
+
+def is_final(event_type: str, data: dict) -> bool:
+    """Whether the game emits nothing after this event."""
+    if event_type == "draw_result":
+        return data["finished"]
+    return event_type in ("game_finished", "game_cancelled")
+
+
+def legacy_events(game_id: str, event_type: str, data: dict) -> List[Tuple[str, dict]]:
+    """The events a legacy client gets for one room event."""
+    if event_type != "draw_result":
+        return [(event_type, data)]
+    events = [("number_drawn", {
+        "number": data["number"],
+        "drawn_count": data["drawn_count"],
+        "paid_diagonal": data["paid_diagonal"],
+        "paid_line": data["paid_line"],
+        "paid_bingo": data["paid_bingo"],
+    })]
+    for category, group in data["winners"].items():
+        for w in group["tickets"]:
+            events.append(("winner", {**w, "amount": group["amount"], "category": category}))
+    if data["finished"]:
+        events.append(("game_finished", {"game_id": game_id, "status": "FINISHED"}))
+    return events
+
+
+def json_frame(event_type: str, data: dict, seq: Optional[int] = None) -> str:
+    message = {"type": event_type}
+    if seq is not None:
+        message["seq"] = seq
+    message["payload"] = data
+    return json.dumps(message)
+
+
+def _paid_flags(data: dict) -> int:
+    return sum(bit for cat, bit in WIN_FLAGS.items() if data.get(f"paid_{cat.lower()}"))
+
+
+def binary_frame(event_type: str, data: dict, seq: Optional[int] = None) -> Optional[bytes]:
+    """Binary encoding of an event, or None if it has no binary layout."""
+    code = EVENT_CODES.get(event_type)
+    if code == 0x03 and data["winners"]:
+        return None
+    if code in (0x01, 0x03):
+        return struct.pack(">BQBBB", code, seq or 0, data["number"], data["drawn_count"], _paid_flags(data))
+    if code == 0x02:
+        return struct.pack(">BQI", code, seq or 0, data["sold_tickets"])
+    if code == 0x04:
+        body = b"".join(struct.pack(">HBB", *change) for change in data["cards"])
+        return struct.pack(">BQB", code, seq or 0, data["ball"]) + body
+    return None
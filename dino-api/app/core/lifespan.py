@@ -2,21 +2,30 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 import asyncio
 from app.core.database import init_db
-from app.services.scheduler import housekeeper_task
+from app.core.websocket import manager
+from app.services.leader import leadership_task
+from app.services.scheduler import auto_draw_task, housekeeper_task, reset_schedules
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     init_db()
+    # Difusión entre workers (app.core.bus)
+    await manager.bus.start()
     
-    # Start background task
-    task = asyncio.create_task(housekeeper_task())
+    # Start background tasks (solo en el worker que tenga el lease)
+    tasks = [
+        asyncio.create_task(leadership_task([housekeeper_task, auto_draw_task], on_step_down=reset_schedules)),
+    ]
     
     yield
     
     # Shutdown
-    task.cancel()
-    try:
-        await task
-    except asyncio.CancelledError:
-        pass
+    for task in tasks:
+        task.cancel()
+    for task in tasks:
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    await manager.bus.stop()
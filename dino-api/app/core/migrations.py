@@ -0,0 +1,241 @@
+"""
+Versioned schema migrations.
+
+Each migration has a number and a function that receives an open
+connection. Applied versions are recorded in the `schema_version` table,
+so every migration runs once per database. They run at startup (init_db)
+after `create_all`, or by hand:
+
+    python -m app.core.migrations status
+    python -m app.core.migrations upgrade
+
+A fresh database already gets the current schema from `create_all`, so
+every migration checks before it changes anything. That also makes a
+migration safe to re-run if it was interrupted halfway (SQLite does not
+always wrap DDL in the transaction).
+"""
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Set
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable[[Connection], None]
+
+
+# --- Helpers ---
+
+def _columns(conn: Connection, table: str) -> Set[str]:
+    try:
+        return {col["name"] for col in inspect(conn).get_columns(table)}
+    except Exception:
+        return set()
+
+
+def _add_column(conn: Connection, table: str, column: str, ddl_type: str):
+    """Add a column to an existing table if it is missing."""
+    if column not in _columns(conn, table):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+
+
+def _create_index(conn: Connection, name: str, table: str, columns: str, unique: bool = False):
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    conn.execute(text(f"CREATE {kind} IF NOT EXISTS {name} ON {table} ({columns})"))
+
+
+def _blob(conn: Connection) -> str:
+    return "BYTEA" if conn.dialect.name == "postgresql" else "BLOB"
+
+
+# --- Migrations ---
+
+def _users_is_admin(conn: Connection):
+    backend = conn.dialect.name
+    default = {"postgresql": "FALSE", "mysql": "0"}.get(backend, "0")
+    ddl_type = "TINYINT(1)" if backend == "mysql" else "BOOLEAN"
+    _add_column(conn, "users", "is_admin", f"{ddl_type} DEFAULT {default}")
+
+
+def _games_auto_draw_interval(conn: Connection):
+    _add_column(conn, "games", "auto_draw_interval_seconds", "INTEGER")
+
+
+def _compact_storage(conn: Connection):
+    """
+    Move the legacy JSON columns to the compact binary encoding, in place.
+
+    games.drawn_numbers -> drawn_sequence, games.draw_order ->
+    draw_plan, tickets.numbers -> card, tickets.wins -> win_flags. Rows are
+    converted and the legacy columns dropped afterwards (SQLite >= 3.35).
+    """
+    from app.core import codecs
+
+    blob = _blob(conn)
+    for column in ("drawn_sequence", "draw_plan"):
+        _add_column(conn, "games", column, blob)
+    _add_column(conn, "tickets", "card", blob)
+    _add_column(conn, "tickets", "win_flags", "INTEGER DEFAULT 0")
+
+    game_cols = _columns(conn, "games")
+    legacy = [c for c in ("drawn_numbers", "draw_order") if c in game_cols]
+    if legacy:
+        rows = conn.execute(text(f"SELECT id, {', '.join(legacy)} FROM games")).mappings().all()
+        params = []
+        for row in rows:
+            drawn = codecs.legacy_balls(row.get("drawn_numbers"))
+            plan = codecs.legacy_balls(row.get("draw_order"))
+            params.append({
+                "id": row["id"],
+                "seq": codecs.encode_balls(drawn) if drawn else None,
+                "plan": codecs.encode_balls(plan) if plan else None,
+            })
+        if params:
+            conn.execute(
+                text("UPDATE games SET drawn_sequence = :seq, draw_plan = :plan WHERE id = :id"),
+                params,
+            )
+        for column in legacy:
+            conn.execute(text(f"ALTER TABLE games DROP COLUMN {column}"))
+
+    ticket_cols = _columns(conn, "tickets")
+    legacy = [c for c in ("numbers", "wins") if c in ticket_cols]
+    if legacy:
+        rows = conn.execute(text(f"SELECT id, {', '.join(legacy)} FROM tickets")).mappings().all()
+        params = [
+            {
+                "id": row["id"],
+                "card": codecs.encode_card(codecs.legacy_card(row.get("numbers"))),
+                "flags": codecs.encode_wins(codecs.legacy_wins(row.get("wins"))),
+            }
+            for row in rows
+        ]
+        if params:
+            conn.execute(text("UPDATE tickets SET card = :card, win_flags = :flags WHERE id = :id"), params)
+        for column in legacy:
+            conn.execute(text(f"ALTER TABLE tickets DROP COLUMN {column}"))
+
+
+def _card_fingerprints(conn: Connection):
+    """
+    Add tickets.fingerprint and the unique (game_id, fingerprint) index.
+
+    Existing tickets are fingerprinted; when a game already holds identical
+    cards only the first one gets the fingerprint and the rest keep NULL, so
+    the unique index can be built without touching sold tickets.
+    """
+    from app.core.codecs import card_fingerprint
+
+    if "fingerprint" not in _columns(conn, "tickets"):
+        _add_column(conn, "tickets", "fingerprint", "BIGINT")
+        rows = conn.execute(text("SELECT id, game_id, card FROM tickets ORDER BY game_id, id")).all()
+        seen = set()
+        params = []
+        for tid, game_id, card in rows:
+            key = (game_id, card_fingerprint(bytes(card or b"")))
+            if key in seen:
+                continue
+            seen.add(key)
+            params.append({"id": tid, "fp": key[1]})
+        if params:
+            conn.execute(text("UPDATE tickets SET fingerprint = :fp WHERE id = :id"), params)
+    _create_index(conn, "ux_tickets_game_fingerprint", "tickets", "game_id, fingerprint", unique=True)
+
+
+def _games_max_cards_per_user(conn: Connection):
+    _add_column(conn, "games", "max_cards_per_user", "INTEGER NOT NULL DEFAULT 2")
+
+
+def _hot_path_indexes(conn: Connection):
+    # tope de cartones por jugador y "mis cartones en esta partida"
+    _create_index(conn, "ix_tickets_game_user", "tickets", "game_id, user_id")
+    # /tickets/me, /games/my-active, estadísticas del usuario
+    _create_index(conn, "ix_tickets_user", "tickets", "user_id")
+    # listados por estado y barrido del scheduler
+    _create_index(conn, "ix_games_status_created", "games", "status, created_at")
+    # "una partida activa por creador"
+    _create_index(conn, "ix_games_creator_status", "games", "creator_id, status")
+    # historial de movimientos del usuario
+    _create_index(conn, "ix_transactions_user_created", "transactions", "user_id, created_at")
+
+
+def _job_leases(conn: Connection):
+    from app.models.job_lease import JobLease
+
+    JobLease.__table__.create(conn, checkfirst=True)
+
+
+def _drop_games_drawn_bitset(conn: Connection):
+    # Nunca se leía: el estado y las fotos necesitan el orden, que ya da drawn_sequence
+    if "drawn_bitset" in _columns(conn, "games"):
+        conn.execute(text("ALTER TABLE games DROP COLUMN drawn_bitset"))
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "users.is_admin", _users_is_admin),
+    Migration(2, "games.auto_draw_interval_seconds", _games_auto_draw_interval),
+    Migration(3, "compact binary storage", _compact_storage),
+    Migration(4, "ticket card fingerprints", _card_fingerprints),
+    Migration(5, "games.max_cards_per_user", _games_max_cards_per_user),
+    Migration(6, "hot path indexes", _hot_path_indexes),
+    Migration(7, "job_leases table", _job_leases),
+    Migration(8, "drop games.drawn_bitset", _drop_games_drawn_bitset),
+]
+
+
+# --- Runner ---
+
+def _ensure_version_table(engine: Engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_version ("
+            "version INTEGER PRIMARY KEY, name VARCHAR NOT NULL, applied_at TIMESTAMP NOT NULL)"
+        ))
+
+
+def applied_versions(engine: Engine) -> Set[int]:
+    _ensure_version_table(engine)
+    with engine.connect() as conn:
+        return {row[0] for row in conn.execute(text("SELECT version FROM schema_version"))}
+
+
+def run_migrations(engine: Engine) -> List[int]:
+    """Apply pending migrations in order; returns the versions applied."""
+    done = applied_versions(engine)
+    applied: List[int] = []
+    for m in sorted(MIGRATIONS, key=lambda m: m.version):
+        if m.version in done:
+            continue
+        with engine.begin() as conn:
+            m.apply(conn)
+            conn.execute(
+                text("INSERT INTO schema_version (version, name, applied_at) VALUES (:v, :n, :t)"),
+                {"v": m.version, "n": m.name, "t": datetime.utcnow()},
+            )
+        applied.append(m.version)
+    return applied
+
+
+def main(argv=None):
+    import argparse
+
+    from app.core.database import engine, migrate_db
+
+    parser = argparse.ArgumentParser(prog="python -m app.core.migrations", description="Migraciones de esquema")
+    parser.add_argument("command", choices=["status", "upgrade"], nargs="?", default="status")
+    args = parser.parse_args(argv)
+
+    if args.command == "upgrade":
+        applied = migrate_db()
+        print(f"Aplicadas: {applied}" if applied else "Sin migraciones pendientes")
+        return
+    done = applied_versions(engine)
+    for m in MIGRATIONS:
+        print(f"{m.version:>4}  {'aplicada ' if m.version in done else 'pendiente'}  {m.name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,62 +1,388 @@
-from typing import Dict, Set
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Protocol, Set, Tuple, Union
 from fastapi import WebSocket
-import json
+
+from app.core.bus import USER_CHANNEL, create_bus, is_game_channel
+from app.core.config import (
+    BROADCAST_BUS, BROADCAST_BUS_SOCKET, WS_REPLAY_EVENTS, WS_SEND_QUEUE_SIZE, WS_SEND_TIMEOUT_SECONDS,
+)
+from app.core.frames import binary_frame, is_final, json_frame, legacy_events
+
+
+# Contadores desde el arranque del proceso (GET /admin/ws/stats)
+_stats: Dict[str, int] = {"resyncs": 0, "dropped": 0, "send_timeouts": 0, "replays": 0, "snapshots": 0}
+
+# (seq, tipo, payload, frame JSON)
+Event = Tuple[int, str, dict, str]
+# Un frame, o varios que ocupan un solo hueco de la cola (un sorteo para un cliente legacy)
+Message = Union[str, bytes, Tuple[Union[str, bytes], ...]]
+
+
+def user_channel(user_id: str) -> str:
+    """Bus channel of one user's /ws/me sockets; it carries no game events."""
+    return USER_CHANNEL + user_id
+
+
+class Personal(Protocol):
+    """Per-connection events derived from the room events (app.services.player_feed)."""
+
+    seq: int
+
+    def initial(self) -> Message: ...
+
+    def bind(self, push: Callable[[Message], None]): ...
+
+    def apply(self, seq: Optional[int], event_type: str, data: dict) -> Optional[Message]: ...
+
+
+def _join(message: Message, extra: Optional[Message]) -> Message:
+    """Both messages in one queue slot, so a room event and its personal part are never split."""
+    if extra is None:
+        return message
+    head = message if isinstance(message, tuple) else (message,)
+    return head + (extra if isinstance(extra, tuple) else (extra,))
+
+
+class Outbox:
+    """
+    Bounded outgoing queue of one WebSocket, drained by its own writer task.
+
+    Broadcasts only enqueue, so a slow client never delays the others. When
+    the queue overflows, the pending messages are replaced by a single
+    `resync` message (the client must reload the state over HTTP); if it
+    overflows again before that message went out, or a send takes longer
+    than WS_SEND_TIMEOUT_SECONDS, the connection is dropped.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        resync: str,
+        on_close: Callable[[WebSocket], None],
+        protocol: str = "json",
+        legacy: bool = False,
+    ):
+        self.websocket = websocket
+        self.protocol = protocol
+        self.legacy = legacy
+        self.queue: asyncio.Queue = asyncio.Queue(WS_SEND_QUEUE_SIZE)
+        self._resync = resync
+        self._resync_pending = False
+        self._on_close = on_close
+        self._closed = False
+        self._task = asyncio.create_task(self._run())
+
+    def push(self, message: Message):
+        if self._closed:
+            return
+        try:
+            self.queue.put_nowait(message)
+            return
+        except asyncio.QueueFull:
+            pass
+        if self._resync_pending:
+            self.drop()
+            return
+        # Lo pendiente ya no sirve: el cliente recarga el estado completo
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(self._resync)
+        self._resync_pending = True
+        _stats["resyncs"] += 1
+
+    async def _run(self):
+        try:
+            # wait_for puede tragarse la cancelación si el envío acaba a la vez: se mira _closed
+            while not self._closed:
+                message = await self.queue.get()
+                for frame in message if isinstance(message, tuple) else (message,):
+                    send = self.websocket.send_bytes if isinstance(frame, bytes) else self.websocket.send_text
+                    await asyncio.wait_for(send(frame), WS_SEND_TIMEOUT_SECONDS)
+                if message is self._resync:
+                    self._resync_pending = False
+        except asyncio.TimeoutError:
+            _stats["send_timeouts"] += 1
+            self.drop()
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            # conexión cerrada
+            self.close()
+
+    def close(self):
+        """Stop the writer and forget the connection (it is already gone)."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._task is not asyncio.current_task():
+            self._task.cancel()
+        self._on_close(self.websocket)
+
+    def drop(self):
+        """Disconnect a client that cannot keep up (1013: try again later)."""
+        if self._closed:
+            return
+        self.close()
+        _stats["dropped"] += 1
+        asyncio.create_task(self._close_socket())
+
+    async def _close_socket(self):
+        try:
+            await asyncio.wait_for(self.websocket.close(code=1013, reason="Slow consumer"), WS_SEND_TIMEOUT_SECONDS)
+        except Exception:
+            pass
+
+
+class GameHistory:
+    """
+    The last WS_REPLAY_EVENTS sequenced events of one game room, with no gaps.
+
+    A jump in the sequence (events this worker missed, a new bus
+    generation) or an event without sequence empties it, so whatever it
+    holds can be replayed as is.
+    """
+
+    def __init__(self):
+        self.events: Deque[Event] = deque(maxlen=WS_REPLAY_EVENTS)
+        self.last_seq = 0
+
+    def add(self, seq: Optional[int], event_type: str, data: dict, text: str):
+        if seq is None or seq != self.last_seq + 1:
+            self.events.clear()
+        if seq is not None:
+            self.events.append((seq, event_type, data, text))
+            self.last_seq = seq
+
+    def since(self, seq: int) -> Optional[List[Event]]:
+        """Events after `seq`, or None if some of them are no longer here."""
+        if seq == self.last_seq and seq:
+            return []
+        if not self.events or not self.events[0][0] - 1 <= seq < self.last_seq:
+            return None
+        return [event for event in self.events if event[0] > seq]
 
 
 class ConnectionManager:
     """Manages WebSocket connections organized by game rooms."""
-    
+
     def __init__(self):
         # game_id -> set of WebSocket connections
         self.active_connections: Dict[str, Set[WebSocket]] = {}
-    
-    async def connect(self, websocket: WebSocket, game_id: str):
-        """Accept connection and add to game room."""
+        # canal de usuario -> sus sockets de /ws/me (índice aparte: solo se entra autenticado)
+        self.user_connections: Dict[str, Set[WebSocket]] = {}
+        # cola de salida de cada conexión
+        self.outboxes: Dict[WebSocket, Outbox] = {}
+        # eventos recientes de cada partida, para reanudar con ?since=
+        self.history: Dict[str, GameHistory] = {}
+        # eventos propios de las conexiones autenticadas (cartones del jugador)
+        self.personal: Dict[WebSocket, Personal] = {}
+        # quienes siguen todos los eventos entregados a este worker (el lobby)
+        self.observers: List[Callable[[str, str, dict], None]] = []
+        # los eventos pasan por el bus para llegar también a los sockets de otros workers
+        self.bus = create_bus(BROADCAST_BUS, BROADCAST_BUS_SOCKET, self._deliver)
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        game_id: str,
+        protocol: str = "json",
+        since: Optional[int] = None,
+        snapshot: Optional[Callable[[], Awaitable[Optional[dict]]]] = None,
+        legacy: bool = False,
+        personal: Optional[Personal] = None,
+    ):
+        """
+        Accept connection and add to game room; `protocol` is the wire format
+        and `legacy` the event mode (app.core.frames).
+
+        `personal` adds this connection's own events: its initial frame goes
+        first, then it sees every room event from `personal.seq` on and its
+        frames travel with the room event that produced them.
+
+        With `since`, the client first gets the room events after that
+        sequence number; if this worker no longer has all of them, it gets
+        a `snapshot` event built by `snapshot()` instead, followed by the
+        events delivered while it was being built.
+        """
+        if not is_game_channel(game_id):
+            raise ValueError(f"'{game_id}' no es una sala de partida")
         await websocket.accept()
+        resync = json_frame("resync", {"game_id": game_id, "reason": "slow_consumer"})
+        outbox = Outbox(websocket, resync, lambda ws: self._forget(ws, game_id), protocol, legacy)
+        self.outboxes[websocket] = outbox
+        if personal is not None:
+            self.personal[websocket] = personal
+            personal.bind(outbox.push)
+            outbox.push(personal.initial())
+        if since is not None:
+            history = self.history.get(game_id) or GameHistory()
+            missed = history.since(since)
+            if missed is None and snapshot is not None:
+                seq = history.last_seq
+                state = await snapshot()
+                if self.outboxes.get(websocket) is not outbox:
+                    return
+                if state is not None:
+                    outbox.push(json_frame("snapshot", state, seq))
+                    _stats["snapshots"] += 1
+                # Lo entregado mientras se leía el estado puede repetir algo ya incluido
+                current = self.history.get(game_id)
+                missed = [event for event in current.events if event[0] > seq] if current is not None else None
+            elif missed:
+                _stats["replays"] += 1
+            for seq, event_type, data, text in missed or ():
+                message = self._encode(outbox.protocol, outbox.legacy, game_id, seq, event_type, data, text)
+                if personal is not None and seq > personal.seq:
+                    message = _join(message, personal.apply(seq, event_type, data))
+                    personal.seq = seq
+                outbox.push(message)
+        if personal is not None:
+            # Lo llegado desde que se cargaron sus cartones, aunque no se repitan los eventos de la sala
+            current = self.history.get(game_id)
+            for seq, event_type, data, _ in list(current.events) if current is not None else ():
+                if seq > personal.seq:
+                    extra = personal.apply(seq, event_type, data)
+                    if extra is not None:
+                        outbox.push(extra)
+        # Sin esperas desde la repetición: los eventos en directo van justo detrás
         if game_id not in self.active_connections:
             self.active_connections[game_id] = set()
         self.active_connections[game_id].add(websocket)
-    
-    def disconnect(self, websocket: WebSocket, game_id: str):
-        """Remove connection from game room."""
+
+    async def connect_user(self, websocket: WebSocket, user_id: str):
+        """Accept an authenticated /ws/me connection and index it by its user."""
+        await websocket.accept()
+        channel = user_channel(user_id)
+        resync = json_frame("resync", {"reason": "slow_consumer"})
+        self.outboxes[websocket] = Outbox(websocket, resync, lambda ws: self._forget_user(ws, channel))
+        self.user_connections.setdefault(channel, set()).add(websocket)
+
+    def last_seq(self, game_id: str) -> int:
+        """Sequence number of the last event of the room seen by this worker (0 if none)."""
+        history = self.history.get(game_id)
+        return history.last_seq if history is not None else 0
+
+    def _forget(self, websocket: WebSocket, game_id: str):
+        self.outboxes.pop(websocket, None)
+        self.personal.pop(websocket, None)
         if game_id in self.active_connections:
             self.active_connections[game_id].discard(websocket)
             if not self.active_connections[game_id]:
                 del self.active_connections[game_id]
-    
+
+    def _forget_user(self, websocket: WebSocket, channel: str):
+        self.outboxes.pop(websocket, None)
+        connections = self.user_connections.get(channel)
+        if connections is not None:
+            connections.discard(websocket)
+            if not connections:
+                del self.user_connections[channel]
+
+    def disconnect_user(self, websocket: WebSocket, user_id: str):
+        """Remove a /ws/me connection."""
+        outbox = self.outboxes.get(websocket)
+        if outbox is not None:
+            outbox.close()
+        else:
+            self._forget_user(websocket, user_channel(user_id))
+
+    def disconnect(self, websocket: WebSocket, game_id: str):
+        """Remove connection from game room."""
+        outbox = self.outboxes.get(websocket)
+        if outbox is not None:
+            outbox.close()
+        else:
+            self._forget(websocket, game_id)
+
     async def broadcast_to_game(self, game_id: str, event_type: str, data: dict):
-        """Send message to all connections in a game room."""
-        message = json.dumps({
-            "type": event_type,
-            "payload": data
-        })
-        
-        if game_id in self.active_connections:
-            disconnected = set()
-            for connection in self.active_connections[game_id]:
-                try:
-                    await connection.send_text(message)
-                except Exception:
-                    disconnected.add(connection)
-            # Clean up disconnected clients
-            for conn in disconnected:
-                self.active_connections[game_id].discard(conn)
-    
+        """Publish an event to a game room on every worker (app.core.bus)."""
+        await self.bus.publish(game_id, event_type, data)
+
+    async def notify_user(self, user_id: str, event_type: str, data: dict):
+        """Publish an event to every /ws/me socket of a user, on every worker."""
+        await self.bus.publish(user_channel(user_id), event_type, data)
+
+    async def _deliver(self, game_id: str, seq: Optional[int], event_type: str, data: dict):
+        """Queue an event for this worker's connections in the room; does not wait for the sends."""
+        # Cada formato se codifica una sola vez y los mismos frames van a todas las colas
+        text = json_frame(event_type, data, seq)
+        if not is_game_channel(game_id):
+            # Canal de un usuario, del lobby o del scheduler: nunca llega a las salas de /ws/games
+            for connection in list(self.user_connections.get(game_id, ())):
+                outbox = self.outboxes.get(connection)
+                if outbox is not None:
+                    outbox.push(text)
+            for observer in self.observers:
+                observer(game_id, event_type, data)
+            return
+        encoded: Dict[Tuple[str, bool], Message] = {("json", False): text}
+        for connection in list(self.active_connections.get(game_id, ())):
+            outbox = self.outboxes.get(connection)
+            if outbox is None:
+                continue
+            key = (outbox.protocol, outbox.legacy)
+            message = encoded.get(key)
+            if message is None:
+                message = encoded[key] = self._encode(
+                    outbox.protocol, outbox.legacy, game_id, seq, event_type, data, text,
+                )
+            personal = self.personal.get(connection)
+            if personal is not None:
+                message = _join(message, personal.apply(seq, event_type, data))
+            outbox.push(message)
+        for observer in self.observers:
+            observer(game_id, event_type, data)
+        if is_final(event_type, data):
+            self.history.pop(game_id, None)
+        else:
+            self.history.setdefault(game_id, GameHistory()).add(seq, event_type, data, text)
+
+    @staticmethod
+    def _encode(
+        protocol: str, legacy: bool, game_id: str, seq: Optional[int], event_type: str, data: dict, text: str,
+    ) -> Message:
+        """Frames of one room event for a connection with this protocol and event mode."""
+        if not legacy and protocol == "json":
+            return text
+        messages: List[Union[str, bytes]] = []
+        for name, payload in (legacy_events(game_id, event_type, data) if legacy else [(event_type, data)]):
+            packed = binary_frame(name, payload, seq) if protocol == "binary" else None
+            if packed is not None:
+                messages.append(packed)
+            elif payload is data:
+                messages.append(text)
+            else:
+                messages.append(json_frame(name, payload, seq))
+        return messages[0] if len(messages) == 1 else tuple(messages)
+
     async def send_personal(self, websocket: WebSocket, event_type: str, data: dict):
         """Send message to a specific connection."""
-        message = json.dumps({
-            "type": event_type,
-            "payload": data
-        })
-        try:
-            await websocket.send_text(message)
-        except Exception:
-            pass
-    
+        outbox = self.outboxes.get(websocket)
+        if outbox is not None:
+            outbox.push(json_frame(event_type, data))
+
     def get_connection_count(self, game_id: str) -> int:
         """Get number of active connections in a game room."""
         return len(self.active_connections.get(game_id, set()))
 
 
+def fanout_stats() -> Dict[str, int]:
+    """Overflow counters plus open game connections and queued messages of this worker."""
+    outboxes = list(manager.outboxes.values())
+    return {
+        "connections": len(outboxes),
+        "rooms": len(manager.active_connections),
+        "users": len(manager.user_connections),
+        "replay_rooms": len(manager.history),
+        "queued": sum(o.queue.qsize() for o in outboxes),
+        "queue_size": WS_SEND_QUEUE_SIZE,
+        "bus": BROADCAST_BUS,
+        "bus_hosting": getattr(manager.bus, "hosting", False),
+        "bus_connected": manager.bus.connected.is_set() if hasattr(manager.bus, "connected") else True,
+        **_stats,
+    }
+
+
 # Global instance
 manager = ConnectionManager()
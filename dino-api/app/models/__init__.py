@@ -3,6 +3,7 @@ from .wallet import Wallet
 from .game import Game
 from .ticket import Ticket
 from .transaction import Transaction
+from .job_lease import JobLease
 
 __all__ = [
     "User",
@@ -10,4 +11,5 @@ __all__ = [
     "Game",
     "Ticket",
     "Transaction",
+    "JobLease",
 ]
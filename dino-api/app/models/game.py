@@ -1,10 +1,16 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
 from typing import Optional, ClassVar, Any
 from uuid import uuid4
 from datetime import datetime
 
 class Game(SQLModel, table=True):
     __tablename__: ClassVar[Any] = "games"  # nombre de tabla explícito
+    # Índices de las consultas frecuentes (ver app.core.migrations)
+    __table_args__ = (
+        Index("ix_games_status_created", "status", "created_at"),
+        Index("ix_games_creator_status", "creator_id", "status"),
+    )
     id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
     creator_id: str
     price: float
@@ -18,9 +24,12 @@ class Game(SQLModel, table=True):
     autostart_delay_minutes: Optional[int] = None
     reached_threshold_at: Optional[datetime] = None  # When autostart threshold was reached
     commission_percent: float = 10.0
+    auto_draw_interval_seconds: Optional[int] = None  # Sorteo automático por el servidor (None = manual)
+    max_cards_per_user: int = 2  # Cartones que puede comprar cada jugador
 
     # Estado de sorteo y pago de premios
-    drawn_numbers: Optional[str] = None  # JSON list de ints (1..75)
+    drawn_sequence: Optional[bytes] = None  # bolas sorteadas en orden, 1 byte por bola (app.core.codecs)
+    draw_plan: Optional[bytes] = None  # orden completo de las 75 bolas (secreto hasta FINISHED)
     last_drawn_at: Optional[datetime] = None
     finished_at: Optional[datetime] = None
     paid_diagonal: bool = False
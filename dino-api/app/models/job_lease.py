@@ -0,0 +1,11 @@
+from sqlmodel import SQLModel, Field
+from typing import Optional, ClassVar, Any
+from datetime import datetime
+
+
+class JobLease(SQLModel, table=True):
+    """Lease that elects a single worker to run the background jobs."""
+    __tablename__: ClassVar[Any] = "job_leases"
+    name: str = Field(primary_key=True)
+    owner: Optional[str] = None  # id del worker que la tiene
+    expires_at: datetime  # sin renovar antes de esta hora, otro worker puede tomarla
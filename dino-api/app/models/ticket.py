@@ -1,15 +1,23 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import BigInteger, Index
 from typing import Optional, ClassVar, Any
 from uuid import uuid4
 
 class Ticket(SQLModel, table=True):
     __tablename__: ClassVar[Any] = "tickets"
+    # Un mismo cartón no puede repetirse dentro de una partida
+    __table_args__ = (
+        Index("ux_tickets_game_fingerprint", "game_id", "fingerprint", unique=True),
+        Index("ix_tickets_game_user", "game_id", "user_id"),  # tope de cartones por jugador
+        Index("ix_tickets_user", "user_id"),
+    )
     id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
     # FK deben coincidir con los __tablename__ de los modelos referenciados
     game_id: str = Field(foreign_key="games.id")
     user_id: str = Field(foreign_key="users.id")
-    numbers: str  # JSON string con la matriz 5x5
+    card: bytes  # matriz 5x5 en 25 bytes, fila a fila (app.core.codecs)
+    fingerprint: Optional[int] = Field(default=None, sa_type=BigInteger)  # hash del cartón (NULL = duplicado heredado)
     refunded: bool = False
     # Registro de premios
     payout: float = 0.0
-    wins: Optional[str] = None  # JSON list de strings ["DIAGONAL","LINE","BINGO"]
+    win_flags: int = 0  # bitflag DIAGONAL=1, LINE=2, BINGO=4
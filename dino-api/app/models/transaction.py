@@ -4,12 +4,14 @@ from uuid import uuid4
 from datetime import datetime
 
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
 
 TransactionType = Literal["deposit", "withdraw", "purchase", "prize", "refund"]
 
 
 class Transaction(SQLModel, table=True):
     __tablename__: ClassVar[Any] = "transactions"
+    __table_args__ = (Index("ix_transactions_user_created", "user_id", "created_at"),)
 
     id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
     user_id: str = Field(foreign_key="users.id", index=True)
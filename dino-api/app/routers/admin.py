@@ -1,15 +1,20 @@
 from fastapi import APIRouter, Depends, Header, HTTPException
 from typing import Optional, List
+from anyio import from_thread
 from sqlmodel import Session, select, func
 from datetime import datetime, timedelta
 
+from app.core.codecs import decode_balls
 from app.core.database import get_session
 from app.core.security import get_user_id_from_bearer
+from app.core.websocket import fanout_stats, manager
 from app.models.user import User
 from app.models.wallet import Wallet
 from app.models.game import Game
 from app.models.ticket import Ticket
 from app.models.transaction import Transaction
+from app.services.cards import generation_stats
+from app.services.leader import lease_metrics
 
 
 router = APIRouter(prefix="/admin", tags=["admin"])
@@ -188,6 +193,51 @@ def get_admin_games(
     return {"items": result}
 
 
+@router.get("/games/{game_id}/draw-order")
+def get_game_draw_order(
+    game_id: str,
+    admin: User = Depends(_admin_auth),
+    session: Session = Depends(get_session),
+):
+    """Audit: reveal the draw order fixed at start, only once the game is FINISHED."""
+    game = session.get(Game, game_id)
+    if not game:
+        raise HTTPException(status_code=404, detail="Juego no encontrado")
+    if game.status != "FINISHED":
+        raise HTTPException(status_code=409, detail="El orden de sorteo solo se revela al finalizar la partida")
+
+    return {
+        "game_id": game.id,
+        "draw_order": decode_balls(game.draw_plan),
+        "drawn_numbers": decode_balls(game.drawn_sequence),
+        "finished_at": game.finished_at.isoformat() if game.finished_at else None,
+    }
+
+
+@router.get("/cards/collisions")
+def get_card_collision_stats(
+    admin: User = Depends(_admin_auth),
+    session: Session = Depends(get_session),
+):
+    """Card generation retries since process start, and legacy duplicate cards."""
+    legacy_duplicates = session.exec(
+        select(func.count()).select_from(Ticket).where(Ticket.fingerprint == None)
+    ).one()
+    return {**generation_stats(), "legacy_duplicates": legacy_duplicates}
+
+
+@router.get("/jobs/lease")
+def get_jobs_lease(admin: User = Depends(_admin_auth)):
+    """Background jobs leader lease, as seen by the worker answering the request."""
+    return lease_metrics()
+
+
+@router.get("/ws/stats")
+def get_ws_stats(admin: User = Depends(_admin_auth)):
+    """WebSocket fan-out of the worker answering the request: connections, queued messages, resyncs and drops."""
+    return fanout_stats()
+
+
 @router.get("/transactions")
 def get_admin_transactions(
     admin: User = Depends(_admin_auth),
@@ -287,6 +337,21 @@ def get_admin_activity(
     return {"items": result}
 
 
+def _notify_wallet(session: Session, txn: Transaction, amount: float):
+    """Tell the owner's /ws/me sockets how the decision left their balance."""
+    wallet = session.exec(select(Wallet).where(Wallet.user_id == txn.user_id)).first()
+    try:
+        from_thread.run(manager.notify_user, txn.user_id, "wallet", {
+            "reason": f"{txn.type}_{txn.status}",
+            "transaction_id": txn.id,
+            "amount": amount,
+            "balance": float(wallet.balance) if wallet else 0.0,
+        })
+    except RuntimeError:
+        # fuera de un worker thread (sin event loop disponible)
+        pass
+
+
 @router.post("/transactions/{txn_id}/approve")
 def approve_transaction(
     txn_id: str,
@@ -316,6 +381,7 @@ def approve_transaction(
     txn.status = "approved"
     session.add(txn)
     session.commit()
+    _notify_wallet(session, txn, txn.amount if txn.type == "deposit" else 0.0)
     
     return {"status": "approved"}
 
@@ -349,5 +415,6 @@ def reject_transaction(
     txn.status = "rejected"
     session.add(txn)
     session.commit()
+    _notify_wallet(session, txn, abs(txn.amount) if txn.type == "withdraw" else 0.0)
     
     return {"status": "rejected"}
@@ -1,22 +1,27 @@
 from fastapi import APIRouter, Depends, Header, HTTPException, BackgroundTasks
-from typing import Optional, List, Tuple
+from anyio import from_thread
+from typing import Optional, List
 from uuid import UUID
+from datetime import datetime
 
-from sqlmodel import select, Session
+from sqlmodel import select, Session, update
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.schemas import Game as GameSchema, GameCreate, GameState, DrawResponse, WinnerOut
+from app.schemas import Game as GameSchema, GameCreate, GameState, DrawResponse
 from app.models.game import Game as GameModel
-from app.core.database import get_session
+from app.core.database import get_async_session, get_session
 from app.core.security import get_user_id_from_bearer
 from app.core.websocket import manager
+from app.core.codecs import decode_balls, decode_card, decode_wins, encode_balls
 from app.models.user import User
 from app.models.ticket import Ticket as TicketModel
-from app.models.wallet import Wallet
-from app.models.transaction import Transaction
-import json
-import random
+from app.services.bingo import shuffled_draw_order
+from app.services.lobby import announce_game
+from app.services.refunds import broadcast_refund, refund_game
+from app.services.draws import DrawError, broadcast_draw, draw_lock, perform_draw
+from app.services.scheduler import next_check_at, schedule_auto_draw, schedule_game_check
+from app.services.runtime import get_runtime, load_runtime
 import asyncio
-from datetime import datetime
 
 
 router = APIRouter(prefix="/games", tags=["games"])
@@ -37,6 +42,7 @@ def _to_schema(m: GameModel) -> GameSchema:
         min_tickets=m.min_tickets,
         status=m.status,
         sold_tickets=m.sold_tickets,
+        max_cards_per_user=m.max_cards_per_user or 2,
     )
 
 
@@ -117,16 +123,27 @@ def create_game(payload: GameCreate, user_id: str = Depends(auth), session: Sess
         autostart_enabled=payload.autostart_enabled,
         autostart_threshold=payload.autostart_threshold,
         autostart_delay_minutes=payload.autostart_delay_minutes,
+        auto_draw_interval_seconds=payload.auto_draw_interval_seconds,
+        max_cards_per_user=payload.max_cards_per_user,
     )
     session.add(m)
     session.commit()
     session.refresh(m)
+    # plazo de expiración / autoinicio en el scheduler
+    when = next_check_at(m, datetime.utcnow())
+    if when is not None:
+        schedule_game_check(m.id, when)
+    try:
+        from_thread.run(announce_game, m)
+    except RuntimeError:
+        # fuera de un worker thread (sin event loop disponible)
+        pass
     return _to_schema(m)
 
 
 @router.post("/{game_id}/start", response_model=GameSchema)
-async def start_game(game_id: str, user_id: str = Depends(auth), session: Session = Depends(get_session)):
-    g = session.get(GameModel, game_id)
+async def start_game(game_id: str, user_id: str = Depends(auth), session: AsyncSession = Depends(get_async_session)):
+    g = await session.get(GameModel, game_id)
     if not g:
         raise HTTPException(status_code=404, detail="Juego no encontrado")
     if g.creator_id != user_id:
@@ -135,10 +152,22 @@ async def start_game(game_id: str, user_id: str = Depends(auth), session: Sessio
         raise HTTPException(status_code=409, detail="Estado incompatible para iniciar")
     if (g.sold_tickets or 0) < g.min_tickets:
         raise HTTPException(status_code=409, detail="Aún no se alcanzó el mínimo de cartones")
-    g.status = "RUNNING"
-    session.add(g)
-    session.commit()
-    session.refresh(g)
+    # Orden de sorteo fijado al iniciar; se guarda en servidor y no se expone hasta FINISHED.
+    # Paso condicionado a OPEN: con el housekeeper o otra petición iniciando a la vez,
+    # solo uno lo aplica y solo ese construye el runtime
+    result = await session.exec(
+        update(GameModel)
+        .where((GameModel.id == game_id) & (GameModel.status == "OPEN"))
+        .values(status="RUNNING", draw_plan=encode_balls(shuffled_draw_order()))
+    )
+    await session.commit()
+    if result.rowcount != 1:
+        raise HTTPException(status_code=409, detail="Estado incompatible para iniciar")
+    await session.refresh(g)
+    # Los cartones ya no cambian: la partida queda residente en memoria para los sorteos
+    await load_runtime(session, g)
+    if g.auto_draw_interval_seconds:
+        schedule_auto_draw(g.id, g.auto_draw_interval_seconds)
     
     # Broadcast game started
     await manager.broadcast_to_game(game_id, "game_started", {
@@ -150,9 +179,9 @@ async def start_game(game_id: str, user_id: str = Depends(auth), session: Sessio
 
 
 @router.post("/{game_id}/cancel", response_model=GameSchema)
-async def cancel_game(game_id: str, user_id: str = Depends(auth), session: Session = Depends(get_session)):
+async def cancel_game(game_id: str, user_id: str = Depends(auth), session: AsyncSession = Depends(get_async_session)):
     """Cancel a game. Only the creator can cancel. Refunds all ticket buyers."""
-    g = session.get(GameModel, game_id)
+    g = await session.get(GameModel, game_id)
     if not g:
         raise HTTPException(status_code=404, detail="Juego no encontrado")
     if g.creator_id != user_id:
@@ -161,105 +190,22 @@ async def cancel_game(game_id: str, user_id: str = Depends(auth), session: Sessi
         raise HTTPException(status_code=409, detail="No se puede cancelar una partida en curso o finalizada")
     
     # Refund all tickets
-    tickets = session.exec(select(TicketModel).where(TicketModel.game_id == g.id)).all()
-    for t in tickets:
-        if not t.refunded:
-            wallet = session.exec(select(Wallet).where(Wallet.user_id == t.user_id)).first()
-            if wallet:
-                wallet.balance = float(wallet.balance or 0) + float(g.price)
-                session.add(wallet)
-                # Create refund transaction
-                txn = Transaction(
-                    user_id=t.user_id,
-                    type="refund",
-                    amount=float(g.price),
-                    description=f"Reembolso por cancelación · Partida #{g.id[:8]}",
-                    reference_id=g.id,
-                )
-                session.add(txn)
-            t.refunded = True
-            session.add(t)
-    
-    g.status = "CANCELLED"
-    session.add(g)
-    session.commit()
-    session.refresh(g)
+    refund = await session.run_sync(refund_game, g)
+    if refund is None:
+        # Otra petición o el housekeeper la inició o canceló entre la lectura y el UPDATE
+        await session.rollback()
+        raise HTTPException(status_code=409, detail="No se puede cancelar una partida en curso o finalizada")
+    await session.commit()
+    await session.refresh(g)
     
-    # Broadcast cancellation
-    await manager.broadcast_to_game(game_id, "game_cancelled", {
-        "game_id": game_id,
-        "status": g.status,
-        "refunded_tickets": len(tickets)
-    })
+    # Broadcast cancellation (and each buyer's refund)
+    await broadcast_refund(refund)
     
     return _to_schema(g)
 
 
 def _get_drawn_numbers(g: GameModel) -> List[int]:
-    if not g.drawn_numbers:
-        return []
-    try:
-        arr = json.loads(g.drawn_numbers)
-        return [int(x) for x in arr if isinstance(x, int) or (isinstance(x, str) and x.isdigit())]
-    except Exception:
-        return []
-
-
-def _set_drawn_numbers(g: GameModel, nums: List[int]):
-    g.drawn_numbers = json.dumps(nums)
-    g.last_drawn_at = datetime.utcnow()
-
-
-def _ticket_grid(t: TicketModel) -> List[List[int]]:
-    try:
-        data = json.loads(t.numbers)
-        # asegurar 5x5 ints
-        grid: List[List[int]] = []
-        for i in range(5):
-            row_src = data[i] if i < len(data) and isinstance(data[i], list) else []
-            row: List[int] = []
-            for j in range(5):
-                v = row_src[j] if j < len(row_src) else 0
-                row.append(int(v))
-            grid.append(row)
-        return grid
-    except Exception:
-        return [[0]*5 for _ in range(5)]
-
-
-def _has_any_diagonal(grid: List[List[int]], drawn: set[int]) -> bool:
-    diag1 = all(grid[i][i] in drawn or grid[i][i] == 0 for i in range(5))
-    diag2 = all(grid[i][4-i] in drawn or grid[i][4-i] == 0 for i in range(5))
-    return diag1 or diag2
-
-
-def _has_any_line(grid: List[List[int]], drawn: set[int]) -> bool:
-    # horizontal lines
-    for i in range(5):
-        if all(grid[i][j] in drawn or grid[i][j] == 0 for j in range(5)):
-            return True
-    # vertical lines
-    for j in range(5):
-        if all(grid[i][j] in drawn or grid[i][j] == 0 for i in range(5)):
-            return True
-    return False
-
-
-def _is_bingo(grid: List[List[int]], drawn: set[int]) -> bool:
-    return all(grid[i][j] in drawn or grid[i][j] == 0 for i in range(5) for j in range(5))
-
-
-def _prize_pool(g: GameModel) -> Tuple[float, float, float]:
-    gross = float(g.sold_tickets or 0) * float(g.price)
-    commission = gross * (float(g.commission_percent) / 100.0)
-    pool = gross - commission
-    return gross, commission, pool
-
-
-def _default_scheme():
-    # 20% Diagonal, 20% Linea, 50% Bingo (90% of pool)
-    # 5% Creator + 5% System = 10% commission (already deducted in _prize_pool)
-    return {"DIAGONAL": 22.22, "LINE": 22.22, "BINGO": 55.56}  # Percentages of the 90% prize pool
+    return decode_balls(g.drawn_sequence)
 
 
 @router.get("/{game_id}/state", response_model=GameState)
@@ -280,153 +226,28 @@ def game_state(game_id: str, session: Session = Depends(get_session)):
 
 
 @router.post("/{game_id}/draw", response_model=DrawResponse)
-async def draw_number(game_id: str, user_id: str = Depends(auth), session: Session = Depends(get_session)):
-    g = session.get(GameModel, game_id)
-    if not g:
-        raise HTTPException(status_code=404, detail="Juego no encontrado")
-    if g.creator_id != user_id:
-        raise HTTPException(status_code=403, detail="Solo el creador puede sortear")
-    if g.status != "RUNNING":
-        raise HTTPException(status_code=409, detail="El juego no está en ejecución")
-
-    drawn = _get_drawn_numbers(g)
-    if len(drawn) >= 75:
-        raise HTTPException(status_code=409, detail="No quedan números por sortear")
-
-    remaining = [n for n in range(1, 76) if n not in set(drawn)]
-    num = random.choice(remaining)
-    drawn.append(num)
-    _set_drawn_numbers(g, drawn)
-
-    winners: List[WinnerOut] = []
-    drawn_set = set(drawn)
-    _, _, pool = _prize_pool(g)
-    scheme = _default_scheme()
+async def draw_number(game_id: str, user_id: str = Depends(auth), session: AsyncSession = Depends(get_async_session)):
+    async with draw_lock(game_id):
+        # Estado residente de la partida; solo se lee de la BD tras un reinicio
+        rt = await get_runtime(session, game_id)
+        if rt is None:
+            g = await session.get(GameModel, game_id)
+            if not g:
+                raise HTTPException(status_code=404, detail="Juego no encontrado")
+            if g.creator_id != user_id:
+                raise HTTPException(status_code=403, detail="Solo el creador puede sortear")
+            raise HTTPException(status_code=409, detail="El juego no está en ejecución")
+        if rt.creator_id != user_id:
+            raise HTTPException(status_code=403, detail="Solo el creador puede sortear")
 
-    # Candidatos
-    tickets = session.exec(select(TicketModel).where(TicketModel.game_id == g.id)).all()
-
-    def award(category: str, predicate):
-        nonlocal winners
-        cat_flag_name = {
-            "DIAGONAL": "paid_diagonal",
-            "LINE": "paid_line",
-            "BINGO": "paid_bingo",
-        }[category]
-        if getattr(g, cat_flag_name):
-            return
-        hits: List[TicketModel] = []
-        for t in tickets:
-            grid = _ticket_grid(t)
-            try:
-                ok = predicate(grid, drawn_set)
-            except Exception:
-                ok = False
-            if ok:
-                hits.append(t)
-        if not hits:
-            return
-        # pagar por partes iguales
-        slice_amount = pool * (scheme[category] / 100.0)
-        per_winner = slice_amount / len(hits)
-        for t in hits:
-            w = session.exec(select(Wallet).where(Wallet.user_id == t.user_id)).first()
-            if w:
-                w.balance = float(w.balance or 0.0) + per_winner
-                session.add(w)
-                # Create prize transaction
-                prize_txn = Transaction(
-                    user_id=t.user_id,
-                    type="prize",
-                    amount=per_winner,
-                    description=f"Premio {category} · Partida #{g.id[:8]}",
-                    reference_id=g.id,
-                )
-                session.add(prize_txn)
-            # acumular payout y wins
-            t.payout = float(t.payout or 0.0) + per_winner
-            try:
-                winlist = json.loads(t.wins) if t.wins else []
-            except Exception:
-                winlist = []
-            if category not in winlist:
-                winlist.append(category)
-            t.wins = json.dumps(winlist)
-            session.add(t)
-            
-            # Fetch user for username
-            user = session.exec(select(User).where(User.id == t.user_id)).first()
-            username = user.alias if user and user.alias else (user.email.split('@')[0] if user else "Jugador")
-            
-            winners.append(WinnerOut(
-                ticket_id=t.id, 
-                user_id=t.user_id, 
-                username=username,
-                amount=per_winner, 
-                category=category
-            ))
-        setattr(g, cat_flag_name, True)
+        try:
+            outcome = await session.run_sync(perform_draw, rt)
+        except DrawError as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        await broadcast_draw(outcome)
 
-    # Premiación: primero diagonales, luego líneas, y bingo cierra el juego
-    award("DIAGONAL", _has_any_diagonal)
-    award("LINE", _has_any_line)
-    award("BINGO", _is_bingo)
-
-    if g.paid_bingo:
-        g.status = "FINISHED"
-        g.finished_at = datetime.utcnow()
-        
-        # Distribute commission to the creator (5% of gross to creator, 5% stays as system revenue)
-        gross, commission, _ = _prize_pool(g)
-        creator_commission = commission * 0.5  # Half of 10% = 5% for creator
-        
-        if creator_commission > 0:
-            creator_wallet = session.exec(select(Wallet).where(Wallet.user_id == g.creator_id)).first()
-            if creator_wallet:
-                creator_wallet.balance = float(creator_wallet.balance or 0) + creator_commission
-                session.add(creator_wallet)
-                
-                # Create commission transaction for creator
-                commission_txn = Transaction(
-                    user_id=g.creator_id,
-                    type="commission",
-                    amount=creator_commission,
-                    description=f"Comisión de creador · Partida #{g.id[:8]}",
-                    reference_id=g.id,
-                )
-                session.add(commission_txn)
-
-    session.add(g)
-    session.commit()
-    session.refresh(g)
-    
-    # Broadcast number drawn
-    await manager.broadcast_to_game(game_id, "number_drawn", {
-        "number": num,
-        "drawn_numbers": drawn,
-        "paid_diagonal": g.paid_diagonal,
-        "paid_line": g.paid_line,
-        "paid_bingo": g.paid_bingo,
-    })
-    
-    # Broadcast winners
-    for w in winners:
-        await manager.broadcast_to_game(game_id, "winner", {
-            "ticket_id": w.ticket_id,
-            "user_id": w.user_id,
-            "username": w.username,
-            "amount": w.amount,
-            "category": w.category,
-        })
-    
-    # Broadcast game finished if needed
-    if g.status == "FINISHED":
-        await manager.broadcast_to_game(game_id, "game_finished", {
-            "game_id": game_id,
-            "status": g.status,
-        })
-    
-    return DrawResponse(number=num, paid_diagonal=g.paid_diagonal, paid_line=g.paid_line, paid_bingo=g.paid_bingo, winners=winners)
+    paid = outcome.paid
+    return DrawResponse(number=outcome.number, paid_diagonal=paid["DIAGONAL"], paid_line=paid["LINE"], paid_bingo=paid["BINGO"], winners=outcome.winners)
 
 
 @router.get("/{game_id}/my-tickets")
@@ -444,16 +265,12 @@ def my_tickets_for_game(game_id: str, user_id: str = Depends(auth), session: Ses
     
     result = []
     for t in tickets:
-        try:
-            nums = json.loads(t.numbers)
-        except Exception:
-            nums = []
         result.append({
             "id": t.id,
             "game_id": t.game_id,
-            "numbers": nums,
+            "numbers": decode_card(t.card),
             "payout": t.payout,
-            "wins": json.loads(t.wins) if t.wins else [],
+            "wins": decode_wins(t.win_flags),
         })
     
     return {"items": result}
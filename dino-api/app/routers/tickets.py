@@ -1,17 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Query
 from typing import Optional, List
+from anyio import from_thread
 from sqlmodel import Session, select
-import json
 
+from app.core.codecs import decode_card, encode_card
 from app.core.database import get_session
 from app.core.security import get_user_id_from_bearer
+from app.core.websocket import manager
 from app.models.ticket import Ticket as TicketModel
-from app.models.game import Game as GameModel
 from app.schemas import TicketCreate, TicketOut
-from app.models.wallet import Wallet
-from app.models.user import User
-from app.models.transaction import Transaction
-from app.services.bingo import generate_bingo_card
+from app.services.purchases import PurchaseError, PurchaseResult, purchase_tickets
+from app.services.scheduler import schedule_game_check
 
 
 router = APIRouter(prefix="/tickets", tags=["tickets"])
@@ -33,73 +32,38 @@ def _validate_matrix(m: List[List[int]]):
         for v in row:
             if not isinstance(v, int):
                 raise HTTPException(status_code=422, detail="numbers debe contener enteros")
+            if not 0 <= v <= 75:
+                raise HTTPException(status_code=422, detail="numbers debe estar entre 0 y 75")
 
 
-@router.post("/games/{game_id}", response_model=TicketOut, status_code=201)
-def buy_ticket_for_game(game_id: str, payload: TicketCreate, user_id: str = Depends(_auth), session: Session = Depends(get_session)):
-    _validate_matrix(payload.numbers)
-
-    game = session.get(GameModel, game_id)
-    if not game:
-        raise HTTPException(status_code=404, detail="Juego no encontrado")
-    if game.status not in ("OPEN",):
-        raise HTTPException(status_code=409, detail="El juego no está abierto para ventas")
-    # usuario verificado
-    u = session.get(User, user_id)
-    if not u or not u.is_verified:
-        raise HTTPException(status_code=403, detail="Usuario no verificado")
-    # creador no puede jugar su propia partida
-    if game.creator_id == user_id:
-        raise HTTPException(status_code=403, detail="No puedes jugar tu propia partida")
-    # máximo 2 tickets por usuario por partida
-    cnt = session.exec(select(TicketModel).where((TicketModel.game_id == game_id) & (TicketModel.user_id == user_id))).all()
-    if len(cnt) >= 2:
-        raise HTTPException(status_code=409, detail="Máximo 2 cartones por partida")
-
-    # validar y debitar saldo
-    w = session.exec(select(Wallet).where(Wallet.user_id == user_id)).first()
-    if not w:
-        raise HTTPException(status_code=402, detail="Saldo insuficiente")
-    price = float(game.price)
-    if (w.balance or 0.0) < price:
-        raise HTTPException(status_code=402, detail="Saldo insuficiente")
-
-    # crear ticket y actualizar saldos/contador
-    t = TicketModel(game_id=game_id, user_id=user_id, numbers=json.dumps(payload.numbers))
-    w.balance = float(w.balance) - price
-    game.sold_tickets = int(game.sold_tickets or 0) + 1
-    # si se alcanza mínimo por primera vez, registrar timestamp
-    if (game.sold_tickets >= game.min_tickets) and (not game.reached_min_at):
-        from datetime import datetime
-        game.reached_min_at = datetime.utcnow()
-    
-    # Create transaction record for purchase
-    txn = Transaction(
-        user_id=user_id,
-        type="purchase",
-        amount=-price,
-        description=f"Compra de cartón · Partida #{game_id[:8]}",
-        reference_id=game_id,
-    )
-    
-    session.add_all([t, w, game, txn])
-    session.commit()
-    session.refresh(t)
-    
-    # Broadcast player joined
-    from app.core.websocket import manager
-    import asyncio
+def _purchase(session: Session, game_id: str, user_id: str, **kwargs) -> List[TicketOut]:
+    try:
+        result = purchase_tickets(session, game_id, user_id, **kwargs)
+    except PurchaseError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    if result.autostart_due:
+        # despertar al scheduler en vez de esperar al próximo plazo
+        schedule_game_check(game_id)
+    _broadcast_player_joined(result)
+    return [TicketOut(id=tid, game_id=game_id, user_id=user_id, numbers=decode_card(card)) for tid, card in result.tickets]
+
+
+def _broadcast_player_joined(result: PurchaseResult):
+    """Un solo evento por compra; los handlers corren en el threadpool de AnyIO."""
     try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            asyncio.create_task(manager.broadcast_to_game(game_id, "player_joined", {
-                "game_id": game_id,
-                "sold_tickets": game.sold_tickets,
-            }))
+        from_thread.run(manager.broadcast_to_game, result.game_id, "player_joined", {
+            "game_id": result.game_id,
+            "sold_tickets": result.sold_tickets,
+        })
     except RuntimeError:
+        # fuera de un worker thread (sin event loop disponible)
         pass
-    
-    return TicketOut(id=t.id, game_id=t.game_id, user_id=t.user_id, numbers=payload.numbers)
+
+
+@router.post("/games/{game_id}", response_model=TicketOut, status_code=201)
+def buy_ticket_for_game(game_id: str, payload: TicketCreate, user_id: str = Depends(_auth), session: Session = Depends(get_session)):
+    _validate_matrix(payload.numbers)
+    return _purchase(session, game_id, user_id, card=encode_card(payload.numbers))[0]
 
 
 @router.get("/me", response_model=List[TicketOut])
@@ -107,11 +71,7 @@ def my_tickets(user_id: str = Depends(_auth), session: Session = Depends(get_ses
     items = session.exec(select(TicketModel).where(TicketModel.user_id == user_id)).all()
     out: List[TicketOut] = []
     for t in items:
-        try:
-            nums = json.loads(t.numbers)
-        except Exception:
-            nums = []
-        out.append(TicketOut(id=t.id, game_id=t.game_id, user_id=t.user_id, numbers=nums))
+        out.append(TicketOut(id=t.id, game_id=t.game_id, user_id=t.user_id, numbers=decode_card(t.card)))
     return out
 
 
@@ -121,68 +81,20 @@ def buy_auto_ticket(game_id: str, user_id: str = Depends(_auth), session: Sessio
     Buy a ticket with auto-generated bingo card for a game.
     This is a convenience endpoint that generates a valid bingo card automatically.
     """
-    # Generate valid bingo card
-    card = generate_bingo_card()
-    
-    # Reuse logic from buy_ticket_for_game
-    game = session.get(GameModel, game_id)
-    if not game:
-        raise HTTPException(status_code=404, detail="Juego no encontrado")
-    if game.status not in ("OPEN",):
-        raise HTTPException(status_code=409, detail="El juego no está abierto para ventas")
-    # usuario verificado
-    u = session.get(User, user_id)
-    if not u or not u.is_verified:
-        raise HTTPException(status_code=403, detail="Usuario no verificado")
-    # creador no puede jugar su propia partida
-    if game.creator_id == user_id:
-        raise HTTPException(status_code=403, detail="No puedes jugar tu propia partida")
-    # máximo 2 tickets por usuario por partida
-    cnt = session.exec(select(TicketModel).where((TicketModel.game_id == game_id) & (TicketModel.user_id == user_id))).all()
-    if len(cnt) >= 2:
-        raise HTTPException(status_code=409, detail="Máximo 2 cartones por partida")
-
-    # validar y debitar saldo
-    w = session.exec(select(Wallet).where(Wallet.user_id == user_id)).first()
-    if not w:
-        raise HTTPException(status_code=402, detail="Saldo insuficiente")
-    price = float(game.price)
-    if (w.balance or 0.0) < price:
-        raise HTTPException(status_code=402, detail="Saldo insuficiente")
-
-    # crear ticket y actualizar saldos/contador
-    t = TicketModel(game_id=game_id, user_id=user_id, numbers=json.dumps(card))
-    w.balance = float(w.balance) - price
-    game.sold_tickets = int(game.sold_tickets or 0) + 1
-    if (game.sold_tickets >= game.min_tickets) and (not game.reached_min_at):
-        from datetime import datetime
-        game.reached_min_at = datetime.utcnow()
-    
-    # Create transaction record for purchase
-    txn = Transaction(
-        user_id=user_id,
-        type="purchase",
-        amount=-price,
-        description=f"Compra de cartón automático · Partida #{game_id[:8]}",
-        reference_id=game_id,
-    )
-    
-    session.add_all([t, w, game, txn])
-    session.commit()
-    session.refresh(t)
-    
-    # Broadcast player joined
-    from app.core.websocket import manager
-    import asyncio
-    try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            asyncio.create_task(manager.broadcast_to_game(game_id, "player_joined", {
-                "game_id": game_id,
-                "sold_tickets": game.sold_tickets,
-            }))
-    except RuntimeError:
-        pass
-    
-    return TicketOut(id=t.id, game_id=t.game_id, user_id=t.user_id, numbers=card)
+    return _purchase(session, game_id, user_id, description="Compra de cartón automático")[0]
 
+
+@router.post("/games/{game_id}/batch", response_model=List[TicketOut], status_code=201)
+def buy_auto_tickets_batch(
+    game_id: str,
+    count: int = Query(..., ge=1, le=50),
+    user_id: str = Depends(_auth),
+    session: Session = Depends(get_session),
+):
+    """
+    Buy `count` auto-generated cards in one request.
+
+    Validates once, debits the wallet once and stores every ticket plus a
+    single aggregated purchase transaction in one commit.
+    """
+    return _purchase(session, game_id, user_id, count=count, description=f"Compra de {count} cartones automáticos")
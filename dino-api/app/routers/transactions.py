@@ -2,8 +2,8 @@ from fastapi import APIRouter, Depends, Header, HTTPException, Query
 from typing import Optional, Literal
 from sqlmodel import Session, select, func, desc
 from datetime import datetime, timedelta
-import json
 
+from app.core.codecs import WIN_FLAGS
 from app.core.database import get_session
 from app.core.security import get_user_id_from_bearer
 from app.models.transaction import Transaction
@@ -91,19 +91,13 @@ def get_my_stats(
             games_won += 1
             if ticket.payout > biggest_prize:
                 biggest_prize = ticket.payout
-            # Parse wins JSON
-            if ticket.wins:
-                try:
-                    wins_list = json.loads(ticket.wins)
-                    for w in wins_list:
-                        if w == "BINGO":
-                            bingos_won += 1
-                        elif w == "LINE":
-                            lines_won += 1
-                        elif w == "DIAGONAL":
-                            diagonals_won += 1
-                except:
-                    pass
+            flags = ticket.win_flags or 0
+            if flags & WIN_FLAGS["BINGO"]:
+                bingos_won += 1
+            if flags & WIN_FLAGS["LINE"]:
+                lines_won += 1
+            if flags & WIN_FLAGS["DIAGONAL"]:
+                diagonals_won += 1
     
     win_rate = (games_won / games_played * 100) if games_played > 0 else 0.0
     
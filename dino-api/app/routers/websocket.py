@@ -1,26 +1,78 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
+from typing import Dict, Optional
 from sqlmodel import Session, select
-from app.core.websocket import manager
-from app.core.database import get_session
+from app.core.codecs import decode_balls
+from app.core.frames import EVENT_MODES, PROTOCOLS, json_frame
+from app.core.bus import is_game_channel
+from app.core.websocket import Outbox, manager
+from app.core.database import async_session, get_session
 from app.core.security import decode_token, TokenError
 from app.models.game import Game as GameModel
+from app.models.wallet import Wallet
+from app.services.lobby import lobby
+from app.services.player_feed import PlayerFeed
 import json
 
 router = APIRouter(tags=["websocket"])
 
 
+async def _game_snapshot(game_id: str) -> Optional[dict]:
+    """Compact state of a game for a client that cannot be caught up with deltas."""
+    async with async_session() as session:
+        g = await session.get(GameModel, game_id)
+    if g is None:
+        return None
+    return {
+        "game_id": g.id,
+        "status": g.status,
+        "sold_tickets": g.sold_tickets,
+        "drawn_numbers": decode_balls(g.drawn_sequence),
+        "paid_diagonal": g.paid_diagonal,
+        "paid_line": g.paid_line,
+        "paid_bingo": g.paid_bingo,
+    }
+
+
 @router.websocket("/ws/games/{game_id}")
 async def game_websocket(websocket: WebSocket, game_id: str):
     """
     WebSocket endpoint for real-time game updates.
     
-    Connect: ws://host/ws/games/{game_id}?token={jwt_token}
+    Connect: ws://host/ws/games/{game_id}?token={jwt_token}&protocol={json|binary}&events={draw_result|legacy}&since={seq}
+    
+    protocol=binary sends draw_result without winners and player_joined as
+    compact binary frames (layouts in app.core.frames); every other event
+    stays JSON text.
+    
+    events=legacy gets each draw as number_drawn, one winner per ticket and
+    game_finished instead of one draw_result.
+    
+    Room events carry `seq`, increasing per game. A client that reconnects
+    with since=<last seq it applied> first gets the events it missed or,
+    if they are too old, one snapshot event; events with a seq not above
+    the snapshot's must then be ignored. `connected` comes after them.
+    
+    With a token, the socket also gets the user's own cards: `cards` first
+    (and again when the game starts), then a card_update after each draw
+    that hits one of them (binary 0x04 with protocol=binary). Cards the
+    ball misses cost nothing; a hit on one card is 14 bytes in binary.
     
     Events sent to client:
     - game_started: { game_id, status }
-    - number_drawn: { number, drawn_numbers, paid_diagonal, paid_line, paid_bingo }
-    - winner: { ticket_id, user_id, amount, category }
-    - game_finished: { game_id, status }
+    - draw_result: { number, drawn_count, paid_diagonal, paid_line, paid_bingo,
+                     winners: { CATEGORY: { amount, tickets: [{ ticket_id, user_id, username }] } }, finished }
+    - player_joined: { game_id, sold_tickets }
+    - game_cancelled: { game_id, status, refunded_tickets }
+    - legacy only: number_drawn { number, drawn_count, paid_* }, winner { ticket_id, user_id,
+      username, amount, category }, game_finished { game_id, status }
+    - snapshot: { game_id, status, sold_tickets, drawn_numbers, paid_diagonal, paid_line, paid_bingo }
+    - cards (with token): { tickets: [{ id, numbers (5x5, 0 = FREE), marked, near }] }
+    - card_update (with token): { ball, cards: [[card index, cell, near]] }
+      marked is a 25-bit mask (bit = row * 5 + col); near holds the unpaid
+      categories one ball away (DIAGONAL 1, LINE 2, BINGO 4); in card_update
+      only the ones that just became so
+    - connected: { game_id, user_id, protocol, events, seq, connections }
+    - resync: { game_id, reason } (client fell behind; reload GET /games/{game_id}/state)
     - error: { message }
     """
     # Optional token auth from query params
@@ -33,12 +85,42 @@ async def game_websocket(websocket: WebSocket, game_id: str):
         except TokenError:
             pass
     
-    await manager.connect(websocket, game_id)
+    # Los canales de usuario y del lobby tienen su propio endpoint (/ws/me, /ws/lobby)
+    if not is_game_channel(game_id):
+        await websocket.close(code=4004, reason="Unknown game")
+        return
+    
+    protocol = websocket.query_params.get("protocol", "json")
+    if protocol not in PROTOCOLS:
+        await websocket.close(code=4004, reason="Unsupported protocol")
+        return
+    
+    events = websocket.query_params.get("events", "draw_result")
+    if events not in EVENT_MODES:
+        await websocket.close(code=4004, reason="Unsupported events mode")
+        return
+    
+    since = websocket.query_params.get("since")
+    if since is not None:
+        # Un valor ilegible equivale a no tener nada: se manda la foto completa
+        since = int(since) if since.isdigit() else -1
+    
+    personal = None
+    if user_id:
+        personal = PlayerFeed(game_id, user_id, protocol)
+        await personal.load()
+    
+    await manager.connect(
+        websocket, game_id, protocol, since, lambda: _game_snapshot(game_id), events == "legacy", personal,
+    )
     
     # Send initial connection confirmation
     await manager.send_personal(websocket, "connected", {
         "game_id": game_id,
         "user_id": user_id,
+        "protocol": protocol,
+        "events": events,
+        "seq": manager.last_seq(game_id),
         "connections": manager.get_connection_count(game_id)
     })
     
@@ -63,34 +145,120 @@ async def game_websocket(websocket: WebSocket, game_id: str):
         manager.disconnect(websocket, game_id)
 
 
+@router.websocket("/ws/me")
+async def user_websocket(websocket: WebSocket):
+    """
+    WebSocket endpoint for events addressed to one user, whatever game room
+    (if any) they are in. Reaches every socket of the user on every worker.
+    
+    Connect: ws://host/ws/me?token={jwt_token}
+    
+    Events sent to client:
+    - connected: { user_id, balance }
+    - wallet: { reason, amount, balance, ... } after a change of the balance
+      the user did not make themselves:
+      - deposit_approved / deposit_rejected / withdraw_approved /
+        withdraw_rejected: { transaction_id } (amount is what was credited)
+      - prize: { game_id, categories: { CATEGORY: amount } }
+      - commission: { game_id } (creator's share when the game finishes)
+      - refund: { game_id, tickets } (game cancelled)
+    - resync: { reason } (client fell behind; reload GET /auth/me and /transactions/me)
+    """
+    token = websocket.query_params.get("token")
+    if not token:
+        await websocket.close(code=4001, reason="Token required")
+        return
+    try:
+        user_id = decode_token(token).get("sub")
+    except TokenError:
+        await websocket.close(code=4002, reason="Invalid token")
+        return
+    if not user_id:
+        await websocket.close(code=4002, reason="Invalid token")
+        return
+    
+    await manager.connect_user(websocket, user_id)
+    
+    async with async_session() as session:
+        wallet = (await session.exec(select(Wallet).where(Wallet.user_id == user_id))).first()
+    await manager.send_personal(websocket, "connected", {
+        "user_id": user_id,
+        "balance": float(wallet.balance) if wallet else 0.0,
+    })
+    
+    try:
+        while True:
+            data = await websocket.receive_text()
+            try:
+                message = json.loads(data)
+                if message.get("type", "") == "ping":
+                    await manager.send_personal(websocket, "pong", {})
+            except json.JSONDecodeError:
+                pass
+    except WebSocketDisconnect:
+        manager.disconnect_user(websocket, user_id)
+
+
+@router.websocket("/ws/lobby")
+async def lobby_websocket(websocket: WebSocket):
+    """
+    WebSocket endpoint for the list of OPEN and RUNNING games.
+    
+    Connect: ws://host/ws/lobby
+    
+    Events sent to client:
+    - lobby: { columns: [id, creator_id, price, min_tickets, status, sold_tickets,
+               max_cards_per_user], rows: [[...], ...] } (first, the snapshot)
+    - game_created: { id, creator_id, price, min_tickets, status, sold_tickets, max_cards_per_user }
+    - games_updated: { games: [{ id, sold_tickets?, status? }] } (coalesced, at
+      most one entry per game every LOBBY_COALESCE_SECONDS)
+    - game_removed: { id } (finished or cancelled)
+    - resync: { reason } (client fell behind; reconnect for a new snapshot)
+    """
+    await lobby.connect(websocket)
+    
+    try:
+        while True:
+            data = await websocket.receive_text()
+            try:
+                message = json.loads(data)
+                if message.get("type", "") == "ping":
+                    lobby.send(websocket, "pong", {})
+            except json.JSONDecodeError:
+                pass
+    except WebSocketDisconnect:
+        lobby.disconnect(websocket)
+
+
 # Admin connections manager (separate from game rooms)
 class AdminConnectionManager:
     """Manages WebSocket connections for admin users."""
     
     def __init__(self):
-        self.active_connections: set = set()
+        self.active_connections: Dict[WebSocket, Outbox] = {}
+        self._resync = json_frame("resync", {"reason": "slow_consumer"})
     
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.add(websocket)
+        self.active_connections[websocket] = Outbox(websocket, self._resync, self._forget)
+    
+    def _forget(self, websocket: WebSocket):
+        self.active_connections.pop(websocket, None)
     
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.discard(websocket)
+        outbox = self.active_connections.get(websocket)
+        if outbox is not None:
+            outbox.close()
+    
+    def send(self, websocket: WebSocket, event_type: str, data: dict):
+        outbox = self.active_connections.get(websocket)
+        if outbox is not None:
+            outbox.push(json_frame(event_type, data))
     
     async def broadcast(self, event_type: str, data: dict):
-        import json
-        message = json.dumps({
-            "type": event_type,
-            "payload": data
-        })
-        disconnected = set()
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except Exception:
-                disconnected.add(connection)
-        for conn in disconnected:
-            self.active_connections.discard(conn)
+        message = json_frame(event_type, data)
+        for outbox in list(self.active_connections.values()):
+            outbox.push(message)
 
 admin_manager = AdminConnectionManager()
 
@@ -109,6 +277,7 @@ async def admin_websocket(websocket: WebSocket):
     - new_user: { id, alias, email }
     - game_created: { id, name, host }
     - stats_updated: { ... }
+    - resync: { reason } (client fell behind; reload the dashboard)
     """
     # Verify admin token
     token = websocket.query_params.get("token")
@@ -133,10 +302,7 @@ async def admin_websocket(websocket: WebSocket):
     await admin_manager.connect(websocket)
     
     # Send connection confirmation
-    await websocket.send_text(json.dumps({
-        "type": "connected",
-        "payload": {"user_id": user_id, "role": "admin"}
-    }))
+    admin_manager.send(websocket, "connected", {"user_id": user_id, "role": "admin"})
     
     try:
         while True:
@@ -145,7 +311,7 @@ async def admin_websocket(websocket: WebSocket):
                 message = json.loads(data)
                 msg_type = message.get("type", "")
                 if msg_type == "ping":
-                    await websocket.send_text(json.dumps({"type": "pong", "payload": {}}))
+                    admin_manager.send(websocket, "pong", {})
             except json.JSONDecodeError:
                 pass
     except WebSocketDisconnect:
@@ -17,6 +17,8 @@ class GameCreate(BaseModel):
     autostart_enabled: bool = False
     autostart_threshold: Optional[int] = None
     autostart_delay_minutes: Optional[int] = None
+    auto_draw_interval_seconds: Optional[int] = Field(default=None, ge=2, le=600, description="Segundos entre bolas; None = sorteo manual")
+    max_cards_per_user: int = Field(default=2, ge=1, le=50, description="Máximo de cartones por jugador")
 
 class PrizeSlice(BaseModel):
     type: Literal["DIAGONAL", "LINE", "BINGO"]
@@ -29,6 +31,7 @@ class Game(BaseModel):
     min_tickets: int = 1
     status: GameStatus = "OPEN"
     sold_tickets: int = 0
+    max_cards_per_user: int = 2
     prize_scheme: List[PrizeSlice] = [
         PrizeSlice(type="DIAGONAL", percent=15),
         PrizeSlice(type="LINE", percent=25),
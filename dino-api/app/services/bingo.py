@@ -1,5 +1,7 @@
-import random
-from typing import List
+import secrets
+from typing import List, Optional
+
+import numpy as np
 
 
 def generate_bingo_card() -> List[List[int]]:
@@ -15,36 +17,7 @@ def generate_bingo_card() -> List[List[int]]:
     
     Returns a 5x5 matrix where each row has 5 numbers.
     """
-    ranges = [
-        (1, 15),   # B
-        (16, 30),  # I
-        (31, 45),  # N
-        (46, 60),  # G
-        (61, 75),  # O
-    ]
-    
-    columns: List[List[int]] = []
-    
-    for col_idx, (start, end) in enumerate(ranges):
-        # Pick 5 unique random numbers from the range
-        pool = list(range(start, end + 1))
-        random.shuffle(pool)
-        col = pool[:5]
-        
-        # Center cell (row 2, col 2) is FREE space (represented as 0)
-        if col_idx == 2:  # N column
-            col[2] = 0
-        
-        columns.append(col)
-    
-    # Transpose to get rows instead of columns
-    # Each row has one number from each column
-    card: List[List[int]] = []
-    for row_idx in range(5):
-        row = [columns[col_idx][row_idx] for col_idx in range(5)]
-        card.append(row)
-    
-    return card
+    return [row.tolist() for row in generate_bingo_cards(1)[0].reshape(5, 5)]
 
 
 def validate_bingo_card(card: List[List[int]]) -> bool:
@@ -75,3 +48,71 @@ def validate_bingo_card(card: List[List[int]]) -> bool:
                 return False
     
     return True
+
+
+# --- Bulk generation (compact arrays) ---
+# A batch of cards is an (n, 25) uint8 array, each row a card in the same
+# row-major layout used by encode_card, so rows can be stored as-is.
+
+_COLUMN_STARTS = np.array([1, 16, 31, 46, 61], dtype=np.uint8)
+_CENTER = 12
+
+
+def card_rng(seed: Optional[int] = None, stream: int = 0) -> np.random.Generator:
+    """
+    Random generator for stream `stream` of `seed`.
+
+    Streams of the same seed are statistically independent (SeedSequence
+    spawn keys), so a large batch can be split across workers by giving each
+    one its own stream and still be reproduced later from (seed, stream).
+    Without a seed the generator draws its entropy from the OS.
+    """
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(stream,)))
+
+
+def generate_bingo_cards(n: int, seed: Optional[int] = None, stream: int = 0) -> np.ndarray:
+    """
+    Generate `n` valid bingo cards in one vectorized call.
+
+    Returns an (n, 25) uint8 array: row-major 5x5 cards with 5 distinct
+    numbers per column range and the FREE center as 0. The same
+    (seed, stream, n) always yields the same cards.
+    """
+    rng = card_rng(seed, stream)
+    # Orden aleatorio de los 15 valores de cada columna; nos quedamos con 5
+    picks = rng.random((n, 5, 15)).argsort(axis=2)[:, :, :5].astype(np.uint8)
+    picks += _COLUMN_STARTS[None, :, None]
+    cards = picks.transpose(0, 2, 1).reshape(n, 25)
+    cards[:, _CENTER] = 0
+    return np.ascontiguousarray(cards)
+
+
+def validate_bingo_cards(cards: np.ndarray) -> np.ndarray:
+    """
+    Batch counterpart of validate_bingo_card for an (n, 25) card array.
+
+    Returns a boolean array with one entry per card. Cards of the wrong
+    shape make the whole batch invalid.
+    """
+    cards = np.asarray(cards)
+    if cards.ndim != 2 or cards.shape[1] != 25 or not np.issubdtype(cards.dtype, np.integer):
+        return np.zeros(len(cards) if cards.ndim else 0, dtype=bool)
+    grid = cards.reshape(-1, 5, 5).astype(np.int16)
+    starts = _COLUMN_STARTS.astype(np.int16)[None, None, :]
+    in_range = (grid >= starts) & (grid <= starts + 14)
+    in_range[:, 2, 2] = True
+    return in_range.all(axis=(1, 2)) & (cards[:, _CENTER] == 0)
+
+
+def shuffled_draw_order(drawn: Optional[List[int]] = None) -> List[int]:
+    """
+    Full order in which the 75 balls will be drawn, fixed when a game starts.
+
+    Balls already drawn (if any) keep their position as the prefix. Uses the
+    system CSPRNG so the order cannot be predicted from earlier draws.
+    """
+    prefix = list(drawn or [])
+    rest = [n for n in range(1, 76) if n not in set(prefix)]
+    secrets.SystemRandom().shuffle(rest)
+    return prefix + rest
+
@@ -0,0 +1,148 @@
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
+
+import numpy as np
+
+from app.core.codecs import WIN_FLAGS
+
+
+CATEGORIES = ("DIAGONAL", "LINE", "BINGO")
+# Win draw of a card that never completes a category
+NO_WIN = 76
+
+# Cells (row * 5 + col) of the lines that complete each category: the only
+# definition of the card geometry, every other table below derives from it.
+_CATEGORY_CELLS: Dict[str, Tuple[Tuple[int, ...], ...]] = {
+    "DIAGONAL": (
+        tuple(i * 5 + i for i in range(5)),
+        tuple(i * 5 + 4 - i for i in range(5)),
+    ),
+    "LINE": tuple(tuple(r * 5 + c for c in range(5)) for r in range(5))
+    + tuple(tuple(r * 5 + c for r in range(5)) for c in range(5)),
+    "BINGO": (tuple(range(25)),),
+}
+
+# Cell indices of both diagonals, for fancy indexing
+_DIAGONAL_CELLS = tuple(np.array(cells) for cells in _CATEGORY_CELLS["DIAGONAL"])
+# Value stored for cells that can never be marked (numbers outside 1..75)
+_NEVER = 76
+
+
+class VectorCardIndex:
+    """
+    Vectorized win draws for the cards of a RUNNING game.
+
+    Cards are kept as a contiguous (N, 25) uint8 array, so the draw at which
+    each card completes DIAGONAL/LINE/BINGO is a few array reductions over
+    all cards at once.
+    """
+
+    def __init__(self, cards: Sequence[Tuple[str, bytes]]):
+        self.ticket_ids: List[str] = [ticket_id for ticket_id, _ in cards]
+        # Las tarjetas ya vienen en 25 bytes: se apilan sin decodificar
+        flat = np.frombuffer(b"".join(card for _, card in cards), dtype=np.uint8).reshape(-1, 25)
+        self.cards = np.where(flat > 75, _NEVER, flat).astype(np.uint8)
+
+    def win_draws(self, order: Sequence[int]) -> Dict[str, List[int]]:
+        """
+        Draw count (1-based) at which each card completes each category when
+        the balls come out in `order`; 0 if the FREE cells alone complete
+        it, NO_WIN if it never does.
+        """
+        position = np.full(_NEVER + 1, NO_WIN, dtype=np.int16)
+        position[0] = 0
+        position[np.asarray(order, dtype=np.int64)] = np.arange(1, len(order) + 1, dtype=np.int16)
+        cell_draw = position[self.cards]
+        grid = cell_draw.reshape(-1, 5, 5)
+        diagonal = np.minimum(
+            cell_draw[:, _DIAGONAL_CELLS[0]].max(axis=1),
+            cell_draw[:, _DIAGONAL_CELLS[1]].max(axis=1),
+        )
+        line = np.minimum(grid.max(axis=2).min(axis=1), grid.max(axis=1).min(axis=1))
+        bingo = cell_draw.max(axis=1)
+        return {"DIAGONAL": diagonal.tolist(), "LINE": line.tolist(), "BINGO": bingo.tolist()}
+
+
+class DrawSchedule:
+    """
+    Winners of each category per draw, precomputed from a fixed ball order.
+
+    Win draws are kept sorted per category, so finding the winners at a given
+    draw is a bisect plus O(winners) instead of a scan over every card.
+    """
+
+    def __init__(self, ticket_ids: List[str], win_draws: Dict[str, List[int]]):
+        self.ticket_ids = ticket_ids
+        self._pending: Dict[str, List[Tuple[int, int]]] = {}
+        self._thresholds: Dict[str, List[int]] = {}
+        for cat in CATEGORIES:
+            pairs = sorted((d, idx) for idx, d in enumerate(win_draws[cat]) if d < NO_WIN)
+            self._pending[cat] = pairs
+            self._thresholds[cat] = [d for d, _ in pairs]
+
+    def winners(self, category: str, draw_count: int) -> List[str]:
+        """Ticket ids whose card completes the category within the first `draw_count` balls."""
+        k = bisect_right(self._thresholds[category], draw_count)
+        return [self.ticket_ids[idx] for idx in sorted(idx for _, idx in self._pending[category][:k])]
+
+
+# Cell bitmasks (bit = row * 5 + col) of the lines that complete each category
+_CATEGORY_MASKS: Dict[str, Tuple[int, ...]] = {
+    category: tuple(sum(1 << cell for cell in cells) for cells in lines)
+    for category, lines in _CATEGORY_CELLS.items()
+}
+
+
+class PlayerCards:
+    """
+    One player's cards in a game, with their marked cells as 25-bit masks.
+
+    Small enough to keep per connection: a draw only looks at the cards that
+    hold the ball, and a category is "one away" on a card when one of its
+    lines misses exactly one cell.
+    """
+
+    def __init__(self, cards: Sequence[Tuple[str, bytes]], drawn: Iterable[int] = ()):
+        self.ticket_ids: List[str] = []
+        self.cards: List[bytes] = []
+        self.marked: List[int] = []
+        self.near: List[int] = []
+        self.cells: Dict[int, List[Tuple[int, int]]] = {}
+        self.drawn: Set[int] = set()
+        for idx, (ticket_id, card) in enumerate(cards):
+            self.ticket_ids.append(ticket_id)
+            self.cards.append(card)
+            free = 0
+            for cell, val in enumerate(card):
+                if val == 0:
+                    free |= 1 << cell  # FREE cell, always marked
+                else:
+                    self.cells.setdefault(val, []).append((idx, cell))
+            self.marked.append(free)
+            self.near.append(self._near_flags(free))
+        for n in drawn:
+            self.mark(n)
+
+    @staticmethod
+    def _near_flags(marked: int) -> int:
+        flags = 0
+        for category, masks in _CATEGORY_MASKS.items():
+            if any(bin(mask & ~marked).count("1") == 1 for mask in masks):
+                flags |= WIN_FLAGS[category]
+        return flags
+
+    def mark(self, number: int) -> List[Tuple[int, int, int]]:
+        """
+        Apply a drawn ball; returns (card, cell, categories that just became
+        one away, as WIN_FLAGS bits) for every card holding it.
+        """
+        if number in self.drawn:
+            return []
+        self.drawn.add(number)
+        changes = []
+        for idx, cell in self.cells.get(number, ()):
+            self.marked[idx] |= 1 << cell
+            near = self._near_flags(self.marked[idx])
+            changes.append((idx, cell, near & ~self.near[idx]))
+            self.near[idx] = near
+        return changes
@@ -0,0 +1,80 @@
+"""
+Card uniqueness within a game.
+
+Every ticket stores a fingerprint of its card and (game_id, fingerprint) is
+a unique index, so the same card can never be sold twice in one game.
+Auto-generated cards are re-drawn on collision; the counters below record
+how often that happens so the card space can be sized.
+"""
+from math import perm
+from typing import Dict, List, Tuple
+
+from sqlmodel import Session, select
+
+from app.core.codecs import card_fingerprint
+from app.models.ticket import Ticket
+from app.services.bingo import generate_bingo_cards
+
+# Distinct valid cards: 5 ordered picks of 15 per column, 4 in the N column
+CARD_SPACE = perm(15, 5) ** 4 * perm(15, 4)
+
+# With ~5e26 cards a retry is practically never needed; this only bounds a
+# pathological RNG.
+MAX_GENERATION_ATTEMPTS = 8
+
+_stats: Dict[str, int] = {"generated": 0, "retries": 0, "exhausted": 0}
+
+
+class CardCollisionError(Exception):
+    """No unique card could be produced for the game."""
+
+
+def card_taken(session: Session, game_id: str, fingerprint: int) -> bool:
+    return session.exec(
+        select(Ticket.id).where(Ticket.game_id == game_id, Ticket.fingerprint == fingerprint)
+    ).first() is not None
+
+
+def unique_auto_cards(session: Session, game_id: str, count: int) -> List[Tuple[bytes, int]]:
+    """
+    Generate `count` cards not yet sold in the game, nor repeated among
+    themselves; returns [(card, fingerprint), ...].
+
+    Cards are generated in one batch and checked with a single query on the
+    unique index; only colliding cards are re-drawn, so the expected cost
+    is one round per batch.
+    """
+    picked: Dict[int, bytes] = {}
+    for _ in range(MAX_GENERATION_ATTEMPTS):
+        missing = count - len(picked)
+        batch = {}
+        for row in generate_bingo_cards(missing):
+            card = row.tobytes()
+            batch.setdefault(card_fingerprint(card), card)
+        _stats["generated"] += missing
+        taken = set(session.exec(
+            select(Ticket.fingerprint).where(Ticket.game_id == game_id, Ticket.fingerprint.in_(list(batch)))
+        ).all())
+        for fp, card in batch.items():
+            if fp not in taken and fp not in picked:
+                picked[fp] = card
+        _stats["retries"] += count - len(picked)
+        if len(picked) == count:
+            return [(card, fp) for fp, card in picked.items()]
+    _stats["exhausted"] += 1
+    raise CardCollisionError(game_id)
+
+
+def unique_auto_card(session: Session, game_id: str) -> Tuple[bytes, int]:
+    """Generate one card not yet sold in the game; returns (card, fingerprint)."""
+    return unique_auto_cards(session, game_id, 1)[0]
+
+
+def generation_stats() -> Dict[str, float]:
+    """Counters since process start, plus the retry rate."""
+    generated = _stats["generated"]
+    return {
+        **_stats,
+        "retry_rate": (_stats["retries"] / generated) if generated else 0.0,
+        "card_space": CARD_SPACE,
+    }
@@ -0,0 +1,182 @@
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlmodel import Session, update
+
+from app.core.bus import is_game_channel
+from app.core.codecs import encode_balls
+from app.core.frames import is_final
+from app.core.websocket import manager
+from app.models.game import Game
+from app.schemas import WinnerOut
+from app.services.payouts import settle_draw, wallet_balances
+from app.services.runtime import GameRuntime, evict_runtime
+
+
+class DrawError(Exception):
+    """A draw could not be performed; carries the HTTP status to report."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class DrawOutcome:
+    def __init__(
+        self,
+        game_id: str,
+        number: int,
+        drawn: List[int],
+        paid: Dict[str, bool],
+        winners: List[WinnerOut],
+        commission: Optional[Tuple[str, float]] = None,
+        balances: Optional[Dict[str, float]] = None,
+    ):
+        self.game_id = game_id
+        self.number = number
+        self.drawn = drawn
+        self.paid = paid
+        self.winners = winners
+        self.commission = commission  # (creator_id, importe) si la partida terminó
+        self.balances = balances or {}  # saldo tras el sorteo de cada usuario acreditado
+
+    @property
+    def finished(self) -> bool:
+        return self.paid["BINGO"]
+
+
+def _default_scheme():
+    # 20% Diagonal, 20% Linea, 50% Bingo (90% of pool)
+    # 5% Creator + 5% System = 10% commission (already deducted in prize_pool)
+    return {"DIAGONAL": 22.22, "LINE": 22.22, "BINGO": 55.56}  # Percentages of the 90% prize pool
+
+
+# Un lock por partida: los sorteos (manuales o automáticos) y sus eventos salen en orden
+_draw_locks: Dict[str, asyncio.Lock] = {}
+
+
+def draw_lock(game_id: str) -> asyncio.Lock:
+    lock = _draw_locks.get(game_id)
+    if lock is None:
+        lock = _draw_locks[game_id] = asyncio.Lock()
+    return lock
+
+
+def _forget_draw_lock(channel: str, event_type: str, data: dict):
+    """ConnectionManager observer: a game that finished or was cancelled no longer needs its lock."""
+    # El último sorteo aún puede tenerlo tomado: quien espere en él verá la partida
+    # terminada, así que se suelta ya y no se acumula un lock por partida jugada
+    if is_game_channel(channel) and is_final(event_type, data):
+        _draw_locks.pop(channel, None)
+
+
+manager.observers.append(_forget_draw_lock)
+
+
+def perform_draw(session: Session, rt: GameRuntime) -> DrawOutcome:
+    """Draw the next ball of a RUNNING game, pay its winners and persist the new state."""
+    game_id = rt.game_id
+    num = rt.next_number()
+    if num is None:
+        raise DrawError(409, "No quedan números por sortear")
+    drawn = rt.drawn + [num]
+
+    paid = dict(rt.paid)
+    # Premiación: primero diagonales, luego líneas, y bingo cierra el juego.
+    # Ganadores precalculados: cartones que completan la categoría en esta bola.
+    hits: Dict[str, List[str]] = {}
+    for category in ("DIAGONAL", "LINE", "BINGO"):
+        if paid[category]:
+            continue
+        hit_ids = rt.schedule.winners(category, len(drawn))
+        if hit_ids:
+            hits[category] = hit_ids
+            paid[category] = True
+
+    finished = paid["BINGO"]
+    # Distribute commission to the creator (5% of gross to creator, 5% stays as system revenue)
+    commission = (rt.creator_id, rt.commission * 0.5) if finished else None
+    # Pago de premios en bloque: sin consultas por ganador
+    winners = settle_draw(session, game_id, hits, rt.pool, _default_scheme(), commission)
+    credited = {w.user_id for w in winners} | ({commission[0]} if commission else set())
+    balances = wallet_balances(session, credited)
+
+    now = datetime.utcnow()
+    values = {
+        "drawn_sequence": encode_balls(drawn),
+        "last_drawn_at": now,
+        "paid_diagonal": paid["DIAGONAL"],
+        "paid_line": paid["LINE"],
+        "paid_bingo": paid["BINGO"],
+    }
+    if finished:
+        values.update(status="FINISHED", finished_at=now)
+
+    # Escritura condicionada al último estado conocido: si otro proceso sorteó
+    # o cambió la partida, el runtime está desfasado y se descarta.
+    stored = Game.drawn_sequence.is_(None) if rt.stored_drawn is None else Game.drawn_sequence == rt.stored_drawn
+    try:
+        result = session.exec(
+            update(Game)
+            .where((Game.id == game_id) & (Game.status == "RUNNING") & stored)
+            .values(**values)
+        )
+        if result.rowcount != 1:
+            session.rollback()
+            raise DrawError(409, "El estado de la partida cambió, intenta de nuevo")
+        session.commit()
+    except Exception:
+        evict_runtime(game_id)
+        raise
+
+    rt.drawn = drawn
+    rt.stored_drawn = values["drawn_sequence"]
+    rt.paid = paid
+    if finished:
+        evict_runtime(game_id)
+    return DrawOutcome(game_id, num, drawn, paid, winners, commission, balances)
+
+
+async def broadcast_draw(outcome: DrawOutcome):
+    """
+    Emit a draw to its game room as one draw_result event (legacy clients get
+    it split), then a wallet event to each user it credited.
+    """
+    game_id = outcome.game_id
+    # Ganadores agrupados por categoría: todos cobran lo mismo dentro de una
+    winners: Dict[str, dict] = {}
+    for w in outcome.winners:
+        group = winners.setdefault(w.category, {"amount": w.amount, "tickets": []})
+        group["tickets"].append({"ticket_id": w.ticket_id, "user_id": w.user_id, "username": w.username})
+    await manager.broadcast_to_game(game_id, "draw_result", {
+        "number": outcome.number,
+        "drawn_count": len(outcome.drawn),
+        "paid_diagonal": outcome.paid["DIAGONAL"],
+        "paid_line": outcome.paid["LINE"],
+        "paid_bingo": outcome.paid["BINGO"],
+        "winners": winners,
+        "finished": outcome.finished,
+    })
+    # Cada usuario acreditado recibe su premio (y el creador su comisión) en /ws/me
+    prizes: Dict[str, Dict[str, float]] = {}
+    for w in outcome.winners:
+        categories = prizes.setdefault(w.user_id, {})
+        categories[w.category] = categories.get(w.category, 0.0) + w.amount
+    for user_id, categories in prizes.items():
+        await manager.notify_user(user_id, "wallet", {
+            "reason": "prize",
+            "game_id": game_id,
+            "amount": sum(categories.values()),
+            "categories": categories,
+            "balance": outcome.balances.get(user_id),
+        })
+    if outcome.commission and outcome.commission[1] > 0:
+        creator_id, amount = outcome.commission
+        await manager.notify_user(creator_id, "wallet", {
+            "reason": "commission",
+            "game_id": game_id,
+            "amount": amount,
+            "balance": outcome.balances.get(creator_id),
+        })
@@ -0,0 +1,147 @@
+"""
+Leader election for background jobs across uvicorn workers.
+
+Every worker runs `leadership_task`, but only the one holding the
+`job_leases` row runs the jobs. The holder renews the lease every third of
+its duration; a worker that stops renewing (crash, hang, lost DB) is
+replaced once the lease expires, and a clean shutdown releases it so
+another worker takes over on its next heartbeat.
+"""
+import asyncio
+import os
+import socket
+import traceback
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+from uuid import uuid4
+
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, update
+
+from app.core.config import JOBS_LEASE_SECONDS
+from app.core.database import engine
+from app.models.job_lease import JobLease
+
+LEASE_NAME = "background-jobs"
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:6]}"
+
+_metrics: Dict[str, object] = {
+    "is_leader": False,
+    "leader_since": None,
+    "acquisitions": 0,
+    "step_downs": 0,
+    "renewals": 0,
+    "renew_failures": 0,
+    "last_renewed_at": None,
+}
+
+
+def _try_acquire(now: datetime) -> bool:
+    """Take or renew the lease if it is ours or expired (runs in a worker thread)."""
+    expires = now + timedelta(seconds=JOBS_LEASE_SECONDS)
+    with Session(engine) as session:
+        res = session.exec(
+            update(JobLease)
+            .where(
+                (JobLease.name == LEASE_NAME)
+                & ((JobLease.owner == WORKER_ID) | (JobLease.expires_at < now) | (JobLease.owner == None))  # noqa: E711
+            )
+            .values(owner=WORKER_ID, expires_at=expires)
+        )
+        if res.rowcount == 1:
+            session.commit()
+            return True
+        if session.get(JobLease, LEASE_NAME) is not None:
+            session.rollback()
+            return False
+        session.add(JobLease(name=LEASE_NAME, owner=WORKER_ID, expires_at=expires))
+        try:
+            session.commit()
+        except IntegrityError:
+            # otro worker creó la fila a la vez
+            session.rollback()
+            return False
+        return True
+
+
+def _release():
+    with Session(engine) as session:
+        session.exec(
+            update(JobLease)
+            .where((JobLease.name == LEASE_NAME) & (JobLease.owner == WORKER_ID))
+            .values(owner=None, expires_at=datetime.utcnow())
+        )
+        session.commit()
+
+
+async def leadership_task(jobs: List[Callable[[], Awaitable[None]]], on_step_down: Optional[Callable[[], None]] = None):
+    """Run `jobs` as tasks while this worker holds the lease; cancel them when it does not."""
+    loop = asyncio.get_running_loop()
+    heartbeat = JOBS_LEASE_SECONDS / 3
+    running: List[asyncio.Task] = []
+    valid_until = datetime.min
+
+    async def step_down():
+        for task in running:
+            task.cancel()
+        for task in running:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            except Exception:
+                traceback.print_exc()
+        running.clear()
+        if on_step_down:
+            on_step_down()
+        _metrics["is_leader"] = False
+        _metrics["leader_since"] = None
+        _metrics["step_downs"] += 1
+
+    try:
+        while True:
+            now = datetime.utcnow()
+            try:
+                leader = await loop.run_in_executor(None, _try_acquire, now)
+            except Exception:
+                traceback.print_exc()
+                _metrics["renew_failures"] += 1
+                # Sin BD no se puede renovar: seguir solo mientras el lease no haya vencido
+                leader = bool(running) and datetime.utcnow() < valid_until
+            else:
+                if leader:
+                    valid_until = now + timedelta(seconds=JOBS_LEASE_SECONDS)
+                    _metrics["renewals"] += 1
+                    _metrics["last_renewed_at"] = now.isoformat()
+
+            if leader and not running:
+                running.extend(asyncio.create_task(job()) for job in jobs)
+                _metrics["is_leader"] = True
+                _metrics["leader_since"] = now.isoformat()
+                _metrics["acquisitions"] += 1
+            elif not leader and running:
+                await step_down()
+            await asyncio.sleep(heartbeat)
+    finally:
+        if running:
+            await step_down()
+            try:
+                await loop.run_in_executor(None, _release)
+            except Exception:
+                traceback.print_exc()
+
+
+def is_leader() -> bool:
+    """Whether this worker holds the lease and runs the background jobs."""
+    return bool(_metrics["is_leader"])
+
+
+def lease_metrics() -> Dict[str, object]:
+    """This worker's view of the lease, plus the current holder from the DB."""
+    with Session(engine) as session:
+        row = session.get(JobLease, LEASE_NAME)
+        holder = {
+            "owner": row.owner if row else None,
+            "expires_at": row.expires_at.isoformat() if row else None,
+        }
+    return {"worker_id": WORKER_ID, "lease_seconds": JOBS_LEASE_SECONDS, **_metrics, "lease": holder}
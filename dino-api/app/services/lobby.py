@@ -0,0 +1,127 @@
+"""
+Lobby channel (/ws/lobby): the OPEN and RUNNING games, kept up to date with deltas.
+
+GET /games returns every game ever created. A lobby socket gets a compact
+snapshot of the games that can still be joined or watched, then only
+what changes:
+
+- game_created: a new game, published by create_game on LOBBY_CHANNEL;
+- games_updated: sold_tickets and/or status of the games that changed,
+  at most one entry per game every LOBBY_COALESCE_SECONDS;
+- game_removed: the game finished or was cancelled.
+
+The other deltas come from the room events every worker already receives
+(player_joined, game_started, game_cancelled, the final draw_result), so
+purchases, start/cancel, the scheduler and the draws feed the lobby
+without publishing anything else, in the same order on every worker.
+"""
+import asyncio
+from typing import Dict, List, Optional
+
+from fastapi import WebSocket
+from sqlmodel import select
+
+from app.core.bus import LOBBY_CHANNEL, is_game_channel
+from app.core.config import LOBBY_COALESCE_SECONDS
+from app.core.database import async_session
+from app.core.frames import is_final, json_frame
+from app.core.websocket import Outbox, manager
+from app.models.game import Game
+
+
+LOBBY_STATUSES = ("OPEN", "RUNNING")
+# Columnas de cada fila de la foto inicial, en este orden
+COLUMNS = ("id", "creator_id", "price", "min_tickets", "status", "sold_tickets", "max_cards_per_user")
+
+
+def game_row(g: Game) -> list:
+    return [g.id, g.creator_id, g.price, g.min_tickets, g.status, g.sold_tickets, g.max_cards_per_user or 2]
+
+
+async def announce_game(g: Game):
+    """Publish a new game to the lobby of every worker."""
+    await manager.broadcast_to_game(LOBBY_CHANNEL, "game_created", dict(zip(COLUMNS, game_row(g))))
+
+
+class Lobby:
+    """Lobby sockets of this worker and the sold_tickets changes waiting to go out."""
+
+    def __init__(self):
+        self.connections: Dict[WebSocket, Outbox] = {}
+        # frames llegados mientras una conexión lee su foto: van detrás de ella
+        self._joining: Dict[WebSocket, List[str]] = {}
+        self._pending: Dict[str, dict] = {}
+        self._flush: Optional[asyncio.TimerHandle] = None
+        self._resync = json_frame("resync", {"reason": "slow_consumer"})
+
+    async def connect(self, websocket: WebSocket):
+        """Accept a lobby socket and queue its snapshot, then the deltas after it."""
+        await websocket.accept()
+        outbox = Outbox(websocket, self._resync, self._forget)
+        self.connections[websocket] = outbox
+        self._joining[websocket] = []
+        async with async_session() as session:
+            games = (await session.exec(
+                select(Game).where(Game.status.in_(LOBBY_STATUSES)).order_by(Game.created_at)
+            )).all()
+        # Lo llegado durante la lectura puede estar ya en la foto: los deltas son valores
+        # absolutos, así que repetirlos después no cambia nada
+        outbox.push(json_frame("lobby", {"columns": COLUMNS, "rows": [game_row(g) for g in games]}))
+        for frame in self._joining.pop(websocket, ()):
+            outbox.push(frame)
+
+    def _forget(self, websocket: WebSocket):
+        self.connections.pop(websocket, None)
+        self._joining.pop(websocket, None)
+
+    def disconnect(self, websocket: WebSocket):
+        outbox = self.connections.get(websocket)
+        if outbox is not None:
+            outbox.close()
+
+    def send(self, websocket: WebSocket, event_type: str, data: dict):
+        outbox = self.connections.get(websocket)
+        if outbox is not None:
+            outbox.push(json_frame(event_type, data))
+
+    def _broadcast(self, frame: str):
+        for websocket, outbox in list(self.connections.items()):
+            joining = self._joining.get(websocket)
+            if joining is not None:
+                joining.append(frame)
+            else:
+                outbox.push(frame)
+
+    def observe(self, channel: str, event_type: str, data: dict):
+        """ConnectionManager observer: turns the events delivered to this worker into lobby deltas."""
+        if not self.connections:
+            return
+        if channel == LOBBY_CHANNEL:
+            if event_type == "game_created":
+                self._broadcast(json_frame("game_created", data))
+            return
+        if not is_game_channel(channel):
+            return
+        if is_final(event_type, data):
+            self._pending.pop(channel, None)
+            self._broadcast(json_frame("game_removed", {"id": channel}))
+        elif event_type == "player_joined":
+            self._update(channel, sold_tickets=data["sold_tickets"])
+        elif event_type == "game_started":
+            self._update(channel, status="RUNNING")
+
+    def _update(self, game_id: str, **fields):
+        self._pending.setdefault(game_id, {"id": game_id}).update(fields)
+        if self._flush is None:
+            self._flush = asyncio.get_running_loop().call_later(LOBBY_COALESCE_SECONDS, self._send_updates)
+
+    def _send_updates(self):
+        self._flush = None
+        games, self._pending = list(self._pending.values()), {}
+        if games:
+            self._broadcast(json_frame("games_updated", {"games": games}))
+
+
+# Global instance
+lobby = Lobby()
+manager.observers.append(lobby.observe)
@@ -0,0 +1,129 @@
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, case, insert
+from sqlmodel import Session, select, update
+
+from app.core.codecs import WIN_FLAGS
+from app.models.ticket import Ticket
+from app.models.transaction import Transaction
+from app.models.user import User
+from app.models.wallet import Wallet
+from app.schemas import WinnerOut
+
+
+def credit_wallets(session: Session, credits: Dict[str, float]) -> None:
+    """Apply per-user credits with a single set-based UPDATE on wallets."""
+    if not credits:
+        return
+    session.exec(
+        update(Wallet)
+        .where(Wallet.user_id.in_(list(credits)))
+        .values(balance=Wallet.balance + case(credits, value=Wallet.user_id, else_=0.0))
+    )
+
+
+def wallet_balances(session: Session, user_ids) -> Dict[str, float]:
+    """Current balance of each user, read in one query (inside the caller's transaction)."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return {}
+    return dict(session.exec(select(Wallet.user_id, Wallet.balance).where(Wallet.user_id.in_(user_ids))).all())
+
+
+def insert_transactions(session: Session, txns: List[Transaction]) -> None:
+    """Insert transaction rows with one multi-row INSERT."""
+    if txns:
+        session.execute(insert(Transaction), [t.model_dump() for t in txns])
+
+
+def _usernames(session: Session, user_ids: List[str]) -> Dict[str, str]:
+    rows = session.exec(select(User.id, User.alias, User.email).where(User.id.in_(user_ids))).all()
+    return {uid: alias or email.split("@")[0] for uid, alias, email in rows}
+
+
+def settle_draw(
+    session: Session,
+    game_id: str,
+    hits: Dict[str, List[str]],
+    pool: float,
+    scheme: Dict[str, float],
+    commission: Optional[Tuple[str, float]] = None,
+) -> List[WinnerOut]:
+    """
+    Pay every winner of one draw as a set operation.
+
+    `hits` maps each awarded category to its winning ticket ids; each category
+    slice is split equally among its tickets. Credits are aggregated per user
+    (plus the creator `commission`, if any) and applied with one wallet UPDATE,
+    transactions go in one multi-row INSERT, tickets' payout and win flags are
+    updated in place with one executemany and winner aliases are resolved with one IN query, so the
+    number of statements does not grow with the number of winners.
+    """
+    ticket_ids = list({tid for ids in hits.values() for tid in ids})
+    tickets: Dict[str, str] = dict(
+        session.exec(select(Ticket.id, Ticket.user_id).where(Ticket.id.in_(ticket_ids))).all()
+    ) if ticket_ids else {}
+
+    credits: Dict[str, float] = {}
+    txns: List[Transaction] = []
+    ticket_rows: Dict[str, Dict] = {}
+    awarded: List[Tuple[str, str, str, float]] = []  # (ticket_id, user_id, category, amount)
+
+    for category, ids in hits.items():
+        ids = [tid for tid in ids if tid in tickets]
+        if not ids:
+            continue
+        # pagar por partes iguales
+        per_winner = pool * (scheme[category] / 100.0) / len(ids)
+        for tid in ids:
+            uid = tickets[tid]
+            credits[uid] = credits.get(uid, 0.0) + per_winner
+            txns.append(Transaction(
+                user_id=uid,
+                type="prize",
+                amount=per_winner,
+                description=f"Premio {category} · Partida #{game_id[:8]}",
+                reference_id=game_id,
+            ))
+            # acumular payout y wins
+            row = ticket_rows.setdefault(tid, {"tid": tid, "delta": 0.0, "flags": 0})
+            row["delta"] += per_winner
+            row["flags"] |= WIN_FLAGS[category]
+            awarded.append((tid, uid, category, per_winner))
+
+    if commission and commission[1] > 0:
+        creator_id, amount = commission
+        credits[creator_id] = credits.get(creator_id, 0.0) + amount
+        txns.append(Transaction(
+            user_id=creator_id,
+            type="commission",
+            amount=amount,
+            description=f"Comisión de creador · Partida #{game_id[:8]}",
+            reference_id=game_id,
+        ))
+
+    credit_wallets(session, credits)
+    insert_transactions(session, txns)
+    if ticket_rows:
+        tickets_table = Ticket.__table__
+        session.execute(
+            tickets_table.update()
+            .where(tickets_table.c.id == bindparam("tid"))
+            .values(
+                payout=tickets_table.c.payout + bindparam("delta"),
+                win_flags=tickets_table.c.win_flags.op("|")(bindparam("flags")),
+            ),
+            list(ticket_rows.values()),
+        )
+
+    names = _usernames(session, list({uid for _, uid, _, _ in awarded})) if awarded else {}
+    return [
+        WinnerOut(
+            ticket_id=tid,
+            user_id=uid,
+            username=names.get(uid, "Jugador"),
+            amount=amount,
+            category=category,
+        )
+        for tid, uid, category, amount in awarded
+    ]
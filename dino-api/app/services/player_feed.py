@@ -0,0 +1,114 @@
+"""
+Personal updates on an authenticated game socket.
+
+Room events are the same for every socket. A player's socket also gets,
+for each draw, only what changed on that player's own cards, so the
+client neither re-checks its cards against the drawn balls nor polls
+GET /games/{game_id}/my-tickets:
+
+- cards: once, when the socket joins and again when the game starts
+  (tickets can still be bought while it is OPEN): every card with its
+  numbers, marked cells and categories one ball away.
+- card_update: after a draw that hits one of the cards: the ball and, per
+  card holding it, the marked cell and the categories that just became
+  one ball away. Nothing is sent to players the ball does not touch.
+
+Card indexes in card_update refer to the order of `cards`.
+"""
+import asyncio
+from typing import Callable, List, Optional
+
+from sqlmodel import select
+
+from app.core.codecs import decode_balls, decode_card, encode_wins
+from app.core.database import async_session
+from app.core.frames import binary_frame, json_frame
+from app.core.websocket import Message, manager
+from app.models.game import Game
+from app.models.ticket import Ticket
+from app.services.card_index import PlayerCards
+
+
+def _paid_flags(data) -> int:
+    return encode_wins(cat for cat in ("DIAGONAL", "LINE", "BINGO") if data[f"paid_{cat.lower()}"])
+
+
+class PlayerFeed:
+    """Card state of one player in one game room, turned into personal frames."""
+
+    def __init__(self, game_id: str, user_id: str, protocol: str = "json"):
+        self.game_id = game_id
+        self.user_id = user_id
+        self.protocol = protocol
+        # seq de la sala del que el estado cargado es al menos tan reciente
+        self.seq = 0
+        self.cards: Optional[PlayerCards] = None
+        self.paid = 0
+        self._push: Optional[Callable[[Message], None]] = None
+        self._pending: Optional[List[int]] = None
+
+    async def load(self):
+        """Read the player's cards and the drawn balls of the game."""
+        self.seq = manager.last_seq(self.game_id)
+        async with async_session() as session:
+            game = await session.get(Game, self.game_id)
+            rows = (await session.exec(
+                select(Ticket.id, Ticket.card)
+                .where(Ticket.game_id == self.game_id, Ticket.user_id == self.user_id, Ticket.refunded == False)  # noqa: E712
+                .order_by(Ticket.id)
+            )).all()
+        if game is not None:
+            self.paid = _paid_flags({
+                "paid_diagonal": game.paid_diagonal, "paid_line": game.paid_line, "paid_bingo": game.paid_bingo,
+            })
+        self.cards = PlayerCards(rows, decode_balls(game.drawn_sequence) if game is not None else ())
+
+    def bind(self, push: Callable[[Message], None]):
+        """Where to queue the frames produced outside a room event (the reload on game start)."""
+        self._push = push
+
+    def initial(self) -> str:
+        cards = self.cards
+        return json_frame("cards", {"tickets": [
+            {
+                "id": ticket_id,
+                "numbers": decode_card(cards.cards[idx]),
+                "marked": cards.marked[idx],
+                "near": cards.near[idx] & ~self.paid,
+            }
+            for idx, ticket_id in enumerate(cards.ticket_ids)
+        ]})
+
+    def apply(self, seq: Optional[int], event_type: str, data: dict) -> Optional[Message]:
+        """Personal frame for a room event, or None if it changes nothing on the player's cards."""
+        if event_type == "game_started":
+            asyncio.create_task(self._reload())
+            return None
+        if event_type != "draw_result" or self.cards is None:
+            return None
+        if self._pending is not None:
+            # Recargando: la foto nueva ya incluirá esta bola
+            self._pending.append(data["number"])
+            return None
+        self.paid = _paid_flags(data)
+        changes = self.cards.mark(data["number"])
+        if not changes:
+            return None
+        payload = {
+            "ball": data["number"],
+            "cards": [[idx, cell, near & ~self.paid] for idx, cell, near in changes],
+        }
+        if self.protocol == "binary":
+            return binary_frame("card_update", payload, seq)
+        return json_frame("card_update", payload, seq)
+
+    async def _reload(self):
+        self._pending = []
+        try:
+            await self.load()
+        finally:
+            pending, self._pending = self._pending, None
+        for number in pending:
+            self.cards.mark(number)
+        if self._push is not None:
+            self._push(self.initial())
@@ -0,0 +1,147 @@
+"""
+Ticket purchase, shared by the single, auto and batch endpoints.
+
+Counters and balances are never read-modify-written in Python: the game
+counter and the wallet are changed with conditional UPDATEs whose WHERE
+clause carries the precondition (game still OPEN, enough balance), and a
+rowcount of 0 means the precondition failed. The game UPDATE runs first, so
+its row lock serializes concurrent purchases of the same game for the rest
+of the transaction; the per-user card cap and the card uniqueness check
+are therefore consistent.
+"""
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, func, select, update
+
+from app.core.codecs import card_fingerprint
+from app.models.game import Game
+from app.models.ticket import Ticket
+from app.models.transaction import Transaction
+from app.models.user import User
+from app.models.wallet import Wallet
+from app.services.cards import CardCollisionError, card_taken, unique_auto_cards
+
+
+class PurchaseError(Exception):
+    """A purchase was rejected; carries the HTTP status to report."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class PurchaseResult:
+    def __init__(self, game_id: str, tickets: List[Tuple[str, bytes]], sold_tickets: int, autostart_due: bool = False):
+        self.game_id = game_id
+        self.tickets = tickets  # (ticket_id, card)
+        self.sold_tickets = sold_tickets
+        self.autostart_due = autostart_due  # esta compra alcanzó el umbral de autoinicio
+
+
+def purchase_tickets(
+    session: Session,
+    game_id: str,
+    user_id: str,
+    count: int = 1,
+    card: Optional[bytes] = None,
+    description: str = "Compra de cartón",
+) -> PurchaseResult:
+    """
+    Buy `count` tickets for the user in one commit.
+
+    With `card` the single ticket uses that (already encoded) card and a
+    duplicate is rejected; otherwise unique cards are generated. Debits the
+    wallet once and writes one aggregated purchase transaction.
+    """
+    game = session.get(Game, game_id)
+    if not game:
+        raise PurchaseError(404, "Juego no encontrado")
+    if game.status != "OPEN":
+        raise PurchaseError(409, "El juego no está abierto para ventas")
+    # usuario verificado
+    u = session.get(User, user_id)
+    if not u or not u.is_verified:
+        raise PurchaseError(403, "Usuario no verificado")
+    # creador no puede jugar su propia partida
+    if game.creator_id == user_id:
+        raise PurchaseError(403, "No puedes jugar tu propia partida")
+    cap = game.max_cards_per_user
+    threshold = game.autostart_threshold if game.autostart_enabled else None
+    price = float(game.price)
+    total = price * count
+
+    try:
+        # 1) contador de la partida, solo si sigue abierta (bloquea la fila)
+        res = session.execute(
+            update(Game)
+            .where((Game.id == game_id) & (Game.status == "OPEN"))
+            .values(sold_tickets=Game.sold_tickets + count)
+            .execution_options(synchronize_session=False)
+        )
+        if res.rowcount != 1:
+            raise PurchaseError(409, "El juego no está abierto para ventas")
+
+        # 2) máximo de cartones por usuario (índice tickets(game_id, user_id))
+        owned = session.exec(
+            select(func.count()).select_from(Ticket).where((Ticket.game_id == game_id) & (Ticket.user_id == user_id))
+        ).one()
+        if owned + count > cap:
+            raise PurchaseError(409, f"Máximo {cap} cartones por partida")
+
+        # 3) cartones únicos dentro de la partida
+        if card is not None:
+            fp = card_fingerprint(card)
+            if card_taken(session, game_id, fp):
+                raise PurchaseError(409, "Ya existe un cartón idéntico en esta partida")
+            cards: List[Tuple[bytes, int]] = [(card, fp)]
+        else:
+            try:
+                cards = unique_auto_cards(session, game_id, count)
+            except CardCollisionError:
+                raise PurchaseError(503, "No se pudo generar un cartón único, intenta de nuevo")
+
+        # 4) débito solo si el saldo alcanza
+        res = session.execute(
+            update(Wallet)
+            .where((Wallet.user_id == user_id) & (Wallet.balance >= total))
+            .values(balance=Wallet.balance - total)
+            .execution_options(synchronize_session=False)
+        )
+        if res.rowcount != 1:
+            raise PurchaseError(402, "Saldo insuficiente")
+
+        tickets = [Ticket(game_id=game_id, user_id=user_id, card=c, fingerprint=fp) for c, fp in cards]
+        session.add_all(tickets)
+        session.add(Transaction(
+            user_id=user_id,
+            type="purchase",
+            amount=-total,
+            description=f"{description} · Partida #{game_id[:8]}",
+            reference_id=game_id,
+        ))
+        # si se alcanza el mínimo por primera vez, registrar timestamp
+        session.execute(
+            update(Game)
+            .where(
+                (Game.id == game_id)
+                & (Game.reached_min_at == None)  # noqa: E711
+                & (Game.sold_tickets >= Game.min_tickets)
+            )
+            .values(reached_min_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        sold = session.exec(select(Game.sold_tickets).where(Game.id == game_id)).one()
+        bought = [(t.id, t.card) for t in tickets]
+        session.commit()
+    except PurchaseError:
+        session.rollback()
+        raise
+    except IntegrityError:
+        # otra compra simultánea se llevó el mismo cartón
+        session.rollback()
+        raise PurchaseError(409, "Ya existe un cartón idéntico en esta partida")
+    crossed = bool(threshold) and sold - count < threshold <= sold
+    return PurchaseResult(game_id, bought, sold, autostart_due=crossed)
@@ -0,0 +1,107 @@
+from datetime import datetime
+from typing import Dict, Optional
+from uuid import uuid4
+
+from sqlalchemy import insert
+from sqlmodel import Session, func, select, update
+
+from app.core.websocket import manager
+from app.models.game import Game
+from app.models.ticket import Ticket
+from app.models.transaction import Transaction
+from app.models.wallet import Wallet
+from app.services.payouts import wallet_balances
+
+
+class RefundResult:
+    def __init__(self, game_id: str, price: float, tickets: Dict[str, int], balances: Dict[str, float]):
+        self.game_id = game_id
+        self.price = price
+        self.tickets = tickets  # user_id -> cartones reembolsados
+        self.balances = balances  # user_id -> saldo tras el reembolso
+
+    @property
+    def refunded(self) -> int:
+        return sum(self.tickets.values())
+
+
+def refund_game(session: Session, g: Game) -> Optional[RefundResult]:
+    """
+    Cancel a game and refund every ticket not yet refunded, as a set operation.
+
+    Every ticket of a game costs the same, so each buyer's credit is the
+    price times their unrefunded ticket count: wallets are credited with one
+    UPDATE driven by a correlated count, one refund transaction per buyer
+    goes in a multi-row INSERT and the tickets are flagged with one UPDATE.
+    The number of statements does not grow with the number of tickets.
+    Does not commit; returns the tickets refunded per buyer and their new
+    balances, or None if the game was no longer OPEN or READY (started or
+    cancelled meanwhile), in which case nothing was written.
+    """
+    # Cerrar la partida primero: las compras exigen status OPEN y el lock de la fila
+    # espera a las que estén en curso. Paso condicionado, como el inicio: si la
+    # partida se inició a la vez, gana uno solo y aquí no se toca nada
+    result = session.exec(
+        update(Game)
+        .where((Game.id == g.id) & Game.status.in_(("OPEN", "READY")))
+        .values(status="CANCELLED")
+    )
+    if result.rowcount != 1:
+        return None
+
+    price = float(g.price)
+    pending = (Ticket.game_id == g.id) & (Ticket.refunded == False)
+    per_user = session.exec(
+        select(Ticket.user_id, func.count()).where(pending).group_by(Ticket.user_id)
+    ).all()
+    if not per_user:
+        return RefundResult(g.id, price, {}, {})
+
+    owned = select(func.count()).select_from(Ticket).where(pending & (Ticket.user_id == Wallet.user_id)).scalar_subquery()
+    session.exec(
+        update(Wallet)
+        .where(Wallet.user_id.in_(select(Ticket.user_id).where(pending)))
+        .values(balance=Wallet.balance + price * owned)
+        .execution_options(synchronize_session=False)
+    )
+
+    # Filas planas en vez de instancias del modelo (mismos valores por defecto)
+    now = datetime.utcnow()
+    session.execute(insert(Transaction), [
+        {
+            "id": str(uuid4()),
+            "user_id": uid,
+            "type": "refund",
+            "amount": price * count,
+            "description": (
+                f"Reembolso por cancelación · Partida #{g.id[:8]}" if count == 1
+                else f"Reembolso por cancelación ({count} cartones) · Partida #{g.id[:8]}"
+            ),
+            "reference_id": g.id,
+            "status": "pending",
+            "created_at": now,
+        }
+        for uid, count in per_user
+    ])
+    session.exec(
+        update(Ticket).where(pending).values(refunded=True).execution_options(synchronize_session=False)
+    )
+    tickets = dict(per_user)
+    return RefundResult(g.id, price, tickets, wallet_balances(session, tickets))
+
+
+async def broadcast_refund(result: RefundResult):
+    """Emit a cancelled game to its room, then a wallet event to each refunded buyer."""
+    await manager.broadcast_to_game(result.game_id, "game_cancelled", {
+        "game_id": result.game_id,
+        "status": "CANCELLED",
+        "refunded_tickets": result.refunded,
+    })
+    for user_id, count in result.tickets.items():
+        await manager.notify_user(user_id, "wallet", {
+            "reason": "refund",
+            "game_id": result.game_id,
+            "amount": result.price * count,
+            "tickets": count,
+            "balance": result.balances.get(user_id),
+        })
@@ -0,0 +1,113 @@
+import asyncio
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.bus import is_game_channel
+from app.core.codecs import decode_balls, encode_balls
+from app.core.frames import is_final
+from app.core.websocket import manager
+from app.models.game import Game
+from app.models.ticket import Ticket
+from app.services.bingo import shuffled_draw_order
+from app.services.card_index import DrawSchedule, VectorCardIndex
+
+
+def prize_pool(sold_tickets: int, price: float, commission_percent: float) -> Tuple[float, float, float]:
+    gross = float(sold_tickets or 0) * float(price)
+    commission = gross * (float(commission_percent) / 100.0)
+    pool = gross - commission
+    return gross, commission, pool
+
+
+class GameRuntime:
+    """
+    In-memory state of a RUNNING game.
+
+    Tickets cannot change once a game is RUNNING, so the parsed cards, the
+    drawn numbers, the prize flags and the pool figures stay resident for the
+    whole life of the game. The database remains the source of truth:
+    `stored_drawn` mirrors the last `drawn_sequence` value this runtime saw,
+    and writes are conditioned on it so a stale runtime is detected and
+    rebuilt instead of overwriting newer state.
+    """
+
+    def __init__(self, game: Game, order: List[int], schedule: DrawSchedule):
+        self.game_id = game.id
+        self.creator_id = game.creator_id
+        self.price = float(game.price)
+        self.sold_tickets = int(game.sold_tickets or 0)
+        self.commission_percent = float(game.commission_percent)
+        self.gross, self.commission, self.pool = prize_pool(self.sold_tickets, self.price, self.commission_percent)
+        self.stored_drawn: Optional[bytes] = game.drawn_sequence
+        self.drawn: List[int] = decode_balls(game.drawn_sequence)
+        self.paid: Dict[str, bool] = {
+            "DIAGONAL": bool(game.paid_diagonal),
+            "LINE": bool(game.paid_line),
+            "BINGO": bool(game.paid_bingo),
+        }
+        self.order = order
+        self.schedule = schedule
+
+    def next_number(self) -> Optional[int]:
+        if len(self.drawn) >= len(self.order):
+            return None
+        return self.order[len(self.drawn)]
+
+
+# Partidas en curso residentes en memoria (game_id -> runtime)
+_runtimes: Dict[str, GameRuntime] = {}
+
+
+def build_schedule(cards: Sequence[Tuple[str, bytes]], order: List[int]) -> DrawSchedule:
+    """Winning draw of every card for `order`. CPU only: callers run it off the event loop."""
+    index = VectorCardIndex(cards)
+    return DrawSchedule(index.ticket_ids, index.win_draws(order))
+
+
+async def load_runtime(session: AsyncSession, game: Game) -> GameRuntime:
+    """Build the runtime of a RUNNING game from the database and register it."""
+    drawn = decode_balls(game.drawn_sequence)
+    order = decode_balls(game.draw_plan)
+    if len(order) != 75 or order[:len(drawn)] != drawn:
+        # Partidas iniciadas sin orden fijado: se completa a partir de lo ya sorteado
+        order = shuffled_draw_order(drawn)
+        game.draw_plan = encode_balls(order)
+        session.add(game)
+        await session.commit()
+    cards = (await session.exec(select(Ticket.id, Ticket.card).where(Ticket.game_id == game.id))).all()
+    # Cálculo vectorizado sobre todos los cartones, en un hilo: no frena el loop del worker
+    schedule = await asyncio.to_thread(build_schedule, cards, order)
+    rt = GameRuntime(game, order, schedule)
+    _runtimes[game.id] = rt
+    return rt
+
+
+async def get_runtime(session: AsyncSession, game_id: str) -> Optional[GameRuntime]:
+    """
+    Return the resident runtime of a RUNNING game, rebuilding it lazily
+    (e.g. after a restart). Returns None if the game is not RUNNING.
+    """
+    rt = _runtimes.get(game_id)
+    if rt is not None:
+        return rt
+    game = await session.get(Game, game_id)
+    if not game or game.status != "RUNNING":
+        return None
+    return await load_runtime(session, game)
+
+
+def evict_runtime(game_id: str) -> None:
+    _runtimes.pop(game_id, None)
+
+
+def _evict_finished(channel: str, event_type: str, data: dict):
+    """ConnectionManager observer: drop the runtime of a game that finished or was cancelled."""
+    # Llega a todos los workers por el bus: también se libera el runtime que otro
+    # worker cargó para sortear (p. ej. antes de un cambio de líder)
+    if is_game_channel(channel) and is_final(event_type, data):
+        evict_runtime(channel)
+
+
+manager.observers.append(_evict_finished)
@@ -1,79 +1,395 @@
 import asyncio
+import heapq
+import random
 from datetime import datetime, timedelta
-from sqlmodel import Session, select
-from app.core.database import engine
+from typing import Dict, List, Optional, Tuple
+from anyio import from_thread
+from sqlmodel import Session, select, update
+from app.core.bus import JOBS_CHANNEL
+from app.core.codecs import encode_balls
+from app.core.config import AUTO_DRAW_JITTER_SECONDS, JOBS_RESYNC_SECONDS
+from app.core.database import async_session
+from app.core.websocket import manager
 from app.models.game import Game
-from app.models.ticket import Ticket
-from app.models.wallet import Wallet
+from app.services.bingo import shuffled_draw_order
+from app.services.refunds import RefundResult, broadcast_refund, refund_game
+from app.services.draws import DrawError, broadcast_draw, draw_lock, perform_draw
+from app.services.leader import is_leader
+from app.services.runtime import get_runtime
 import traceback
 
 
+# --- Plazos de partidas abiertas ---
+# Cada partida OPEN tiene a lo sumo un próximo instante en que hay que revisarla
+# (autoinicio tras el retraso, expiración a las 24 h, ventana de 2 h para iniciar a
+# mano). Se guardan en un heap de (instante, game_id); una entrada cuyo instante ya
+# no coincide con _next_check está obsoleta y se descarta al salir.
+EXPIRY_AFTER = timedelta(hours=24)
+MANUAL_START_WINDOW = timedelta(hours=2)
+
+_check_heap: List[Tuple[datetime, str]] = []
+_next_check: Dict[str, datetime] = {}
+_check_wakeup: Optional[asyncio.Event] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def next_check_at(g: Game, now: datetime) -> Optional[datetime]:
+    """Next time the housekeeper must look at an OPEN game, or None if never."""
+    if g.status != "OPEN":
+        return None
+    sold = g.sold_tickets or 0
+    times: List[datetime] = []
+    if g.autostart_enabled and g.autostart_threshold and sold >= g.autostart_threshold:
+        if not g.reached_threshold_at:
+            return now
+        times.append(g.reached_threshold_at + timedelta(minutes=g.autostart_delay_minutes or 0))
+    if sold >= g.min_tickets and not g.reached_min_at:
+        return now
+    expiry = (g.created_at or now) + EXPIRY_AFTER
+    if sold < g.min_tickets:
+        times.append(expiry)
+    elif not g.autostart_enabled and g.reached_min_at:
+        times.append(max(expiry, g.reached_min_at + MANUAL_START_WINDOW))
+    return min(times) if times else None
+
+
+def _push_check(game_id: str, when: datetime):
+    current = _next_check.get(game_id)
+    if current is not None and current <= when:
+        return
+    _next_check[game_id] = when
+    heapq.heappush(_check_heap, (when, game_id))
+    if _check_wakeup is not None and _check_heap[0] == (when, game_id):
+        _check_wakeup.set()
+
+
+def schedule_game_check(game_id: str, when: Optional[datetime] = None):
+    """
+    Ask the housekeeper to look at a game at `when` (default: now).
+
+    Safe to call from request handlers running in the threadpool. On a
+    worker without the jobs lease the request goes to the leader's
+    housekeeper over the bus.
+    """
+    when = when or datetime.utcnow()
+    if is_leader() and _loop is not None and not _loop.is_closed():
+        _loop.call_soon_threadsafe(_push_check, game_id, when)
+        return
+    _forward("game_check", {"game_id": game_id, "when": when.isoformat()})
+
+
+def _apply_game_rules(session: Session, game_ids: List[str], now: datetime) -> Tuple[List[Tuple[str, Optional[int]]], List[RefundResult], Dict[str, datetime]]:
+    """
+    Apply autostart / expiry rules to the given games and commit.
+
+    Returns (started [(game_id, auto_draw_interval)], cancelled [refunds],
+    next check per game still OPEN).
+    """
+    started: List[Tuple[str, Optional[int]]] = []
+    cancelled: List[RefundResult] = []
+    upcoming: Dict[str, datetime] = {}
+    games = session.exec(select(Game).where(Game.id.in_(game_ids) & (Game.status == "OPEN"))).all()
+    for g in games:
+        sold = g.sold_tickets or 0
+
+        # --- AUTO-START LOGIC ---
+        if g.autostart_enabled and g.autostart_threshold and sold >= g.autostart_threshold:
+            # Record when threshold was reached
+            if not g.reached_threshold_at:
+                g.reached_threshold_at = now
+                session.add(g)
+            # Wait for delay before starting (default 0 = immediate)
+            delay_minutes = g.autostart_delay_minutes or 0
+            if now - g.reached_threshold_at >= timedelta(minutes=delay_minutes):
+                # Condicionado a OPEN: si el creador la inició a la vez, gana uno solo
+                result = session.exec(
+                    update(Game)
+                    .where((Game.id == g.id) & (Game.status == "OPEN"))
+                    .values(status="RUNNING", draw_plan=encode_balls(shuffled_draw_order()))
+                )
+                if result.rowcount == 1:
+                    started.append((g.id, g.auto_draw_interval_seconds))
+                continue
+
+        # --- MINIMUM TICKETS LOGIC (for manual start games) ---
+        if sold >= g.min_tickets and not g.reached_min_at:
+            g.reached_min_at = now
+            session.add(g)
+
+        # --- EXPIRATION LOGIC ---
+        # Cancel games that don't reach minimum after 24 hours
+        if now - (g.created_at or now) >= EXPIRY_AFTER:
+            # refund_game devuelve None si la partida se inició o canceló a la vez: se omite
+            if sold < g.min_tickets:
+                refund = refund_game(session, g)
+                if refund is not None:
+                    cancelled.append(refund)
+                continue
+            # For manual-start games without autostart:
+            # Cancel if min reached but not started within 2 hours
+            if not g.autostart_enabled and g.reached_min_at and now - g.reached_min_at >= MANUAL_START_WINDOW:
+                refund = refund_game(session, g)
+                if refund is not None:
+                    cancelled.append(refund)
+                continue
+
+        when = next_check_at(g, now)
+        if when is not None:
+            upcoming[g.id] = when
+    session.commit()
+    return started, cancelled, upcoming
+
+
+async def _process_games(game_ids: List[str], now: datetime):
+    # Las reglas son código síncrono compartido; la E/S de la BD no bloquea el loop
+    async with async_session() as session:
+        return await session.run_sync(_apply_game_rules, game_ids, now)
+
+
+async def _load_started_runtimes(started: List[Tuple[str, Optional[int]]]):
+    """Build the runtime of each game the housekeeper just started, one at a time."""
+    for game_id, _ in started:
+        try:
+            # get_runtime respeta el runtime que un sorteo automático ya haya cargado
+            async with async_session() as session:
+                await get_runtime(session, game_id)
+        except Exception:
+            # La partida ya está RUNNING en la BD: el primer sorteo volverá a intentarlo
+            traceback.print_exc()
+
+
+async def _open_game_checks(now: datetime) -> Dict[str, datetime]:
+    """
+    Next check for every OPEN game, to seed the heap on startup and to pick
+    up games created or sold by other workers.
+    """
+    async with async_session() as session:
+        games = (await session.exec(select(Game).where(Game.status == "OPEN"))).all()
+    checks = {}
+    for g in games:
+        when = next_check_at(g, now)
+        if when is not None:
+            checks[g.id] = when
+    return checks
+
+
+async def _resync_checks():
+    try:
+        for game_id, when in (await _open_game_checks(datetime.utcnow())).items():
+            _push_check(game_id, when)
+    except Exception:
+        traceback.print_exc()
+
+
 async def housekeeper_task():
-    """Background task to manage game states and auto-start games."""
+    """Background task that starts and expires OPEN games when their deadlines come due."""
+    global _loop, _check_wakeup
+    _loop = asyncio.get_running_loop()
+    _check_wakeup = asyncio.Event()
+    # Con varios workers, otros procesos crean partidas y venden cartones sin avisar
+    # a este heap: se relee la BD cada JOBS_RESYNC_SECONDS
+    next_resync = _loop.time()
+
     while True:
+        if _loop.time() >= next_resync:
+            await _resync_checks()
+            next_resync = _loop.time() + JOBS_RESYNC_SECONDS
+        now = datetime.utcnow()
+        due: List[str] = []
+        while _check_heap and _check_heap[0][0] <= now:
+            when, game_id = heapq.heappop(_check_heap)
+            if _next_check.get(game_id) == when:
+                del _next_check[game_id]
+                due.append(game_id)
+        if not due:
+            timeout = next_resync - _loop.time()
+            if _check_heap:
+                timeout = min(timeout, (_check_heap[0][0] - now).total_seconds())
+            try:
+                await asyncio.wait_for(_check_wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            _check_wakeup.clear()
+            continue
+
         try:
-            now = datetime.utcnow()
-            with Session(engine) as session:
-                games_open = session.exec(select(Game).where(Game.status == "OPEN")).all()
-                for g in games_open:
-                    sold = g.sold_tickets or 0
-                    
-                    # --- AUTO-START LOGIC ---
-                    if g.autostart_enabled and g.autostart_threshold:
-                        # Check if threshold is reached
-                        if sold >= g.autostart_threshold:
-                            # Record when threshold was reached
-                            if not g.reached_threshold_at:
-                                g.reached_threshold_at = now
-                                session.add(g)
-                            else:
-                                # Wait for delay before starting (default 0 = immediate)
-                                delay_minutes = g.autostart_delay_minutes or 0
-                                if now - g.reached_threshold_at >= timedelta(minutes=delay_minutes):
-                                    g.status = "RUNNING"
-                                    session.add(g)
-                                    continue
-                    
-                    # --- MINIMUM TICKETS LOGIC (for manual start games) ---
-                    if sold >= g.min_tickets:
-                        if not g.reached_min_at:
-                            g.reached_min_at = now
-                            session.add(g)
-                    
-                    # --- EXPIRATION LOGIC ---
-                    # Cancel games that don't reach minimum after 24 hours
-                    game_age = now - (g.created_at or now)
-                    if game_age > timedelta(hours=24):
-                        if sold < g.min_tickets:
-                            cancel_and_refund(session, g)
-                            continue
-                        
-                        # For manual-start games without autostart: 
-                        # Cancel if min reached but not started within 2 hours
-                        if not g.autostart_enabled and g.reached_min_at:
-                            time_since_min = now - g.reached_min_at
-                            if time_since_min > timedelta(hours=2):
-                                cancel_and_refund(session, g)
-                                continue
-                
-                session.commit()
+            started, cancelled, upcoming = await _process_games(due, now)
         except Exception:
             traceback.print_exc()
-        await asyncio.sleep(60)
-
-
-def cancel_and_refund(session: Session, g: Game):
-    """Cancels a game and refunds all non-refunded tickets."""
-    price = float(g.price)
-    tickets = session.exec(
-        select(Ticket).where((Ticket.game_id == g.id) & (Ticket.refunded == False))
-    ).all()
-    for t in tickets:
-        w = session.exec(select(Wallet).where(Wallet.user_id == t.user_id)).first()
-        if w:
-            w.balance = float(w.balance or 0.0) + price
-            session.add(w)
-        t.refunded = True
-        session.add(t)
-    g.status = "CANCELLED"
-    session.add(g)
+            # Nada confirmado: reintentar más tarde en lugar de perder los plazos
+            for game_id in due:
+                _push_check(game_id, now + timedelta(minutes=1))
+            continue
+        # Los cambios ya están confirmados: primero los avisos, luego los runtimes, que
+        # pueden fallar sin perder los avisos ni volver a encolar partidas ya resueltas
+        for game_id, when in upcoming.items():
+            _push_check(game_id, when)
+        for game_id, interval in started:
+            if interval:
+                schedule_auto_draw(game_id, interval)
+            await manager.broadcast_to_game(game_id, "game_started", {"game_id": game_id, "status": "RUNNING"})
+        for refund in cancelled:
+            await broadcast_refund(refund)
+        await _load_started_runtimes(started)
+
+
+# --- Sorteo automático ---
+# Un único temporizador para todas las partidas automáticas: heap de (vencimiento, game_id).
+_auto_heap: List[Tuple[float, str]] = []
+_auto_games: Dict[str, int] = {}  # game_id -> intervalo en segundos
+_auto_wakeup: Optional[asyncio.Event] = None
+
+
+def _wakeup() -> asyncio.Event:
+    global _auto_wakeup
+    if _auto_wakeup is None:
+        _auto_wakeup = asyncio.Event()
+    return _auto_wakeup
+
+
+def _jitter(interval_seconds: int) -> float:
+    # Variación simétrica y acotada: separa partidas con el mismo intervalo sin desplazar su cadencia media
+    spread = min(AUTO_DRAW_JITTER_SECONDS, interval_seconds / 4)
+    return random.uniform(-spread, spread) if spread > 0 else 0.0
+
+
+def schedule_auto_draw(game_id: str, interval_seconds: int):
+    """
+    Register a RUNNING game for server-driven draws every `interval_seconds`.
+
+    Must run on the event loop. On a worker without the jobs lease the game
+    goes to the leader's timer over the bus.
+    """
+    if not is_leader():
+        _forward("auto_draw", {"game_id": game_id, "interval": interval_seconds})
+        return
+    _push_auto_draw(game_id, interval_seconds)
+
+
+def _push_auto_draw(game_id: str, interval_seconds: int):
+    loop = asyncio.get_running_loop()
+    first = game_id not in _auto_games
+    _auto_games[game_id] = interval_seconds
+    if first:
+        heapq.heappush(_auto_heap, (loop.time() + interval_seconds + _jitter(interval_seconds), game_id))
+        _wakeup().set()
+
+
+def unschedule_auto_draw(game_id: str):
+    # La entrada del heap se descarta al vencer
+    _auto_games.pop(game_id, None)
+
+
+async def _running_auto_games() -> List[Tuple[str, int]]:
+    """RUNNING auto-draw games: started before a restart or by another worker."""
+    async with async_session() as session:
+        rows = (await session.exec(
+            select(Game.id, Game.auto_draw_interval_seconds)
+            .where((Game.status == "RUNNING") & (Game.auto_draw_interval_seconds != None))  # noqa: E711
+        )).all()
+    return [(game_id, interval) for game_id, interval in rows if interval]
+
+
+async def _resync_auto_games():
+    try:
+        for game_id, interval in await _running_auto_games():
+            schedule_auto_draw(game_id, interval)
+    except Exception:
+        traceback.print_exc()
+
+
+async def _run_auto_draw(game_id: str) -> bool:
+    """Run one draw for an auto game. Returns whether it must keep drawing."""
+    async with draw_lock(game_id):
+        async with async_session() as session:
+            rt = await get_runtime(session, game_id)
+            if rt is None or rt.next_number() is None:
+                return False
+            try:
+                outcome = await session.run_sync(perform_draw, rt)
+            except DrawError:
+                # Estado desfasado: se reintenta en el próximo turno con el runtime recargado
+                return True
+        await broadcast_draw(outcome)
+    return not outcome.finished
+
+
+async def auto_draw_task():
+    """Background task that draws balls for every auto-draw game from a single timer heap."""
+    loop = asyncio.get_running_loop()
+    wakeup = _wakeup()
+    next_resync = loop.time()
+    while True:
+        if loop.time() >= next_resync:
+            await _resync_auto_games()
+            next_resync = loop.time() + JOBS_RESYNC_SECONDS
+        if not _auto_heap:
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=next_resync - loop.time())
+            except asyncio.TimeoutError:
+                pass
+            wakeup.clear()
+            continue
+        due, game_id = _auto_heap[0]
+        delay = min(due, next_resync) - loop.time()
+        if delay > 0:
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            wakeup.clear()
+            continue
+        heapq.heappop(_auto_heap)
+        interval = _auto_games.get(game_id)
+        if interval is None:
+            continue
+        try:
+            keep = await _run_auto_draw(game_id)
+        except Exception:
+            traceback.print_exc()
+            keep = True
+        if not keep:
+            unschedule_auto_draw(game_id)
+            continue
+        # Mantener la cadencia sin ráfagas si el sorteo se atrasó
+        next_due = max(due + interval, loop.time()) + _jitter(interval)
+        heapq.heappush(_auto_heap, (next_due, game_id))
+
+
+# --- Avisos de otros workers ---
+# Solo el líder tiene los heaps en marcha: el resto le reenvía por el bus los plazos
+# y las partidas automáticas nuevas en vez de esperar a su próxima relectura de la BD.
+
+def _forward(event_type: str, data: dict):
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # handler síncrono en el threadpool de AnyIO
+        try:
+            from_thread.run(manager.bus.publish, JOBS_CHANNEL, event_type, data)
+        except RuntimeError:
+            # fuera de un worker thread (sin event loop disponible)
+            pass
+        return
+    loop.create_task(manager.bus.publish(JOBS_CHANNEL, event_type, data))
+
+
+def _on_jobs_event(channel: str, event_type: str, data: dict):
+    """ConnectionManager observer: the leader applies the wake-ups forwarded by other workers."""
+    if channel != JOBS_CHANNEL or not is_leader():
+        return
+    if event_type == "game_check":
+        _push_check(data["game_id"], datetime.fromisoformat(data["when"]))
+    elif event_type == "auto_draw":
+        _push_auto_draw(data["game_id"], data["interval"])
+
+
+manager.observers.append(_on_jobs_event)
+
+
+def reset_schedules():
+    """Forget every deadline and auto-draw timer (this worker lost the jobs lease)."""
+    _check_heap.clear()
+    _next_check.clear()
+    _auto_heap.clear()
+    _auto_games.clear()
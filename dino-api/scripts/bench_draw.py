@@ -0,0 +1,116 @@
+"""
+Draw latency with 1k, 10k and 100k cards in one game.
+
+Seeds a throw-away SQLite database with one RUNNING game per size
+(`--sizes`, cards spread over 50 players) and, for each game, times:
+
+- runtime: building the resident runtime (cards read + vectorized win
+  draws in a thread), once per game when it starts or after a restart;
+- draws:   every draw until BINGO through the same path as
+           POST /games/{game_id}/draw (draw lock, `perform_draw` on the
+           async session, `broadcast_draw` to an empty room).
+
+    python scripts/bench_draw.py --sizes 1000 10000 100000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _seed(sizes):
+    """One RUNNING game per size with that many cards; returns {size: game_id}."""
+    from sqlalchemy import insert
+    from sqlmodel import Session
+
+    from app.core.codecs import card_fingerprint, encode_balls
+    from app.core.database import engine, init_db
+    from app.models import Game, Ticket, User, Wallet
+    from app.services.bingo import generate_bingo_cards, shuffled_draw_order
+
+    init_db()
+    with Session(engine) as session:
+        creator = User(email="bench-creator@dino.local", hashed_password="-", is_verified=True)
+        players = [User(email=f"bench-{i}@dino.local", hashed_password="-", is_verified=True) for i in range(50)]
+        session.add_all([creator, *players])
+        session.flush()
+        session.add_all([Wallet(user_id=u.id, balance=0.0) for u in [creator, *players]])
+        games = {}
+        for n in sizes:
+            g = Game(creator_id=creator.id, price=1.0, status="RUNNING", sold_tickets=n,
+                     draw_plan=encode_balls(shuffled_draw_order()))
+            session.add(g)
+            session.flush()
+            session.execute(insert(Ticket), [
+                {"game_id": g.id, "user_id": players[i % len(players)].id, "card": row.tobytes(),
+                 "fingerprint": card_fingerprint(row.tobytes())}
+                for i, row in enumerate(generate_bingo_cards(n, seed=n))
+            ])
+            games[n] = g.id
+        session.commit()
+    return games
+
+
+async def _bench(game_id: str):
+    from app.core.database import async_session
+    from app.services.draws import broadcast_draw, draw_lock, perform_draw
+    from app.services.runtime import get_runtime
+
+    async with async_session() as session:
+        started = time.perf_counter()
+        await get_runtime(session, game_id)
+        build = (time.perf_counter() - started) * 1000
+
+    latencies = []
+    winners = 0
+    while True:
+        started = time.perf_counter()
+        async with draw_lock(game_id):
+            async with async_session() as session:
+                rt = await get_runtime(session, game_id)
+                outcome = await session.run_sync(perform_draw, rt)
+            await broadcast_draw(outcome)
+        latencies.append((time.perf_counter() - started) * 1000)
+        winners += len(outcome.winners)
+        if outcome.finished:
+            return build, latencies, winners
+
+
+def _pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def _run(sizes, games):
+    rows = []
+    for n in sizes:
+        build, lat, winners = await _bench(games[n])
+        rows.append((n, build, len(lat), statistics.median(lat), _pct(lat, 0.95), max(lat), winners))
+
+    print(f"\n{'cartones':>9} {'runtime':>10} {'sorteos':>8} {'sorteo p50':>11} {'sorteo p95':>11} {'sorteo max':>11} {'ganadores':>10}")
+    for n, build, draws, p50, p95, top, winners in rows:
+        print(f"{n:>9} {build:>8.1f}ms {draws:>8} {p50:>9.1f}ms {p95:>9.1f}ms {top:>9.1f}ms {winners:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Latencia de sorteo según el número de cartones de la partida")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    args = parser.parse_args(argv)
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='dino-bench-'), 'bench.db')}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ["BROADCAST_BUS"] = "local"
+    sys.path.insert(0, ROOT)
+
+    started = time.perf_counter()
+    games = _seed(args.sizes)
+    print(f"BD preparada en {time.perf_counter() - started:.1f} s")
+    asyncio.run(_run(args.sizes, games))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Fan-out latency of one game room with many sockets, some of them slow.
+
+Runs the API in-process (uvicorn) and connects `--sockets` WebSocket
+clients to one room from a separate process; `--slow` of them read one
+message per `--slow-read-ms` through a small receive buffer. The server
+then broadcasts `--messages` events of `--size` bytes, once per mode:
+
+- sequential: the previous broadcast, awaiting `send_text` on each socket
+              in turn;
+- queued:     `manager.broadcast_to_game` (per-connection queues).
+
+Every event carries its send time; the report gives, for a sample of the
+fast clients, how long events took to arrive and how long the whole room
+took to receive the last one, plus the resyncs and drops of queued mode.
+
+    python scripts/bench_fanout.py --sockets 10000 --slow 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GAME_ID = "bench-fanout"
+SAMPLED = 500  # clientes rápidos cuyas latencias se miden (el resto solo consume)
+
+
+# --- Cliente (proceso aparte) ---
+
+async def _client(port: int, sockets: int, slow_share: float, slow_read_ms: float, messages: int):
+    import websockets
+
+    url = f"ws://127.0.0.1:{port}/ws/games/{GAME_ID}"
+    rng = random.Random(7)
+    slow = set(rng.sample(range(sockets), int(sockets * slow_share)))
+    fast = [i for i in range(sockets) if i not in slow]
+    sampled = set(fast[:SAMPLED])
+    latencies = []
+    finished = asyncio.Event()
+    pending = len(fast)
+    counts = {"resync": 0, "closed_slow": 0}
+
+    async def open_conn(i):
+        sock = socket.socket()
+        if i in slow:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        sock.connect(("127.0.0.1", port))
+        sock.setblocking(False)
+        # Sin permessage-deflate: el relleno se comprimiría a casi nada
+        return await websockets.connect(
+            url, sock=sock, max_queue=1 if i in slow else None, ping_interval=None, compression=None,
+        )
+
+    async def run_fast(i, ws):
+        nonlocal pending
+        async for raw in ws:
+            if i in sampled:
+                msg = json.loads(raw)
+                if msg["type"] == "bench":
+                    latencies.append((msg["payload"]["seq"], time.time() - msg["payload"]["sent_at"]))
+            if raw.startswith('{"type": "bench_end"'):
+                break
+        pending -= 1
+        if not pending:
+            finished.set()
+
+    async def run_slow(ws):
+        try:
+            async for raw in ws:
+                if raw.startswith('{"type": "resync"'):
+                    counts["resync"] += 1
+                await asyncio.sleep(slow_read_ms / 1000)
+        except websockets.ConnectionClosed:
+            pass
+        counts["closed_slow"] += 1
+
+    conns = []
+    for start in range(0, sockets, 200):
+        conns += await asyncio.gather(*(open_conn(i) for i in range(start, min(sockets, start + 200))))
+    tasks = [asyncio.create_task(run_slow(ws) if i in slow else run_fast(i, ws)) for i, ws in enumerate(conns)]
+    print("ready", flush=True)
+
+    try:
+        await asyncio.wait_for(finished.wait(), timeout=300)
+    except asyncio.TimeoutError:
+        pass
+    per_seq = {}
+    for seq, lat in latencies:
+        per_seq.setdefault(seq, []).append(lat)
+    print(json.dumps({
+        "latencies": [lat for _, lat in latencies],
+        "room_complete": [max(v) for v in per_seq.values()],
+        "fast_done": len(fast) - pending,
+        "fast": len(fast),
+        **counts,
+    }), flush=True)
+    for task in tasks:
+        task.cancel()
+    for ws in conns:
+        ws.transport.abort()
+
+
+# --- Servidor ---
+
+async def _sequential_broadcast(game_id: str, event_type: str, data: dict):
+    """The broadcast as it was: one `send_text` after another."""
+    from app.core.frames import json_frame
+    from app.core.websocket import manager
+
+    message = json_frame(event_type, data)
+    for connection in list(manager.active_connections.get(game_id, ())):
+        try:
+            await connection.send_text(message)
+        except Exception:
+            pass
+
+
+def _pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+async def _serve(args):
+    import uvicorn
+
+    from app.core import websocket as ws_core
+    from app.main import app
+
+    # En loopback el kernel acepta megas por socket antes de frenar al emisor; un búfer
+    # de envío pequeño (heredado por cada conexión) reproduce un enlace móvil lento
+    listener = socket.socket()
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, args.sndbuf)
+    listener.bind(("127.0.0.1", 0))
+    port = listener.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(
+        app, log_level="warning", ws_ping_interval=None, backlog=4096,
+    ))
+    serving = asyncio.create_task(server.serve(sockets=[listener]))
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    pad = "x" * args.size
+    rows = []
+    for mode in ("sequential", "queued"):
+        broadcast = _sequential_broadcast if mode == "sequential" else ws_core.manager.broadcast_to_game
+        before = dict(ws_core._stats)
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, __file__, "--client", str(port), str(args.sockets), str(args.slow),
+            str(args.slow_read_ms), str(args.messages),
+            stdout=subprocess.PIPE, cwd=ROOT, limit=2 ** 26,
+        )
+        await proc.stdout.readline()  # ready
+        while ws_core.manager.get_connection_count(GAME_ID) < args.sockets:
+            await asyncio.sleep(0.1)
+
+        started = time.perf_counter()
+        for seq in range(args.messages):
+            await broadcast(GAME_ID, "bench", {"seq": seq, "sent_at": time.time(), "pad": pad})
+            await asyncio.sleep(args.every_ms / 1000)
+        await broadcast(GAME_ID, "bench_end", {})
+        out, _ = await proc.communicate()
+        elapsed = time.perf_counter() - started
+        result = json.loads(out.decode().strip().splitlines()[-1])
+        lat = [v * 1000 for v in result["latencies"]]
+        room = [v * 1000 for v in result["room_complete"]]
+        rows.append((
+            mode, statistics.median(lat) if lat else 0.0, _pct(lat, 0.99), statistics.median(room) if room else 0.0,
+            max(room) if room else 0.0, elapsed, f"{result['fast_done']}/{result['fast']}",
+            ws_core._stats["resyncs"] - before["resyncs"], ws_core._stats["dropped"] - before["dropped"],
+        ))
+        while ws_core.manager.get_connection_count(GAME_ID):
+            await asyncio.sleep(0.1)
+
+    server.should_exit = True
+    await serving
+
+    print(f"\n{args.sockets} sockets ({args.slow:.0%} lentos, 1 mensaje cada {args.slow_read_ms:g} ms), "
+          f"{args.messages} eventos de {args.size} B cada {args.every_ms:g} ms")
+    print(f"{'modo':<11} {'lat p50':>8} {'lat p99':>9} {'sala p50':>9} {'sala max':>9} {'total':>7} {'rápidos':>11} {'resync':>7} {'caídos':>7}")
+    for mode, l50, l99, r50, rmax, elapsed, done, resyncs, dropped in rows:
+        print(f"{mode:<11} {l50:>6.0f}ms {l99:>7.0f}ms {r50:>7.0f}ms {rmax:>7.0f}ms {elapsed:>6.1f}s {done:>11} {resyncs:>7} {dropped:>7}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Latencia de difusión en una sala con muchos sockets")
+    parser.add_argument("--client", nargs=5, help=argparse.SUPPRESS)
+    parser.add_argument("--sockets", type=int, default=10000)
+    parser.add_argument("--slow", type=float, default=0.05, help="fracción de clientes lentos")
+    parser.add_argument("--slow-read-ms", type=float, default=1000, help="pausa de un cliente lento entre mensajes")
+    parser.add_argument("--messages", type=int, default=100)
+    parser.add_argument("--size", type=int, default=4096, help="bytes de relleno por evento")
+    parser.add_argument("--every-ms", type=float, default=50, help="pausa entre eventos")
+    parser.add_argument("--sndbuf", type=int, default=16384, help="SO_SNDBUF de las conexiones del servidor")
+    args = parser.parse_args(argv)
+
+    if args.client:
+        port, sockets, slow, slow_read_ms, messages = args.client
+        asyncio.run(_client(int(port), int(sockets), float(slow), float(slow_read_ms), int(messages)))
+        return
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='dino-bench-'), 'bench.db')}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    sys.path.insert(0, ROOT)
+    asyncio.run(_serve(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Bytes and CPU of the WebSocket wire formats over a whole game.
+
+Replays the events of one game (`--purchases` player_joined, then up to
+75 draw_result without winners) through app.core.frames and reports, per format:
+
+- bytes each client receives, raw and after permessage-deflate (what
+  uvicorn negotiates with browsers: one compressor per connection, with
+  context takeover);
+- CPU to encode the frames once per broadcast, and what encoding them
+  again for every socket of a `--sockets` room would cost;
+- CPU of the per-connection deflate for the whole room, measured on
+  `--sample` compressors and scaled to `--sockets`.
+
+    python scripts/bench_frames.py --sockets 10000
+"""
+import argparse
+import os
+import sys
+import time
+import zlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _game_events(purchases: int):
+    import random
+
+    from app.services.bingo import shuffled_draw_order
+
+    events = [("player_joined", {"game_id": "0" * 36, "sold_tickets": n + 1}) for n in range(purchases)]
+    order = shuffled_draw_order()
+    paid = {"paid_diagonal": False, "paid_line": False, "paid_bingo": False}
+    rng = random.Random(3)
+    for i, ball in enumerate(order):
+        if i == 20:
+            paid["paid_diagonal"] = True
+        if i == 30:
+            paid["paid_line"] = True
+        events.append(("draw_result", {
+            "number": ball, "drawn_count": i + 1, **paid, "winners": {}, "finished": False,
+        }))
+        if i >= 45 and rng.random() < 0.1:
+            paid["paid_bingo"] = True
+            break
+    return events
+
+
+def _deflate(frames, connections: int):
+    """Total compressed bytes per connection and CPU seconds for `connections` compressors."""
+    out = 0
+    started = time.perf_counter()
+    for _ in range(connections):
+        comp = zlib.compressobj(wbits=-15, memLevel=5)
+        out = 0
+        for f in frames:
+            data = f.encode() if isinstance(f, str) else f
+            out += len(comp.compress(data) + comp.flush(zlib.Z_SYNC_FLUSH)) - 4
+    return out, time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bytes y CPU de los formatos de WebSocket en una partida")
+    parser.add_argument("--sockets", type=int, default=10000)
+    parser.add_argument("--purchases", type=int, default=200)
+    parser.add_argument("--sample", type=int, default=200, help="compresores medidos (se extrapola a --sockets)")
+    args = parser.parse_args(argv)
+    sys.path.insert(0, ROOT)
+
+    from app.core.frames import binary_frame, json_frame
+
+    events = _game_events(args.purchases)
+    encoders = {
+        "json": json_frame,
+        "binary": lambda event_type, data, seq: binary_frame(event_type, data, seq) or json_frame(event_type, data, seq),
+    }
+    first_seq = 57_000_000 << 20  # orden de magnitud real de los números de secuencia
+    rows = []
+    for name, encode in encoders.items():
+        started = time.perf_counter()
+        frames = [encode(event_type, data, first_seq + n) for n, (event_type, data) in enumerate(events)]
+        once = time.perf_counter() - started
+        raw = sum(len(f.encode() if isinstance(f, str) else f) for f in frames)
+        deflated, cpu = _deflate(frames, args.sample)
+        rows.append((name, raw, deflated, once * 1000, once * args.sockets, cpu / args.sample * args.sockets))
+
+    drawn = sum(1 for event_type, _ in events if event_type == "draw_result")
+    print(f"\nPartida: {args.purchases} compras y {drawn} bolas; sala de {args.sockets} sockets")
+    print(f"{'formato':<8} {'B/cliente':>10} {'B deflate':>10} {'codificar 1 vez':>16} {'1 vez por socket':>17} {'deflate sala':>13}")
+    for name, raw, deflated, once_ms, per_socket_s, deflate_s in rows:
+        print(f"{name:<8} {raw:>10} {deflated:>10} {once_ms:>14.2f}ms {per_socket_s:>16.2f}s {deflate_s:>12.2f}s")
+    (_, raw_j, def_j, _, _, cpu_j), (_, raw_b, def_b, _, _, cpu_b) = rows
+    print(f"\nbinary/json: bytes {raw_b / raw_j:.1%}, con deflate {def_b / def_j:.1%}, CPU de deflate {cpu_b / cpu_j:.1%}")
+
+
+if __name__ == "__main__":
+    main()
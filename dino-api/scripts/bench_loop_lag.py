@@ -0,0 +1,253 @@
+"""
+Event-loop lag while a game is drawn with many sockets connected.
+
+Runs the API in-process (uvicorn) on a throw-away SQLite database, opens
+`--sockets` WebSocket clients on one game from a separate process and
+performs `--draws` manual draws through HTTP, once per mode:
+
+- sync:  the previous handler, a sync `Session` used inside the `async def`
+         route (mounted here as /bench/sync-draw/{game_id});
+- async: the real POST /games/{game_id}/draw on the async session.
+
+A probe task in the server loop sleeps 1 ms at a time and records how late
+it wakes up; the report gives the lag percentiles inside the draw window.
+A writer thread holds short write transactions meanwhile (other workers
+selling tickets), which is when a blocking commit stalls the loop.
+
+    python scripts/bench_loop_lag.py --sockets 1000 --draws 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# --- Cliente (proceso aparte: sockets y peticiones de sorteo) ---
+
+async def _client(port: int, game_id: str, path: str, token: str, sockets: int, draws: int):
+    import httpx
+    import websockets
+
+    received = 0
+
+    async def listen(ws):
+        nonlocal received
+        async for _ in ws:
+            received += 1
+
+    conns = []
+    for i in range(0, sockets, 100):
+        conns += await asyncio.gather(*(
+            websockets.connect(f"ws://127.0.0.1:{port}/ws/games/{game_id}", max_queue=None)
+            for _ in range(min(100, sockets - i))
+        ))
+    readers = [asyncio.create_task(listen(ws)) for ws in conns]
+    await asyncio.sleep(0.5)
+
+    latencies = []
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60) as http:
+        started = time.time()
+        for _ in range(draws):
+            t = time.perf_counter()
+            r = await http.post(path.format(game_id=game_id), headers={"Authorization": f"Bearer {token}"})
+            r.raise_for_status()
+            latencies.append((time.perf_counter() - t) * 1000)
+            await asyncio.sleep(0.05)
+        ended = time.time()
+    await asyncio.sleep(0.5)
+    for task in readers:
+        task.cancel()
+    await asyncio.gather(*(ws.close() for ws in conns), return_exceptions=True)
+    print(json.dumps({"window": [started, ended], "latencies": latencies, "received": received}))
+
+
+# --- Servidor ---
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _writer(path: str, hold_ms: float, every_ms: float, stop: threading.Event):
+    # Transacciones de escritura cortas y frecuentes, como compras en otros workers
+    conn = sqlite3.connect(path, isolation_level=None, timeout=30)
+    conn.execute("CREATE TABLE IF NOT EXISTS bench_writes (id INTEGER PRIMARY KEY, at REAL)")
+    while not stop.is_set():
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("INSERT INTO bench_writes (at) VALUES (?)", (time.time(),))
+        time.sleep(hold_ms / 1000)
+        conn.execute("COMMIT")
+        time.sleep(every_ms / 1000)
+    conn.close()
+
+
+def _seed(tickets: int):
+    """Creator and one RUNNING game per mode with `tickets` cards."""
+    from sqlalchemy import insert
+    from sqlmodel import Session
+
+    from app.core.codecs import card_fingerprint, encode_balls
+    from app.core.database import engine, init_db
+    from app.core.security import create_access_token
+    from app.models import Game, Ticket, User, Wallet
+    from app.services.bingo import generate_bingo_cards, shuffled_draw_order
+
+    init_db()
+    with Session(engine) as session:
+        creator = User(email="bench-creator@dino.local", hashed_password="-", is_verified=True)
+        players = [User(email=f"bench-{i}@dino.local", hashed_password="-", is_verified=True) for i in range(50)]
+        session.add_all([creator, *players])
+        session.flush()
+        session.add_all([Wallet(user_id=u.id, balance=0.0) for u in [creator, *players]])
+        games = {}
+        for mode in ("sync", "async"):
+            g = Game(creator_id=creator.id, price=1.0, status="RUNNING", sold_tickets=tickets,
+                     draw_plan=encode_balls(shuffled_draw_order()))
+            session.add(g)
+            session.flush()
+            session.execute(insert(Ticket), [
+                {"game_id": g.id, "user_id": players[i % len(players)].id, "card": row.tobytes(),
+                 "fingerprint": card_fingerprint(row.tobytes())}
+                for i, row in enumerate(generate_bingo_cards(tickets))
+            ])
+            games[mode] = g.id
+        session.commit()
+        return create_access_token(creator.id), games
+
+
+async def _load_runtimes(games):
+    from app.core.database import async_session
+    from app.services.runtime import get_runtime
+
+    async with async_session() as session:
+        for game_id in games.values():
+            await get_runtime(session, game_id)
+
+
+def _mount_sync_draw(app):
+    """The draw route as it was before the async session: sync DB work on the loop."""
+    from fastapi import Depends, HTTPException
+    from sqlmodel import Session
+
+    from app.core.database import engine
+    from app.routers.games import auth
+    from app.services.draws import DrawError, broadcast_draw, draw_lock, perform_draw
+    from app.services.runtime import _runtimes
+
+    @app.post("/bench/sync-draw/{game_id}")
+    async def sync_draw(game_id: str, user_id: str = Depends(auth)):
+        async with draw_lock(game_id):
+            with Session(engine) as session:
+                # Runtime cargado por _load_runtimes antes de medir
+                rt = _runtimes.get(game_id)
+                if rt is None:
+                    raise HTTPException(status_code=409, detail="El juego no está en ejecución")
+                try:
+                    outcome = perform_draw(session, rt)
+                except DrawError as e:
+                    raise HTTPException(status_code=e.status_code, detail=e.detail)
+            await broadcast_draw(outcome)
+        return {"number": outcome.number}
+
+
+def _pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+async def _serve(args):
+    import uvicorn
+
+    from app.core.limiter import limiter
+    from app.main import app
+
+    limiter.enabled = False
+    token, games = _seed(args.tickets)
+    await _load_runtimes(games)
+    _mount_sync_draw(app)
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", ws_ping_interval=None))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    loop = asyncio.get_running_loop()
+    samples = []
+
+    async def probe():
+        while True:
+            t = loop.time()
+            await asyncio.sleep(0.001)
+            samples.append((time.time(), (loop.time() - t - 0.001) * 1000))
+
+    probing = asyncio.create_task(probe())
+    stop = threading.Event()
+    writer = None
+    if args.writer_hold_ms > 0:
+        writer = threading.Thread(target=_writer, args=(args.db, args.writer_hold_ms, args.writer_every_ms, stop), daemon=True)
+        writer.start()
+
+    paths = {"sync": "/bench/sync-draw/{game_id}", "async": "/games/{game_id}/draw"}
+    rows = []
+    for mode in ("sync", "async"):
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, __file__, "--client", str(port), games[mode], paths[mode], token,
+            str(args.sockets), str(args.draws),
+            stdout=subprocess.PIPE, cwd=ROOT,
+        )
+        out, _ = await proc.communicate()
+        if proc.returncode:
+            raise SystemExit(f"cliente {mode} terminó con código {proc.returncode}")
+        result = json.loads(out.decode().strip().splitlines()[-1])
+        start, end = result["window"]
+        lags = [lag for at, lag in samples if start <= at <= end]
+        lat = result["latencies"]
+        rows.append((mode, statistics.median(lat), _pct(lat, 0.95), statistics.median(lags), _pct(lags, 0.99), max(lags), result["received"]))
+
+    stop.set()
+    probing.cancel()
+    server.should_exit = True
+    await serving
+
+    print(f"\n{args.sockets} sockets, {args.tickets} cartones, {args.draws} sorteos, "
+          f"escritor {args.writer_hold_ms:g} ms cada {args.writer_every_ms:g} ms")
+    print(f"{'modo':<6} {'sorteo p50':>11} {'sorteo p95':>11} {'lag p50':>8} {'lag p99':>8} {'lag max':>8} {'mensajes':>9}")
+    for mode, d50, d95, l50, l99, lmax, received in rows:
+        print(f"{mode:<6} {d50:>9.1f}ms {d95:>9.1f}ms {l50:>6.1f}ms {l99:>6.1f}ms {lmax:>6.1f}ms {received:>9}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lag del event loop durante un sorteo con muchos sockets")
+    parser.add_argument("--client", nargs=6, help=argparse.SUPPRESS)
+    parser.add_argument("--sockets", type=int, default=1000)
+    parser.add_argument("--tickets", type=int, default=500)
+    parser.add_argument("--draws", type=int, default=20)
+    parser.add_argument("--writer-hold-ms", type=float, default=50, help="duración de cada transacción del escritor (0 = sin escritor)")
+    parser.add_argument("--writer-every-ms", type=float, default=100, help="pausa entre transacciones del escritor")
+    args = parser.parse_args(argv)
+
+    if args.client:
+        port, game_id, path, token, sockets, draws = args.client
+        asyncio.run(_client(int(port), game_id, path, token, int(sockets), int(draws)))
+        return
+
+    args.db = os.path.join(tempfile.mkdtemp(prefix="dino-bench-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{args.db}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    sys.path.insert(0, ROOT)
+    asyncio.run(_serve(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Room fan-out cost of one draw with many winners.
+
+Fills one game room of the in-process ConnectionManager with `--sockets`
+stub connections (a send only counts bytes and yields to the loop) and
+broadcasts a draw with `--winners` split LINE winners, three ways:
+
+- per-event:   the previous broadcast_draw: number_drawn, then one
+               `broadcast_to_game` per winning ticket;
+- draw_result: `broadcast_draw`, one coalesced event;
+- legacy:      `broadcast_draw` to connections opened with events=legacy,
+               which get it split into the old events.
+
+Reports how long the draw handler is busy broadcasting, how long until
+every socket has sent everything, frames and bytes per socket, and the
+resyncs and drops of the per-connection queues (WS_SEND_QUEUE_SIZE).
+
+    python scripts/bench_winners.py --sockets 5000 --winners 300
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class StubSocket:
+    """Just enough of a WebSocket for ConnectionManager."""
+
+    def __init__(self):
+        self.frames = 0
+        self.bytes = 0
+        self.done = False
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        if message.startswith('{"type": "bench_end"'):
+            self.done = True
+            return
+        self.frames += 1
+        self.bytes += len(message.encode())
+        await asyncio.sleep(0)
+
+    async def send_bytes(self, message: bytes):
+        self.frames += 1
+        self.bytes += len(message)
+        await asyncio.sleep(0)
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        pass
+
+
+def _outcome(game_id: str, winners: int):
+    from app.schemas import WinnerOut
+    from app.services.draws import DrawOutcome
+
+    tickets = [
+        WinnerOut(ticket_id=f"{n:08d}-0000-0000-0000-000000000000", user_id=f"{n:08d}-user", username=f"jugador{n}",
+                  amount=round(100 / winners, 4), category="LINE")
+        for n in range(winners)
+    ]
+    paid = {"DIAGONAL": True, "LINE": True, "BINGO": False}
+    return DrawOutcome(game_id, 42, list(range(1, 31)) + [42], paid, tickets)
+
+
+async def _per_event_broadcast(outcome):
+    """The broadcast as it was: one room event per winning ticket."""
+    from app.core.websocket import manager
+
+    await manager.broadcast_to_game(outcome.game_id, "number_drawn", {
+        "number": outcome.number,
+        "drawn_count": len(outcome.drawn),
+        "paid_diagonal": outcome.paid["DIAGONAL"],
+        "paid_line": outcome.paid["LINE"],
+        "paid_bingo": outcome.paid["BINGO"],
+    })
+    for w in outcome.winners:
+        await manager.broadcast_to_game(outcome.game_id, "winner", {
+            "ticket_id": w.ticket_id,
+            "user_id": w.user_id,
+            "username": w.username,
+            "amount": w.amount,
+            "category": w.category,
+        })
+
+
+async def _run(args):
+    from app.core import websocket as ws_core
+    from app.services.draws import broadcast_draw
+
+    manager = ws_core.manager
+    rows = []
+    for mode in ("per-event", "draw_result", "legacy"):
+        game_id = f"bench-winners-{mode}"
+        stubs = [StubSocket() for _ in range(args.sockets)]
+        for stub in stubs:
+            await manager.connect(stub, game_id, "json", legacy=mode == "legacy")
+        await asyncio.sleep(0)
+        before = dict(ws_core._stats)
+        outcome = _outcome(game_id, args.winners)
+
+        started = time.perf_counter()
+        await (_per_event_broadcast(outcome) if mode == "per-event" else broadcast_draw(outcome))
+        busy = time.perf_counter() - started
+        # Marca final: la sala está servida cuando cada socket la ha enviado o se ha caído
+        await manager.broadcast_to_game(game_id, "bench_end", {})
+        while not all(stub.done or stub not in manager.outboxes for stub in stubs):
+            await asyncio.sleep(0.01)
+        drained = time.perf_counter() - started
+
+        frames = sum(s.frames for s in stubs) / len(stubs)
+        sent = sum(s.bytes for s in stubs) / len(stubs)
+        rows.append((
+            mode, busy * 1000, drained * 1000, frames, sent,
+            ws_core._stats["resyncs"] - before["resyncs"], ws_core._stats["dropped"] - before["dropped"],
+        ))
+        writers = [manager.outboxes[stub]._task for stub in stubs if stub in manager.outboxes]
+        for stub in stubs:
+            manager.disconnect(stub, game_id)
+        await asyncio.gather(*writers, return_exceptions=True)
+
+    print(f"\nSala de {args.sockets} sockets, sorteo con {args.winners} ganadores de LINE "
+          f"(cola de {ws_core.WS_SEND_QUEUE_SIZE} mensajes por socket)")
+    print(f"{'modo':<12} {'sorteo ocupado':>15} {'sala servida':>13} {'frames/socket':>14} {'B/socket':>9} {'resync':>7} {'caídos':>7}")
+    for mode, busy, drained, frames, sent, resyncs, dropped in rows:
+        print(f"{mode:<12} {busy:>13.1f}ms {drained:>11.1f}ms {frames:>14.1f} {sent:>9.0f} {resyncs:>7} {dropped:>7}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Coste de difundir un sorteo con muchos ganadores")
+    parser.add_argument("--sockets", type=int, default=5000)
+    parser.add_argument("--winners", type=int, default=300)
+    args = parser.parse_args(argv)
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='dino-bench-'), 'bench.db')}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ["BROADCAST_BUS"] = "local"
+    sys.path.insert(0, ROOT)
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Multi-worker check of the background jobs lease.
+
+Starts `--workers` uvicorn processes on one throw-away SQLite database with
+BROADCAST_BUS=unix, a short JOBS_LEASE_SECONDS and a JOBS_RESYNC_SECONDS
+far longer than the check, so nothing below can be explained by the
+leader re-reading the database:
+
+1. wake-ups: on a worker that is not the leader, a game with autostart
+   gets its last ticket and another game with auto draw is started by
+   hand; the leader must start the first and draw the second within
+   seconds (forwarded over the bus, app.services.scheduler);
+2. failover: the leader is killed (SIGKILL) while the auto game draws;
+   another worker must take the lease once it expires and go on drawing;
+3. hand-over: the new leader is stopped cleanly (SIGINT), releases the
+   lease and the last worker takes it on its next heartbeat.
+
+At every poll at most one worker may report itself as leader, and the
+drawn balls must never repeat. Exits non-zero on the first failure.
+
+    python scripts/lease_failover_check.py
+"""
+import argparse
+import asyncio
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADMIN = {"email": "admin@bingo.local", "password": "admin123"}
+
+
+async def _check(args):
+    import httpx
+
+    tmp = tempfile.mkdtemp(prefix="dino-lease-")
+    db = os.path.join(tmp, "lease.db")
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{db}",
+        BROADCAST_BUS="unix",
+        BROADCAST_BUS_SOCKET=os.path.join(tmp, "bus.sock"),
+        JOBS_LEASE_SECONDS=str(args.lease),
+        JOBS_RESYNC_SECONDS="3600",
+    )
+    env.pop("ASYNC_DATABASE_URL", None)
+    ports = list(range(args.port, args.port + args.workers))
+    procs = {
+        port: subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=ROOT, env=env,
+        )
+        for port in ports
+    }
+    alive = list(ports)
+    http = httpx.AsyncClient(timeout=30)
+    url = lambda port, path: f"http://127.0.0.1:{port}{path}"  # noqa: E731
+    admin = {}
+
+    async def leaders():
+        found = []
+        for port in alive:
+            r = await http.get(url(port, "/admin/jobs/lease"), headers=admin[port])
+            if r.json()["is_leader"]:
+                found.append(port)
+        if len(found) > 1:
+            raise SystemExit(f"FALLO: varios líderes a la vez {found}")
+        return found
+
+    async def wait_leader(timeout: float, what: str) -> int:
+        deadline = time.monotonic() + timeout
+        while True:
+            found = await leaders()
+            if found:
+                return found[0]
+            if time.monotonic() > deadline:
+                raise SystemExit(f"FALLO: {what}")
+            await asyncio.sleep(0.1)
+
+    async def state(game_id):
+        return (await http.get(url(alive[0], f"/games/{game_id}/state"))).json()
+
+    async def wait_state(game_id, check, timeout: float, what: str) -> float:
+        started = time.monotonic()
+        while True:
+            s = await state(game_id)
+            balls = s["drawn_numbers"]
+            if len(balls) != len(set(balls)):
+                raise SystemExit(f"FALLO: bolas repetidas {balls}")
+            if check(s):
+                return time.monotonic() - started
+            if time.monotonic() - started > timeout:
+                raise SystemExit(f"FALLO: {what} (estado {s['status']}, {len(balls)} bolas)")
+            await leaders()
+            await asyncio.sleep(0.1)
+
+    try:
+        async def all_up():
+            for port in ports:
+                try:
+                    await http.get(url(port, "/health"))
+                except httpx.HTTPError:
+                    return False
+            return True
+        deadline = time.monotonic() + 60
+        while not await all_up():
+            if time.monotonic() > deadline:
+                raise SystemExit("FALLO: los workers no arrancaron")
+            await asyncio.sleep(0.1)
+        for port in ports:
+            r = await http.post(url(port, "/auth/login"), json=ADMIN)
+            admin[port] = {"Authorization": f"Bearer {r.json()['access_token']}"}
+        leader = await wait_leader(args.lease * 2, "ningún worker tomó el lease")
+        other = next(port for port in alive if port != leader)
+        print(f"líder :{leader}; peticiones a :{other}")
+
+        def register(email):
+            return http.post(url(other, "/auth/register"), json={"email": email, "password": "x"})
+        # Una partida activa por creador: un creador para cada partida
+        creators = [{"Authorization": f"Bearer {(await register(f'c{i}@lease')).json()['access_token']}"} for i in range(2)]
+        players = [{"Authorization": f"Bearer {(await register(f'p{i}@lease')).json()['access_token']}"} for i in range(2)]
+        with sqlite3.connect(db) as conn:
+            conn.execute("UPDATE wallets SET balance = 100")
+
+        # 1. Avisos reenviados al líder
+        r = await http.post(url(other, "/games"), headers=creators[0], json={
+            "price": 1, "min_tickets": 1, "autostart_enabled": True, "autostart_threshold": 2,
+            "autostart_delay_minutes": 0,
+        })
+        auto_start = r.json()["id"]
+        for headers in players:
+            (await http.post(url(other, f"/tickets/games/{auto_start}/auto"), headers=headers)).raise_for_status()
+        took = await wait_state(auto_start, lambda s: s["status"] == "RUNNING", 5, "el líder no inició la partida con autoinicio")
+        print(f"ok    autoinicio pedido en :{other}, iniciada por :{leader} en {took:.2f} s")
+
+        r = await http.post(url(other, "/games"), headers=creators[1], json={
+            "price": 1, "min_tickets": 1, "auto_draw_interval_seconds": args.interval,
+        })
+        auto_draw = r.json()["id"]
+        (await http.post(url(other, f"/tickets/games/{auto_draw}/auto"), headers=players[0])).raise_for_status()
+        (await http.post(url(other, f"/games/{auto_draw}/start"), headers=creators[1])).raise_for_status()
+        took = await wait_state(auto_draw, lambda s: len(s["drawn_numbers"]) >= 2, args.interval * 4, "el líder no sorteó la partida automática")
+        print(f"ok    sorteo automático pedido en :{other}, 2 bolas en {took:.2f} s")
+
+        # 2. Caída del líder
+        before = len((await state(auto_draw))["drawn_numbers"])
+        procs[leader].send_signal(signal.SIGKILL)
+        procs[leader].wait()
+        alive.remove(leader)
+        started = time.monotonic()
+        leader = await wait_leader(args.lease * 3, "nadie tomó el lease tras la caída del líder")
+        took = time.monotonic() - started
+        await wait_state(auto_draw, lambda s: len(s["drawn_numbers"]) > before or s["status"] == "FINISHED",
+                         args.interval * 4, "el nuevo líder no siguió sorteando")
+        print(f"ok    líder eliminado; relevo por :{leader} en {took:.2f} s (lease {args.lease:g} s), sigue sorteando")
+
+        # 3. Parada limpia: el lease se libera y el siguiente lo toma sin esperar a que venza
+        if len(alive) > 1:
+            before = len((await state(auto_draw))["drawn_numbers"])
+            procs[leader].send_signal(signal.SIGINT)
+            procs[leader].wait(timeout=30)
+            alive.remove(leader)
+            started = time.monotonic()
+            leader = await wait_leader(args.lease, "nadie tomó el lease liberado")
+            took = time.monotonic() - started
+            await wait_state(auto_draw, lambda s: len(s["drawn_numbers"]) > before or s["status"] == "FINISHED",
+                             args.interval * 4, "el último worker no siguió sorteando")
+            print(f"ok    parada limpia; relevo por :{leader} en {took:.2f} s, sigue sorteando")
+
+        s = await state(auto_draw)
+        print(f"OK: {len(s['drawn_numbers'])} bolas sin repetir, nunca más de un líder a la vez")
+    finally:
+        await http.aclose()
+        for proc in procs.values():
+            if proc.poll() is None:
+                proc.send_signal(signal.SIGINT)
+        for proc in procs.values():
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba del lease de tareas de fondo con varios workers")
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--lease", type=float, default=2.0, help="JOBS_LEASE_SECONDS de los workers")
+    parser.add_argument("--interval", type=int, default=2, help="segundos entre sorteos automáticos (mínimo 2)")
+    parser.add_argument("--port", type=int, default=8871)
+    args = parser.parse_args(argv)
+    sys.path.insert(0, ROOT)
+    asyncio.run(_check(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Multi-worker integration check of the broadcast bus.
+
+Starts `--workers` uvicorn processes on one throw-away SQLite database with
+BROADCAST_BUS=unix, connects WebSocket clients to every worker (JSON,
+binary and events=legacy) and plays one game, sending each purchase and each draw to a
+different worker. Halfway through, it kills (SIGKILL) the worker that
+hosts the broker and goes on once another worker has taken it over.
+
+Every client must receive every player_joined and draw (draw_result, or
+number_drawn for legacy clients) in the order the HTTP calls returned them, with the same increasing `seq` on
+every worker; clients of the killed worker must hold a prefix of it.
+Then one client per surviving worker reconnects with `?since=` from the
+middle of the game and must get exactly the balls after that point. Exits
+non-zero on the first mismatch.
+
+    python scripts/multiworker_check.py
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sqlite3
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADMIN = {"email": "admin@bingo.local", "password": "admin123"}
+
+
+class Client:
+    def __init__(self, worker: int, protocol: str):
+        self.worker = worker
+        self.protocol = protocol
+        self.joined = []
+        self.drawn = []
+        self.seqs = {}  # bola -> seq de su number_drawn
+        self.snapshot = None
+        self.closed = False
+
+    async def run(self, ws):
+        try:
+            async for raw in ws:
+                if isinstance(raw, bytes):
+                    if raw[0] in (0x01, 0x03):
+                        _, seq, ball, count, _ = struct.unpack(">BQBBB", raw)
+                        self._drawn(seq, ball)
+                    elif raw[0] == 0x02:
+                        self.joined.append(struct.unpack(">BQI", raw)[2])
+                    continue
+                msg = json.loads(raw)
+                if msg["type"] in ("draw_result", "number_drawn"):
+                    self._drawn(msg["seq"], msg["payload"]["number"])
+                elif msg["type"] == "player_joined":
+                    self.joined.append(msg["payload"]["sold_tickets"])
+                elif msg["type"] == "snapshot":
+                    self.snapshot = msg
+        except Exception:
+            pass
+        self.closed = True
+
+    def _drawn(self, seq, ball):
+        assert not self.seqs or seq > max(self.seqs.values()), "seq no creciente"
+        self.drawn.append(ball)
+        self.seqs[ball] = seq
+
+
+async def _wait_until(check, timeout: float, what: str):
+    deadline = time.monotonic() + timeout
+    while not await check():
+        if time.monotonic() > deadline:
+            raise SystemExit(f"FALLO: {what}")
+        await asyncio.sleep(0.1)
+
+
+async def _check(args):
+    import httpx
+    import websockets
+
+    tmp = tempfile.mkdtemp(prefix="dino-mw-")
+    db = os.path.join(tmp, "mw.db")
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{db}",
+        BROADCAST_BUS="unix",
+        BROADCAST_BUS_SOCKET=os.path.join(tmp, "bus.sock"),
+    )
+    env.pop("ASYNC_DATABASE_URL", None)
+    ports = list(range(args.port, args.port + args.workers))
+    procs = {
+        port: subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=ROOT, env=env,
+        )
+        for port in ports
+    }
+    http = httpx.AsyncClient(timeout=30)
+    url = lambda port, path: f"http://127.0.0.1:{port}{path}"  # noqa: E731
+
+    async def admin_headers(port):
+        r = await http.post(url(port, "/auth/login"), json=ADMIN)
+        return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+    async def bus_state(port, headers):
+        return (await http.get(url(port, "/admin/ws/stats"), headers=headers)).json()
+
+    try:
+        async def all_up():
+            for port in ports:
+                try:
+                    await http.get(url(port, "/health"))
+                except httpx.HTTPError:
+                    return False
+            return True
+        await _wait_until(all_up, 60, "los workers no arrancaron")
+        admin = {port: await admin_headers(port) for port in ports}
+
+        async def bus_ready():
+            states = [await bus_state(port, admin[port]) for port in ports]
+            return all(s["bus_connected"] for s in states) and sum(s["bus_hosting"] for s in states) == 1
+        await _wait_until(bus_ready, 30, "el bus no quedó conectado")
+
+        def register(email):
+            return http.post(url(ports[0], "/auth/register"), json={"email": email, "password": "x"})
+        creator = {"Authorization": f"Bearer {(await register('creator@mw')).json()['access_token']}"}
+        players = []
+        for i in range(args.workers):
+            players.append({"Authorization": f"Bearer {(await register(f'p{i}@mw')).json()['access_token']}"})
+        with sqlite3.connect(db) as conn:
+            conn.execute("UPDATE wallets SET balance = 100")
+
+        r = await http.post(url(ports[0], "/games"), json={"price": 1, "min_tickets": 1}, headers=creator)
+        game_id = r.json()["id"]
+
+        clients, sockets = [], []
+        for port in ports:
+            for protocol in ("json", "binary", "legacy"):
+                query = "events=legacy" if protocol == "legacy" else f"protocol={protocol}"
+                ws = await websockets.connect(f"ws://127.0.0.1:{port}/ws/games/{game_id}?{query}")
+                client = Client(port, protocol)
+                clients.append(client)
+                sockets.append(asyncio.create_task(client.run(ws)))
+
+        joined = []
+        for i, headers in enumerate(players):
+            port = ports[i % len(ports)]
+            r = await http.post(url(port, f"/tickets/games/{game_id}/auto"), headers=headers)
+            r.raise_for_status()
+            joined.append(i + 1)
+        r = await http.post(url(ports[1 % len(ports)], f"/games/{game_id}/start"), headers=creator)
+        r.raise_for_status()
+
+        drawn, killed = [], None
+        alive = list(ports)
+        for turn in range(args.draws):
+            if turn == args.draws // 2:
+                states = {port: await bus_state(port, admin[port]) for port in alive}
+                killed = next(port for port, s in states.items() if s["bus_hosting"])
+                procs[killed].send_signal(signal.SIGKILL)
+                procs[killed].wait()
+                alive.remove(killed)
+                started = time.monotonic()
+
+                async def taken_over():
+                    states = [await bus_state(port, admin[port]) for port in alive]
+                    return all(s["bus_connected"] for s in states) and sum(s["bus_hosting"] for s in states) == 1
+                await _wait_until(taken_over, 30, "ningún worker tomó el broker")
+                print(f"broker en :{killed} eliminado; relevo en {time.monotonic() - started:.2f} s")
+            port = alive[turn % len(alive)]
+            for _ in range(3):
+                r = await http.post(url(port, f"/games/{game_id}/draw"), headers=creator)
+                if r.status_code != 409:
+                    break  # 409: el runtime de ese worker estaba desfasado y se recarga
+            r.raise_for_status()
+            drawn.append(r.json()["number"])
+            if r.json()["paid_bingo"]:
+                break
+
+        async def delivered():
+            return all(c.drawn == drawn for c in clients if c.worker != killed)
+        try:
+            await _wait_until(delivered, 10, "faltan eventos")
+        except SystemExit:
+            pass
+
+        failures = 0
+        reference = next(c for c in clients if c.worker != killed).seqs
+        for c in clients:
+            expected = drawn if c.worker != killed else drawn[:len(c.drawn)]
+            ok = c.joined == joined and c.drawn == expected and (c.worker == killed or len(c.drawn) == len(drawn))
+            ok = ok and all(reference[ball] == seq for ball, seq in c.seqs.items())
+            failures += not ok
+            print(f"{'ok   ' if ok else 'FALLO'} :{c.worker} {c.protocol:<6} joined={c.joined} bolas={len(c.drawn)}/{len(drawn)}"
+                  + (" (worker eliminado)" if c.worker == killed else ""))
+        for task in sockets:
+            task.cancel()
+        if failures:
+            raise SystemExit(f"FALLO: {failures} clientes con eventos distintos")
+        print(f"OK: {len(drawn)} bolas en el mismo orden y con el mismo seq en {len(clients)} clientes de {len(ports)} workers")
+
+        # Reanudación: desde una bola posterior al relevo hay deltas; desde una anterior, foto
+        resumes = [(drawn[-3], "deltas"), (drawn[1], "snapshot")]
+        for port in alive:
+            for after, kind in resumes:
+                ws = await websockets.connect(f"ws://127.0.0.1:{port}/ws/games/{game_id}?since={reference[after]}")
+                client = Client(port, "json")
+                task = asyncio.create_task(client.run(ws))
+                await asyncio.sleep(0.5)
+                await ws.close()
+                await task
+                rest = drawn[drawn.index(after) + 1:]
+                if kind == "deltas":
+                    ok = client.drawn == rest and client.snapshot is None
+                else:
+                    ok = client.snapshot is not None and client.snapshot["payload"]["drawn_numbers"] == drawn
+                print(f"{'ok   ' if ok else 'FALLO'} :{port} since=bola {after}: {kind}")
+                if not ok:
+                    raise SystemExit(f"FALLO: reanudación en :{port} (bolas {client.drawn}, foto {client.snapshot})")
+    finally:
+        await http.aclose()
+        for proc in procs.values():
+            if proc.poll() is None:
+                proc.send_signal(signal.SIGINT)
+        for proc in procs.values():
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de integración del bus con varios workers")
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--draws", type=int, default=30)
+    parser.add_argument("--port", type=int, default=8861)
+    args = parser.parse_args(argv)
+    sys.path.insert(0, ROOT)
+    asyncio.run(_check(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+SQL statements issued by one draw, by number of simultaneous winners.
+
+Seeds a throw-away SQLite database with one RUNNING game per size in
+`--winners`. Every card of a game belongs to a different player and has
+1, 16, 31, 46 and 61 as its first row, and the ball order starts with
+those five balls, so the fifth draw makes every card a LINE winner at
+once. The script runs that draw through `perform_draw` and counts the
+statements sent to SQLite (one executemany counts once).
+
+With set-based payouts (app.services.payouts) the count must not depend
+on the number of winners; exits non-zero if it does.
+
+    python scripts/payout_query_check.py --winners 1 50 500
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIRST_ROW = [1, 16, 31, 46, 61]
+
+
+def _card(rng: random.Random) -> bytes:
+    """Valid card whose first row is FIRST_ROW."""
+    columns = [[start] + rng.sample(range(start + 1, start + 15), 4) for start in FIRST_ROW]
+    cells = [columns[c][r] for r in range(5) for c in range(5)]
+    cells[12] = 0  # FREE
+    return bytes(cells)
+
+
+def _seed(sizes, rng: random.Random):
+    """One RUNNING game per size, with as many players as cards; returns {size: game_id} and the order."""
+    from sqlalchemy import insert
+    from sqlmodel import Session
+
+    from app.core.codecs import card_fingerprint, encode_balls
+    from app.core.database import engine, init_db
+    from app.models import Game, Ticket, User, Wallet
+
+    order = FIRST_ROW + rng.sample([n for n in range(1, 76) if n not in FIRST_ROW], 70)
+    init_db()
+    with Session(engine) as session:
+        creator = User(email="bench-creator@dino.local", hashed_password="-", is_verified=True)
+        players = [User(email=f"bench-{i}@dino.local", hashed_password="-", is_verified=True) for i in range(max(sizes))]
+        session.add_all([creator, *players])
+        session.flush()
+        session.add_all([Wallet(user_id=u.id, balance=0.0) for u in [creator, *players]])
+        games = {}
+        for n in sizes:
+            g = Game(creator_id=creator.id, price=1.0, status="RUNNING", sold_tickets=n, draw_plan=encode_balls(order))
+            session.add(g)
+            session.flush()
+            cards = [_card(rng) for _ in range(n)]
+            session.execute(insert(Ticket), [
+                {"game_id": g.id, "user_id": players[i].id, "card": card, "fingerprint": card_fingerprint(card)}
+                for i, card in enumerate(cards)
+            ])
+            games[n] = g.id
+        session.commit()
+    return games, order
+
+
+def _draw(game_id: str, order):
+    """Statements, seconds and winners of the fifth draw of the game."""
+    from sqlalchemy import event
+    from sqlmodel import Session, select
+
+    from app.core.database import engine
+    from app.models import Game, Ticket
+    from app.services.draws import perform_draw
+    from app.services.runtime import GameRuntime, build_schedule
+
+    with Session(engine) as session:
+        game = session.get(Game, game_id)
+        cards = session.exec(select(Ticket.id, Ticket.card).where(Ticket.game_id == game_id)).all()
+        rt = GameRuntime(game, order, build_schedule(cards, order))
+        for _ in range(4):
+            outcome = perform_draw(session, rt)
+            assert not outcome.winners, "ganadores antes de la quinta bola"
+
+        statements = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement.split(None, 1)[0].upper())
+
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            started = time.perf_counter()
+            outcome = perform_draw(session, rt)
+            seconds = time.perf_counter() - started
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+    return statements, seconds, outcome.winners
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sentencias SQL de un sorteo según el número de ganadores")
+    parser.add_argument("--winners", type=int, nargs="+", default=[1, 50, 500])
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='dino-bench-'), 'bench.db')}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    sys.path.insert(0, ROOT)
+
+    games, order = _seed(args.winners, random.Random(args.seed))
+    print(f"{'ganadores':>10} {'sentencias':>11} {'sorteo':>9}  detalle")
+    counts = set()
+    for n in args.winners:
+        statements, seconds, winners = _draw(games[n], order)
+        if len(winners) != n or any(w.category != "LINE" for w in winners):
+            raise SystemExit(f"FALLO: se esperaban {n} ganadores de LINE, hubo {len(winners)}")
+        detail = ", ".join(f"{kind} {statements.count(kind)}" for kind in dict.fromkeys(statements))
+        print(f"{n:>10} {len(statements):>11} {seconds * 1000:>7.1f}ms  {detail}")
+        counts.add(len(statements))
+    if len(counts) > 1:
+        raise SystemExit("FALLO: el número de sentencias depende del número de ganadores")
+    print("OK: mismo número de sentencias con cualquier número de ganadores")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Purchase rush on one game: hundreds of concurrent buyers, then the books.
+
+Seeds a throw-away SQLite database with `--buyers` players and one OPEN
+game (price 1, at most 3 cards per player), starts `--workers` uvicorn
+processes on it (rate limiter off) and has every player buy at once,
+spread over the workers. Each player runs the same sequence: auto, batch
+of 2, auto, a card chosen by hand. A third of the players only have 2 in
+their wallet.
+
+Afterwards the database must hold:
+
+- sold_tickets equal to the tickets of the game, and no repeated card;
+- 3 tickets per player with enough balance and 2 per player without
+  (the cap and the balance are checked by conditional UPDATEs, so a
+  rejected purchase leaves nothing behind);
+- per player: balance = initial - tickets and purchase transactions
+  adding up to -tickets;
+- no 5xx answer and no "database is locked".
+
+Exits non-zero on the first broken invariant.
+
+    python scripts/purchase_rush_check.py --buyers 300 --workers 2
+"""
+import argparse
+import asyncio
+import os
+import random
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RICH, POOR = 5.0, 2.0
+
+
+def _serve(port: int):
+    import uvicorn
+
+    from app.core.limiter import limiter
+    from app.main import app
+
+    limiter.enabled = False
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def _seed(buyers: int):
+    """Players, their wallets and one OPEN game; returns (game_id, [(user_id, token, balance)])."""
+    from sqlmodel import Session
+
+    from app.core.database import engine, init_db
+    from app.core.security import create_access_token
+    from app.models import Game, User, Wallet
+
+    init_db()
+    with Session(engine) as session:
+        creator = User(email="rush-creator@dino.local", hashed_password="-", is_verified=True)
+        players = [User(email=f"rush-{i}@dino.local", hashed_password="-", is_verified=True) for i in range(buyers)]
+        session.add_all([creator, *players])
+        session.flush()
+        balances = [POOR if i % 3 == 0 else RICH for i in range(buyers)]
+        session.add(Wallet(user_id=creator.id, balance=0.0))
+        session.add_all([Wallet(user_id=u.id, balance=b) for u, b in zip(players, balances)])
+        game = Game(creator_id=creator.id, price=1.0, min_tickets=buyers * 10, max_cards_per_user=3)
+        session.add(game)
+        session.commit()
+        return game.id, [(u.id, create_access_token(u.id), b) for u, b in zip(players, balances)]
+
+
+def _manual_card(rng: random.Random):
+    columns = [rng.sample(range(start, start + 15), 5) for start in (1, 16, 31, 46, 61)]
+    card = [[columns[c][r] for c in range(5)] for r in range(5)]
+    card[2][2] = 0
+    return card
+
+
+async def _rush(ports, game_id: str, buyers, seed: int):
+    import httpx
+
+    rng = random.Random(seed)
+    cards = [_manual_card(rng) for _ in buyers]
+    # Sin keep-alive: con la cola del threadpool llena, uvicorn cierra las conexiones ociosas
+    # (5 s) justo cuando el cliente las reutiliza
+    limits = httpx.Limits(max_connections=len(buyers), max_keepalive_connections=0)
+    statuses = Counter()
+    errors = []
+
+    async with httpx.AsyncClient(timeout=120, limits=limits) as http:
+        async def buyer(i: int, token: str):
+            headers = {"Authorization": f"Bearer {token}"}
+            base = f"http://127.0.0.1:{ports[i % len(ports)]}/tickets/games/{game_id}"
+            for path, body in (("/auto", None), ("/batch?count=2", None), ("/auto", None), ("", {"numbers": cards[i]})):
+                r = await http.post(base + path, headers=headers, json=body)
+                statuses[r.status_code] += 1
+                if r.status_code >= 500 or "locked" in r.text:
+                    errors.append(f"{r.status_code} {r.text[:120]}")
+
+        started = time.perf_counter()
+        await asyncio.gather(*(buyer(i, token) for i, (_, token, _) in enumerate(buyers)))
+        return time.perf_counter() - started, statuses, errors
+
+
+def _books(db: str, game_id: str, buyers):
+    """Broken invariants found in the database (empty if none)."""
+    conn = sqlite3.connect(db)
+    failures = []
+    sold = conn.execute("SELECT sold_tickets FROM games WHERE id = ?", (game_id,)).fetchone()[0]
+    tickets = dict(conn.execute("SELECT user_id, COUNT(*) FROM tickets WHERE game_id = ? GROUP BY user_id", (game_id,)).fetchall())
+    total = sum(tickets.values())
+    if sold != total:
+        failures.append(f"sold_tickets {sold} != {total} cartones")
+    cards = conn.execute("SELECT COUNT(DISTINCT card), COUNT(*) FROM tickets WHERE game_id = ?", (game_id,)).fetchone()
+    if cards[0] != cards[1]:
+        failures.append(f"{cards[1] - cards[0]} cartones repetidos")
+    balances = dict(conn.execute("SELECT user_id, balance FROM wallets").fetchall())
+    spent = dict(conn.execute("SELECT user_id, SUM(amount) FROM transactions GROUP BY user_id").fetchall())
+    for user_id, _, initial in buyers:
+        n = tickets.get(user_id, 0)
+        expected = 3 if initial == RICH else 2
+        if n != expected:
+            failures.append(f"{user_id}: {n} cartones, se esperaban {expected}")
+        if abs(balances[user_id] - (initial - n)) > 1e-9:
+            failures.append(f"{user_id}: saldo {balances[user_id]} con {n} cartones (inicial {initial})")
+        if abs((spent.get(user_id) or 0.0) + n) > 1e-9:
+            failures.append(f"{user_id}: transacciones {spent.get(user_id)} con {n} cartones")
+    conn.close()
+    return sold, failures
+
+
+async def _check(args, db: str, env: dict):
+    import httpx
+
+    game_id, buyers = _seed(args.buyers)
+    ports = list(range(args.port, args.port + args.workers))
+    procs = [
+        subprocess.Popen([sys.executable, __file__, "--serve", str(port)], cwd=ROOT, env=env)
+        for port in ports
+    ]
+    try:
+        deadline = time.monotonic() + 60
+        async with httpx.AsyncClient() as http:
+            for port in ports:
+                while True:
+                    try:
+                        await http.get(f"http://127.0.0.1:{port}/health")
+                        break
+                    except httpx.HTTPError:
+                        if time.monotonic() > deadline:
+                            raise SystemExit("FALLO: los workers no arrancaron")
+                        await asyncio.sleep(0.1)
+
+        elapsed, statuses, errors = await _rush(ports, game_id, buyers, args.seed)
+    finally:
+        for proc in procs:
+            proc.send_signal(signal.SIGINT)
+        for proc in procs:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    sold, failures = _books(db, game_id, buyers)
+    print(f"{args.buyers} compradores en {args.workers} workers, {sum(statuses.values())} compras en {elapsed:.2f} s")
+    print("respuestas: " + ", ".join(f"{code}: {n}" for code, n in sorted(statuses.items())))
+    print(f"cartones vendidos: {sold}")
+    for line in (errors + failures)[:20]:
+        print(f"FALLO {line}")
+    if errors or failures:
+        raise SystemExit(f"FALLO: {len(errors)} errores del servidor, {len(failures)} invariantes rotos")
+    print("OK: contadores, topes, saldos y transacciones cuadran")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Avalancha de compras concurrentes sobre una partida")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--buyers", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--port", type=int, default=8881)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    sys.path.insert(0, ROOT)
+
+    if args.serve:
+        _serve(args.serve)
+        return
+
+    tmp = tempfile.mkdtemp(prefix="dino-rush-")
+    db = os.path.join(tmp, "rush.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    env = dict(os.environ, BROADCAST_BUS="unix", BROADCAST_BUS_SOCKET=os.path.join(tmp, "bus.sock"))
+    asyncio.run(_check(args, db, env))
+
+
+if __name__ == "__main__":
+    main()
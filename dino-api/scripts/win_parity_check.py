@@ -0,0 +1,120 @@
+"""
+Parity check of the vectorized win evaluator.
+
+For `--rounds` random ball orders over `--cards` cards (valid cards plus
+malformed ones: repeated numbers, values above 75, extra FREE cells), the
+draw at which every card completes DIAGONAL, LINE and BINGO must be the
+same from:
+
+- the set predicates the draw handler used before the card indexes,
+  re-checked after every ball (the reference);
+- VectorCardIndex.win_draws, the NumPy reductions the runtime uses.
+
+Exits non-zero and prints the first differing card on a mismatch.
+
+    python scripts/win_parity_check.py --cards 2000 --rounds 5
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# --- Referencia: los predicados sobre conjuntos de antes ---
+
+def _marked(grid, drawn, i, j):
+    return grid[i][j] in drawn or grid[i][j] == 0
+
+
+def _has_any_diagonal(grid, drawn) -> bool:
+    return all(_marked(grid, drawn, i, i) for i in range(5)) or all(_marked(grid, drawn, i, 4 - i) for i in range(5))
+
+
+def _has_any_line(grid, drawn) -> bool:
+    return any(all(_marked(grid, drawn, i, j) for j in range(5)) for i in range(5)) or any(
+        all(_marked(grid, drawn, i, j) for i in range(5)) for j in range(5)
+    )
+
+
+def _is_bingo(grid, drawn) -> bool:
+    return all(_marked(grid, drawn, i, j) for i in range(5) for j in range(5))
+
+
+def _reference(card: bytes, order):
+    from app.services.card_index import NO_WIN
+
+    grid = [list(card[r * 5:r * 5 + 5]) for r in range(5)]
+    checks = {"DIAGONAL": _has_any_diagonal, "LINE": _has_any_line, "BINGO": _is_bingo}
+    result = {}
+    drawn = set()
+    for k in range(len(order) + 1):
+        if k:
+            drawn.add(order[k - 1])
+        for cat, check in checks.items():
+            if cat not in result and check(grid, drawn):
+                result[cat] = k
+        if len(result) == len(checks):
+            break
+    return {cat: result.get(cat, NO_WIN) for cat in checks}
+
+
+def _cards(n: int, rng: random.Random):
+    from app.services.bingo import generate_bingo_cards
+
+    cards = []
+    for i, row in enumerate(generate_bingo_cards(n, seed=rng.randrange(2 ** 32))):
+        card = bytearray(row.tobytes())
+        if i % 5 == 0:
+            # Cartones mal formados: también deben coincidir
+            for _ in range(rng.randint(1, 4)):
+                card[rng.randrange(25)] = rng.choice([0, 76, 99, 255, card[rng.randrange(25)]])
+        cards.append((f"t{i}", bytes(card)))
+    return cards
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Paridad del evaluador vectorizado con los predicados de referencia")
+    parser.add_argument("--cards", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    sys.path.insert(0, ROOT)
+
+    from app.services.bingo import shuffled_draw_order
+    from app.services.card_index import CATEGORIES, VectorCardIndex
+
+    rng = random.Random(args.seed)
+    timings = {"referencia": 0.0, "VectorCardIndex": 0.0}
+    for round_no in range(args.rounds):
+        cards = _cards(args.cards, rng)
+        order = shuffled_draw_order()
+        # Órdenes parciales: partidas que aún no han sacado todas las bolas
+        if round_no % 2:
+            order = order[:rng.randint(5, 74)]
+
+        started = time.perf_counter()
+        expected = [_reference(card, order) for _, card in cards]
+        timings["referencia"] += time.perf_counter() - started
+        started = time.perf_counter()
+        draws = VectorCardIndex(cards).win_draws(order)
+        timings["VectorCardIndex"] += time.perf_counter() - started
+
+        for idx, want in enumerate(expected):
+            got = {cat: draws[cat][idx] for cat in CATEGORIES}
+            if got != want:
+                raise SystemExit(
+                    f"FALLO: ronda {round_no}, cartón {list(cards[idx][1])}, "
+                    f"{len(order)} bolas: {got} != {want}"
+                )
+        print(f"ok    ronda {round_no}: {args.cards} cartones, {len(order)} bolas")
+
+    print(f"OK: {args.rounds * args.cards} cartones iguales con los predicados de referencia")
+    for name, seconds in timings.items():
+        print(f"  {name:<16} {seconds * 1000 / args.rounds:>9.1f} ms por ronda")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,7 @@ interface AuthContextType {
     register: (email: string, password: string, alias: string) => Promise<void>;
     logout: () => void;
     refreshUser: () => Promise<Me | null>;
+    applyBalance: (balance: number) => void;
 }
 
 const AuthContext = createContext<AuthContextType | undefined>(undefined);
@@ -71,6 +72,11 @@ export function AuthProvider({ children }: AuthProviderProps) {
         window.location.href = '/auth';
     }, []);
 
+    // Saldo empujado por el servidor (/ws/me), sin volver a pedir /auth/me
+    const applyBalance = useCallback((balance: number) => {
+        setUser(prev => (prev ? { ...prev, balance } : prev));
+    }, []);
+
     const value: AuthContextType = {
         user,
         isLoading,
@@ -79,6 +85,7 @@ export function AuthProvider({ children }: AuthProviderProps) {
         register,
         logout,
         refreshUser: fetchUser,
+        applyBalance,
     };
 
     return (
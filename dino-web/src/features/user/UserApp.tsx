@@ -2,6 +2,8 @@ import { useEffect, useState, useCallback, lazy, Suspense } from "react";
 import api, { fetchTransactions } from "../../api/http";
 import toast from "react-hot-toast";
 import { formatCredits } from "../../utils/format";
+import { useAuth } from "../../context/AuthContext";
+import { useWebSocket } from "../../hooks/useWebSocket";
 import {
   Me,
   UserTransaction,
@@ -41,6 +43,7 @@ export function UserApp({ me, onLogout, onSessionRefresh }: UserAppProps) {
 
   // Game room state
   const [activeGameId, setActiveGameId] = useState<string | null>(null);
+  const { applyBalance } = useAuth();
 
 
 
@@ -74,6 +77,36 @@ export function UserApp({ me, onLogout, onSessionRefresh }: UserAppProps) {
     }
   }, []);
 
+  // Saldo, recargas, premios y reembolsos llegan por /ws/me: no hace falta sondear
+  const token = localStorage.getItem("token");
+  const meWsUrl = `${import.meta.env.VITE_API_URL?.replace('http', 'ws') || 'ws://localhost:8000'}/ws/me?token=${token}`;
+  useWebSocket({
+    url: meWsUrl,
+    enabled: !!token,
+    onMessage: (msg) => {
+      const payload = msg.payload as { reason?: string; amount?: number; balance?: number };
+      switch (msg.type) {
+        case "connected":
+          if (payload.balance != null) applyBalance(payload.balance);
+          break;
+        case "wallet":
+          if (payload.balance != null) applyBalance(payload.balance);
+          if (payload.reason === "deposit_approved") toast.success(`Recarga aprobada: +${formatCredits(payload.amount || 0)}`);
+          else if (payload.reason === "deposit_rejected") toast.error("Recarga rechazada");
+          else if (payload.reason === "withdraw_approved") toast.success("Retiro aprobado");
+          else if (payload.reason === "withdraw_rejected") toast.error(`Retiro rechazado: +${formatCredits(payload.amount || 0)} devueltos`);
+          else if (payload.reason === "refund") toast(`Partida cancelada: +${formatCredits(payload.amount || 0)} reembolsados`);
+          else if (payload.reason === "commission") toast.success(`Comisión de creador: +${formatCredits(payload.amount || 0)}`);
+          fetchTxns(0);
+          break;
+        case "resync":
+          onSessionRefresh();
+          fetchTxns(0);
+          break;
+      }
+    },
+  });
+
   const handleLoadMore = () => {
     fetchTxns(transactions.length);
   };
@@ -125,11 +158,9 @@ export function UserApp({ me, onLogout, onSessionRefresh }: UserAppProps) {
     setView("room");
   };
 
-  const handleLeaveRoom = async () => {
+  const handleLeaveRoom = () => {
     setActiveGameId(null);
     setView("join");
-    // Refresh balance after leaving room
-    await onSessionRefresh();
   };
 
   return (
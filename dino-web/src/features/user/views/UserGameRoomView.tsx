@@ -1,8 +1,10 @@
 import { useEffect, useState, useMemo, useRef, useCallback } from "react";
+import { useQueryClient } from "@tanstack/react-query";
 import toast from "react-hot-toast";
 import { Me, UserView } from "../../../types";
 import { formatCredits } from "../../../utils/format";
 import { useGameState, useMyTickets, useStartGame, useDrawNumber, useCancelGame } from "../../../hooks/useGames";
+import type { GameState } from "../../../hooks/useGames";
 import { useWebSocket } from "../../../hooks/useWebSocket";
 import UserHeader from "../components/UserHeader";
 
@@ -16,6 +18,13 @@ function getBingoLetter(num: number): string {
   return "";
 }
 
+// Cartón tal como lo manda el servidor por el socket: marked es una máscara de 25 bits (fila * 5 + columna)
+type LiveCard = {
+  id: string;
+  numbers: number[][];
+  marked: number;
+};
+
 type UserGameRoomViewProps = {
   me: Me;
   gameId: string;
@@ -73,25 +82,62 @@ export function UserGameRoomView({
     }
   }, [soundEnabled]);
 
-  // API hooks
-  const { data: gameState, refetch: refetchState } = useGameState(gameId);
-  const { data: myTicketsData } = useMyTickets(gameId);
-  const startGame = useStartGame();
-  const drawNumber = useDrawNumber();
-  const cancelGame = useCancelGame();
+  const queryClient = useQueryClient();
+  // Mis cartones con sus celdas marcadas: llegan enteros (cards) y después solo los cambios (card_update)
+  const [liveCards, setLiveCards] = useState<LiveCard[] | null>(null);
 
-  const myTickets = myTicketsData?.items || [];
-  const drawnNumbers = new Set(gameState?.drawn_numbers || []);
+  // El estado de la partida se actualiza con los eventos del socket en vez de volver a pedirlo
+  const patchState = useCallback((patch: (state: GameState) => Partial<GameState>) => {
+    queryClient.setQueryData<GameState>(['game-state', gameId], prev => prev && { ...prev, ...patch(prev) });
+  }, [queryClient, gameId]);
 
-  // WebSocket connection
-  const wsUrl = `${import.meta.env.VITE_API_URL?.replace('http', 'ws') || 'ws://localhost:8000'}/ws/games/${gameId}`;
-  const { isConnected } = useWebSocket({
+  // WebSocket connection (con token, el servidor manda también los cambios de mis cartones)
+  const token = localStorage.getItem('token');
+  const wsUrl = `${import.meta.env.VITE_API_URL?.replace('http', 'ws') || 'ws://localhost:8000'}/ws/games/${gameId}${token ? `?token=${token}` : ''}`;
+  const { isConnected, reconnect } = useWebSocket({
     url: wsUrl,
     enabled: true,
+    resumable: true,
     onMessage: (msg) => {
       switch (msg.type) {
-        case "number_drawn":
-          const payload = msg.payload as { number: number };
+        case "snapshot": {
+          // Reconexión sin los eventos perdidos en el búfer del servidor: estado completo
+          const snapshot = msg.payload as Pick<GameState,
+            "status" | "sold_tickets" | "drawn_numbers" | "paid_diagonal" | "paid_line" | "paid_bingo">;
+          patchState(() => ({
+            status: snapshot.status,
+            sold_tickets: snapshot.sold_tickets,
+            drawn_numbers: snapshot.drawn_numbers,
+            paid_diagonal: snapshot.paid_diagonal,
+            paid_line: snapshot.paid_line,
+            paid_bingo: snapshot.paid_bingo,
+          }));
+          setLastDrawnNumber(snapshot.drawn_numbers[snapshot.drawn_numbers.length - 1] ?? null);
+          break;
+        }
+        case "resync":
+          // La cola de este socket se desbordó: se reconecta desde el último seq (repetición,
+          // snapshot y cartones de nuevo)
+          reconnect();
+          break;
+        case "draw_result":
+          const payload = msg.payload as {
+            number: number;
+            paid_diagonal: boolean;
+            paid_line: boolean;
+            paid_bingo: boolean;
+            winners: Record<string, { amount: number; tickets: { user_id: string; username: string }[] }>;
+            finished: boolean;
+          };
+          patchState(state => ({
+            drawn_numbers: state.drawn_numbers.includes(payload.number)
+              ? state.drawn_numbers
+              : [...state.drawn_numbers, payload.number],
+            paid_diagonal: payload.paid_diagonal,
+            paid_line: payload.paid_line,
+            paid_bingo: payload.paid_bingo,
+            ...(payload.finished ? { status: "FINISHED" } : {}),
+          }));
           setLastDrawnNumber(payload.number);
           playBallSound();
           // Show notification with letter + number
@@ -105,28 +151,53 @@ export function UserGameRoomView({
               fontSize: '18px'
             }
           });
-          refetchState();
-          break;
-        case "winner":
-          const winnerPayload = msg.payload as { user_id: string; username: string; category: string; amount: number };
-          if (winnerPayload.user_id === me.id) {
-            toast.success(`¡Ganaste ${winnerPayload.category}! +${formatCredits(winnerPayload.amount)}`);
-          } else {
-            toast(`¡${winnerPayload.username} ganó ${winnerPayload.category}!`);
+          // Un aviso por categoría, no uno por cartón ganador
+          Object.entries(payload.winners).forEach(([category, group]) => {
+            const mine = group.tickets.filter(t => t.user_id === me.id).length;
+            if (mine > 0) {
+              toast.success(`¡Ganaste ${category}! +${formatCredits(group.amount * mine)}`);
+            } else if (group.tickets.length > 1) {
+              toast(`¡${group.tickets[0].username} y ${group.tickets.length - 1} más ganaron ${category}!`);
+            } else {
+              toast(`¡${group.tickets[0].username} ganó ${category}!`);
+            }
+          });
+          if (payload.finished) {
+            toast("¡La partida ha terminado!");
           }
-          refetchState();
           break;
+        case "cards": {
+          const { tickets } = msg.payload as { tickets: LiveCard[] };
+          setLiveCards(tickets.map(({ id, numbers, marked }) => ({ id, numbers, marked })));
+          break;
+        }
+        case "card_update": {
+          // [índice del cartón en cards, celda marcada, categorías que acaban de quedar a una bola
+          // (DIAGONAL 1, LINE 2, BINGO 4)]
+          const update = msg.payload as { ball: number; cards: [number, number, number][] };
+          setLiveCards(prev => {
+            if (!prev) return prev;
+            const next = [...prev];
+            update.cards.forEach(([idx, cell]) => {
+              if (next[idx]) next[idx] = { ...next[idx], marked: next[idx].marked | (1 << cell) };
+            });
+            return next;
+          });
+          const near = update.cards.reduce((flags, [, , n]) => flags | n, 0);
+          if (near & 4) toast("¡Te falta una bola para BINGO!");
+          else if (near & 2) toast("¡Te falta una bola para LÍNEA!");
+          else if (near & 1) toast("¡Te falta una bola para DIAGONAL!");
+          break;
+        }
         case "game_started":
           toast.success("¡La partida ha comenzado!");
-          refetchState();
+          queryClient.invalidateQueries({ queryKey: ['game-state', gameId] });
           break;
-        case "game_finished":
-          toast("¡La partida ha terminado!");
-          refetchState();
-          break;
-        case "player_joined":
-          refetchState();
+        case "player_joined": {
+          const { sold_tickets } = msg.payload as { sold_tickets: number };
+          patchState(() => ({ sold_tickets }));
           break;
+        }
       }
     },
     onOpen: () => {
@@ -135,6 +206,21 @@ export function UserGameRoomView({
     }
   });
 
+  // API hooks (sin sondeo mientras el socket está conectado)
+  const { data: gameState } = useGameState(gameId, isConnected);
+  const { data: myTicketsData } = useMyTickets(gameId);
+  const startGame = useStartGame();
+  const drawNumber = useDrawNumber();
+  const cancelGame = useCancelGame();
+
+  const drawnNumbers = new Set(gameState?.drawn_numbers || []);
+  // Sin socket todavía, los cartones del REST se marcan con las bolas del estado
+  const myTickets: LiveCard[] = liveCards ?? (myTicketsData?.items || []).map(ticket => ({
+    id: ticket.id,
+    numbers: ticket.numbers,
+    marked: ticket.numbers.flat().reduce((mask, n, cell) => (n === 0 || drawnNumbers.has(n) ? mask | (1 << cell) : mask), 0),
+  }));
+
   // Calculate prizes (20% diagonal, 20% line, 50% bingo, 5% creator, 5% system)
   const pot = (gameState?.sold_tickets || 0) * (gameState?.price || 0) * 0.9; // 90% goes to prizes
   const diagonalPrize = pot * 0.2222; // ~20% of total
@@ -378,7 +464,7 @@ export function UserGameRoomView({
                         <div key={rowIdx} className="user-room-card-row">
                           {row.map((cell, cellIdx) => {
                             const isFree = cell === 0;
-                            const isHit = drawnNumbers.has(cell) || isFree;
+                            const isHit = isFree || ((ticket.marked >> (rowIdx * 5 + cellIdx)) & 1) === 1;
                             return (
                               <div
                                 key={`${rowIdx}-${cellIdx}`}
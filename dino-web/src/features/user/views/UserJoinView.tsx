@@ -2,7 +2,8 @@ import { useState } from "react";
 import toast from "react-hot-toast";
 import { Me, UserView } from "../../../types";
 import { formatCredits } from "../../../utils/format";
-import { useGames, useBuyTicket, Game } from "../../../hooks/useGames";
+import { useBuyTicket, Game } from "../../../hooks/useGames";
+import { useLobby } from "../../../hooks/useLobby";
 import UserHeader from "../components/UserHeader";
 
 type UserJoinViewProps = {
@@ -19,10 +20,11 @@ export function UserJoinView({ me, onLogout, currentView, onNavigate, onEnterRoo
   const [ticketCount, setTicketCount] = useState(1);
   const [isPurchasing, setIsPurchasing] = useState(false);
 
-  const { data, isLoading } = useGames("OPEN");
+  // Lista en vivo por /ws/lobby (sin sondear GET /games)
+  const { games: lobbyGames, isLoading } = useLobby();
   const buyTicket = useBuyTicket();
 
-  const games = data?.items || [];
+  const games = lobbyGames.filter(g => g.status === "OPEN");
 
   const filteredGames = games.filter(g =>
     g.id.toLowerCase().includes(search.toLowerCase()) ||
@@ -1,2 +1,3 @@
 export { useWebSocket } from './useWebSocket';
 export * from './useGames';
+export { useLobby } from './useLobby';
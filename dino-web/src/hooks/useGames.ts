@@ -101,12 +101,13 @@ export function useMyActiveGames() {
     });
 }
 
-export function useGameState(gameId: string | null) {
+export function useGameState(gameId: string | null, live = false) {
     return useQuery({
         queryKey: ['game-state', gameId],
         queryFn: () => fetchGameState(gameId!),
         enabled: !!gameId,
-        refetchInterval: 2000, // Refetch every 2 seconds during game
+        // Con el socket de la sala conectado los cambios llegan por él; si no, cada 2 s
+        refetchInterval: live ? false : 2000,
     });
 }
 
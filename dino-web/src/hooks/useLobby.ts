@@ -0,0 +1,62 @@
+import { useCallback, useState } from 'react';
+import { useWebSocket } from './useWebSocket';
+import type { Game } from './useGames';
+
+type LobbySnapshot = { columns: string[]; rows: unknown[][] };
+type GameDelta = Partial<Game> & { id: string };
+
+// Partidas OPEN y RUNNING por /ws/lobby: una foto inicial y después solo los cambios
+export function useLobby() {
+    const [games, setGames] = useState<Map<string, Game>>(new Map());
+    const [isLoading, setIsLoading] = useState(true);
+
+    const onMessage = useCallback((msg: { type: string; payload: unknown }) => {
+        switch (msg.type) {
+            case 'lobby': {
+                const { columns, rows } = msg.payload as LobbySnapshot;
+                const next = new Map<string, Game>();
+                rows.forEach(row => {
+                    const game = Object.fromEntries(columns.map((c, i) => [c, row[i]])) as unknown as Game;
+                    next.set(game.id, game);
+                });
+                setGames(next);
+                setIsLoading(false);
+                break;
+            }
+            case 'game_created': {
+                const game = msg.payload as Game;
+                setGames(prev => new Map(prev).set(game.id, game));
+                break;
+            }
+            case 'games_updated': {
+                const { games: deltas } = msg.payload as { games: GameDelta[] };
+                setGames(prev => {
+                    const next = new Map(prev);
+                    deltas.forEach(d => {
+                        const game = next.get(d.id);
+                        if (game) next.set(d.id, { ...game, ...d });
+                    });
+                    return next;
+                });
+                break;
+            }
+            case 'game_removed': {
+                const { id } = msg.payload as { id: string };
+                setGames(prev => {
+                    const next = new Map(prev);
+                    next.delete(id);
+                    return next;
+                });
+                break;
+            }
+        }
+    }, []);
+
+    const url = `${import.meta.env.VITE_API_URL?.replace('http', 'ws') || 'ws://localhost:8000'}/ws/lobby`;
+    const { isConnected, reconnect } = useWebSocket({
+        url,
+        onMessage: (msg) => (msg.type === 'resync' ? reconnect() : onMessage(msg)),
+    });
+
+    return { games: Array.from(games.values()), isLoading, isConnected };
+}
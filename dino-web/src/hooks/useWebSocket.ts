@@ -3,6 +3,7 @@ import { useEffect, useRef, useCallback, useState } from 'react';
 type WebSocketMessage = {
     type: string;
     payload: unknown;
+    seq?: number;
 };
 
 type UseWebSocketOptions = {
@@ -14,6 +15,8 @@ type UseWebSocketOptions = {
     reconnectAttempts?: number;
     reconnectInterval?: number;
     enabled?: boolean;
+    // Salas de partida: guarda el último seq aplicado y reconecta con ?since=<seq>
+    resumable?: boolean;
 };
 
 type UseWebSocketReturn = {
@@ -24,6 +27,27 @@ type UseWebSocketReturn = {
     reconnect: () => void;
 };
 
+// Lleva la cuenta del seq de la sala; false si el evento ya se aplicó y hay que ignorarlo
+function acceptSeq(lastSeqRef: { current: number | null }, data: WebSocketMessage): boolean {
+    const last = lastSeqRef.current;
+    if (data.type === 'connected') {
+        // connected va detrás de lo repetido: su seq es el último de la sala en ese worker
+        const { seq } = data.payload as { seq?: number };
+        if (typeof seq === 'number' && (last === null || seq > last)) lastSeqRef.current = seq;
+        return true;
+    }
+    if (typeof data.seq !== 'number') return true;
+    if (data.type === 'snapshot') {
+        // La foto sustituye al estado: lo que no supere su seq ya está incluido
+        lastSeqRef.current = data.seq;
+        return true;
+    }
+    // card_update viaja con el seq del draw_result que lo produjo
+    if (last !== null && (data.seq < last || (data.seq === last && data.type !== 'card_update'))) return false;
+    lastSeqRef.current = data.seq;
+    return true;
+}
+
 export function useWebSocket({
     url,
     onMessage,
@@ -33,8 +57,10 @@ export function useWebSocket({
     reconnectAttempts = 5,
     reconnectInterval = 3000,
     enabled = true,
+    resumable = false,
 }: UseWebSocketOptions): UseWebSocketReturn {
     const wsRef = useRef<WebSocket | null>(null);
+    const lastSeqRef = useRef<number | null>(null);
     const reconnectCountRef = useRef(0);
     const reconnectTimeoutRef = useRef<ReturnType<typeof setTimeout>>();
     const mountedRef = useRef(true);
@@ -63,7 +89,11 @@ export function useWebSocket({
         setIsConnecting(true);
 
         try {
-            const ws = new WebSocket(url);
+            // Al reconectar, el servidor repite lo perdido desde el último seq o manda un snapshot
+            const since = resumable && lastSeqRef.current !== null
+                ? `${url.includes('?') ? '&' : '?'}since=${lastSeqRef.current}`
+                : '';
+            const ws = new WebSocket(url + since);
 
             ws.onopen = () => {
                 if (!mountedRef.current) {
@@ -104,6 +134,7 @@ export function useWebSocket({
                 if (!mountedRef.current) return;
                 try {
                     const data = JSON.parse(event.data) as WebSocketMessage;
+                    if (resumable && !acceptSeq(lastSeqRef, data)) return;
                     onMessageRef.current?.(data);
                 } catch {
                     console.error('Failed to parse WebSocket message:', event.data);
@@ -115,7 +146,7 @@ export function useWebSocket({
             setIsConnecting(false);
             console.error('WebSocket connection error:', error);
         }
-    }, [url, enabled, reconnectAttempts, reconnectInterval]);
+    }, [url, enabled, reconnectAttempts, reconnectInterval, resumable]);
 
     const disconnect = useCallback(() => {
         if (reconnectTimeoutRef.current) {
@@ -145,6 +176,8 @@ export function useWebSocket({
 
     useEffect(() => {
         mountedRef.current = true;
+        // Otra sala: no se reanuda nada de la anterior
+        lastSeqRef.current = null;
 
         if (enabled) {
             connect();